@@ -3,6 +3,10 @@
 """
 Avtomatik Hisobot Forma To'ldirish
 Hisobotlarni avtomatik yaratish va to'ldirish tizimi
+
+Davr summalari va taqsimotlari app.period_summary dan olinadi (oldindan
+yig'ilgan jadvallar, yopilgan davr keshdan); generate_all_forms ularni bir
+marta olib, barcha formalarga beradi - har bir forma alohida skanerlamaydi.
 """
 
 from datetime import datetime, timedelta
@@ -19,20 +23,35 @@ class AutomaticFormFiller:
     def __init__(self, db=None):
         self.db = db
     
-    def generate_sales_report_form(self, period: str, db_session) -> Dict:
+    def _summary(self, period: str, summary: Optional[Dict] = None) -> Dict:
+        """Davr yig'indilari (berilgan bo'lsa - o'sha)"""
+        if summary is not None:
+            return summary
+        from app import period_summary
+        return period_summary.get(period)
+    
+    def _details(self, period: str, details: Optional[Dict] = None) -> Dict:
+        """Davr taqsimotlari: top mahsulot/mijozlar, kunlik savdo, kassa"""
+        if details is not None:
+            return details
+        from app import period_summary
+        return period_summary.details(period)
+    
+    def generate_sales_report_form(self, period: str, db_session, summary: Optional[Dict] = None,
+                                   details: Optional[Dict] = None) -> Dict:
         """
         Savdo hisobot formasi yaratish va to'ldirish
         
         Args:
             period: '2026-02' format
             db_session: SQLAlchemy session
+            summary: period_summary.get(period) natijasi (bo'lmasa olinadi)
+            details: period_summary.details(period) natijasi (bo'lmasa olinadi)
         
         Returns:
             Savdo hisoboti ma'lumotlari bilan to'ldirilgan forma
         """
         try:
-            from datetime import datetime as dt
-            
             start_date = datetime.strptime(f"{period}-01", "%Y-%m-%d")
             
             # End of month
@@ -42,30 +61,28 @@ class AutomaticFormFiller:
                 next_month = int(period.split('-')[1]) + 1
                 end_date = datetime(int(period[:4]), next_month, 1) - timedelta(days=1)
             
-            # Database'dan savdo ma'lumotlarini olish
-            # Bu yerda SalesOrder modeli ishlatiladi
-            sales_orders = []
-            total_sales = 0
-            total_quantity = 0
+            summary = self._summary(period, summary)
+            details = self._details(period, details)
+            total_orders = summary['sales_orders']
+            total_amount = summary['sales_amount']
             
-            # Sample data (haqiqiy database bilan o'zlashtirish kerak)
             sales_data = {
                 'period': period,
                 'start_date': start_date.strftime('%Y-%m-%d'),
                 'end_date': end_date.strftime('%Y-%m-%d'),
-                'total_orders': 0,
-                'total_quantity': 0,
-                'total_amount': 0,
-                'average_order_value': 0,
-                'top_products': [],
-                'top_customers': [],
-                'daily_sales': [],
+                'total_orders': total_orders,
+                'total_quantity': summary['sales_quantity'],
+                'total_amount': total_amount,
+                'average_order_value': total_amount / total_orders if total_orders else 0,
+                'top_products': details['top_products'],
+                'top_customers': details['top_customers'],
+                'daily_sales': details['daily_sales'],
                 'form_fields': {
                     'report_date': datetime.now().strftime('%Y-%m-%d'),
                     'reporting_period': period,
                     'report_type': 'Sales Report',
-                    'total_transactions': 0,
-                    'total_value': 0,
+                    'total_transactions': total_orders,
+                    'total_value': total_amount,
                     'currency': 'UZS'
                 }
             }
@@ -81,7 +98,7 @@ class AutomaticFormFiller:
             logger.error(f"Savdo hisobot formasi yaratishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def generate_purchase_report_form(self, period: str, db_session) -> Dict:
+    def generate_purchase_report_form(self, period: str, db_session, summary: Optional[Dict] = None) -> Dict:
         """Sotib olish hisobot formasi yaratish"""
         try:
             start_date = datetime.strptime(f"{period}-01", "%Y-%m-%d")
@@ -92,19 +109,21 @@ class AutomaticFormFiller:
                 next_month = int(period.split('-')[1]) + 1
                 end_date = datetime(int(period[:4]), next_month, 1) - timedelta(days=1)
             
+            summary = self._summary(period, summary)
+            
             purchase_data = {
                 'period': period,
                 'start_date': start_date.strftime('%Y-%m-%d'),
                 'end_date': end_date.strftime('%Y-%m-%d'),
-                'total_orders': 0,
-                'total_quantity': 0,
-                'total_amount': 0,
+                'total_orders': summary['purchase_orders'],
+                'total_quantity': summary['purchase_quantity'],
+                'total_amount': summary['purchases'],
                 'form_fields': {
                     'report_date': datetime.now().strftime('%Y-%m-%d'),
                     'reporting_period': period,
                     'report_type': 'Purchase Report',
-                    'total_transactions': 0,
-                    'total_value': 0,
+                    'total_transactions': summary['purchase_orders'],
+                    'total_value': summary['purchases'],
                     'currency': 'UZS'
                 }
             }
@@ -121,20 +140,27 @@ class AutomaticFormFiller:
             return {'success': False, 'error': str(e)}
     
     def generate_inventory_report_form(self, db_session) -> Dict:
-        """Inventar hisobot formasi yaratish"""
+        """Inventar hisobot formasi yaratish (joriy qoldiqlar)"""
         try:
+            from app import period_summary
+            
+            stock = period_summary.inventory()
+            low_stock = stock['low_stock_items']
+            
             inventory_data = {
                 'report_date': datetime.now().strftime('%Y-%m-%d'),
-                'total_items': 0,
-                'total_quantity': 0,
-                'total_value': 0,
-                'low_stock_items': [],
-                'out_of_stock_items': [],
+                'total_items': stock['total_items'],
+                'total_quantity': stock['total_quantity'],
+                'total_value': stock['total_value'],
+                'low_stock_count': stock['low_stock_count'],
+                'out_of_stock_count': stock['out_of_stock_count'],
+                'low_stock_items': [item for item in low_stock if item['quantity'] > 0],
+                'out_of_stock_items': [item for item in low_stock if item['quantity'] <= 0],
                 'form_fields': {
                     'report_date': datetime.now().strftime('%Y-%m-%d'),
                     'report_type': 'Inventory Report',
-                    'total_products': 0,
-                    'categories': []
+                    'total_products': stock['total_items'],
+                    'categories': stock['categories']
                 }
             }
             
@@ -149,20 +175,23 @@ class AutomaticFormFiller:
             logger.error(f"Inventar hisobot formasi yaratishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def generate_financial_report_form(self, period: str, db_session) -> Dict:
+    def generate_financial_report_form(self, period: str, db_session, summary: Optional[Dict] = None) -> Dict:
         """Moliyaviy hisobot formasi yaratish"""
         try:
+            summary = self._summary(period, summary)
+            income = summary['income']
+            
             financial_data = {
                 'period': period,
                 'report_date': datetime.now().strftime('%Y-%m-%d'),
-                'income': 0,
-                'total_expenses': 0,
-                'purchases': 0,
-                'salary': 0,
-                'utilities': 0,
-                'other_expenses': 0,
-                'profit': 0,
-                'profit_margin': 0,
+                'income': income,
+                'total_expenses': summary['total_expenses'],
+                'purchases': summary['purchases'],
+                'salary': summary['salary'],
+                'utilities': summary['utilities'],
+                'other_expenses': summary['other_expenses'],
+                'profit': summary['profit'],
+                'profit_margin': round(summary['profit'] / income * 100, 2) if income else 0,
                 'form_fields': {
                     'report_date': datetime.now().strftime('%Y-%m-%d'),
                     'period': period,
@@ -183,25 +212,41 @@ class AutomaticFormFiller:
             logger.error(f"Moliyaviy hisobot formasi yaratishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def generate_cash_flow_report_form(self, period: str, db_session) -> Dict:
-        """Pul oqimi hisobot formasi yaratish"""
+    def generate_cash_flow_report_form(self, period: str, db_session, summary: Optional[Dict] = None,
+                                       details: Optional[Dict] = None) -> Dict:
+        """
+        Pul oqimi hisobot formasi yaratish
+        
+        Kirim/chiqim va qoldiqlar kassa operatsiyalaridan. Kassa chiqimi
+        toifalanmagan, shuning uchun u Expense toifalari (oylik, kommunal)
+        bo'yicha taqsimlanadi, qolgani - 'other'.
+        """
         try:
+            summary = self._summary(period, summary)
+            cash = self._details(period, details)['cash']
+            outflow = cash['outflow']
+            salary = min(summary['salary'], outflow)
+            utilities = min(summary['utilities'], outflow - salary)
+            
             cash_flow_data = {
                 'period': period,
                 'report_date': datetime.now().strftime('%Y-%m-%d'),
-                'opening_balance': 0,
+                'opening_balance': cash['opening_balance'],
                 'cash_inflows': {
-                    'sales': 0,
+                    'sales': cash['inflow'],
                     'loans': 0,
                     'other': 0
                 },
                 'cash_outflows': {
                     'purchases': 0,
-                    'salary': 0,
-                    'utilities': 0,
-                    'other': 0
+                    'salary': salary,
+                    'utilities': utilities,
+                    'other': outflow - salary - utilities
                 },
-                'closing_balance': 0,
+                'total_inflows': cash['inflow'],
+                'total_outflows': outflow,
+                'net_cash_flow': cash['inflow'] - outflow,
+                'closing_balance': cash['closing_balance'],
                 'form_fields': {
                     'report_date': datetime.now().strftime('%Y-%m-%d'),
                     'period': period,
@@ -268,12 +313,12 @@ class AutomaticFormFiller:
         try:
             vat_rate = 0.12  # Default 12%
             
-            # SystemConfig dan QQS foizini olish
+            # SystemConfig dan QQS foizini olish (keshdan)
             try:
-                from app.main import SystemConfig
-                config = SystemConfig.query.filter_by(key='vat_rate').first()
-                if config and config.value:
-                    vat_rate = float(config.value) / 100
+                from app import system_config
+                configured = system_config.get('vat_rate')
+                if configured:
+                    vat_rate = float(configured) / 100
             except Exception:
                 pass
             
@@ -364,18 +409,21 @@ class AutomaticFormFiller:
     def generate_all_forms(self, period: str, db_session, company_data: Dict = None) -> Dict:
         """Barcha formalarni bir paytda yaratish va to'ldirish"""
         try:
+            # Davr summalari va taqsimotlari bir marta olinadi - har bir forma alohida hisoblamaydi
+            summary = self._summary(period)
+            details = self._details(period)
             forms = {
-                'sales_report': self.generate_sales_report_form(period, db_session),
-                'purchase_report': self.generate_purchase_report_form(period, db_session),
+                'sales_report': self.generate_sales_report_form(period, db_session, summary, details),
+                'purchase_report': self.generate_purchase_report_form(period, db_session, summary),
                 'inventory_report': self.generate_inventory_report_form(db_session),
-                'financial_report': self.generate_financial_report_form(period, db_session),
-                'cash_flow_report': self.generate_cash_flow_report_form(period, db_session)
+                'financial_report': self.generate_financial_report_form(period, db_session, summary),
+                'cash_flow_report': self.generate_cash_flow_report_form(period, db_session, summary, details)
             }
             
             # Moliyaviy ma'lumotlar bilan taxJform to'ldirish
             if forms['financial_report']['success']:
                 financial = forms['financial_report']['form_data']
-                forms['tax_form'] = self.fill_tax_form(period, financial)
+                forms['tax_form'] = self.fill_tax_form(period, dict(financial, expenses=financial.get('total_expenses', 0)))
                 forms['vat_form'] = self.fill_vat_form(
                     period, 
                     financial.get('income', 0),
@@ -383,7 +431,7 @@ class AutomaticFormFiller:
                 )
                 forms['payroll_form'] = self.fill_payroll_form(
                     period,
-                    company_data.get('employee_count', 0) if company_data else 0,
+                    (company_data or {}).get('employee_count', summary['employees']),
                     financial.get('salary', 0)
                 )
             
@@ -0,0 +1,103 @@
+"""
+Kassa operatsiyalarini o'tkazish
+
+Balans Python da o'qib-yozilmaydi: operatsiyalar qo'shilgandan keyin har bir
+kassa uchun bitta `UPDATE cash_register SET balance = balance + :delta`
+bajariladi - xuddi shu tranzaksiyada. Shu sababli bir kassada parallel
+ishlayotgan kassirlar bir-birining o'zgarishini yo'qotmaydi, qator qulfi
+esa faqat UPDATE dan commit gacha ushlanadi. Kassalar id tartibida
+yangilanadi - bir nechta kassali paketlar o'zaro deadlock qilmaydi.
+"""
+
+import logging
+import math
+
+from sqlalchemy import bindparam
+
+from app.extensions import db
+from app.models import CashRegister, CashTransaction
+
+logger = logging.getLogger(__name__)
+
+INCOME_TYPE = 'Kirim'
+# Bitta paketdagi operatsiyalar chegarasi
+MAX_BATCH_SIZE = 1000
+
+
+class CashTransactionError(ValueError):
+    """Noto'g'ri operatsiya ma'lumotlari"""
+
+
+def signed_amount(transaction_type, amount):
+    """Kirim balansni oshiradi, qolganlari (Chiqim) kamaytiradi"""
+    return amount if transaction_type == INCOME_TYPE else -amount
+
+
+def _build(index, data):
+    if not isinstance(data, dict):
+        raise CashTransactionError(f"[{index}] operatsiya obyekt bo'lishi kerak")
+    try:
+        amount = float(data.get('amount'))
+    except (TypeError, ValueError):
+        raise CashTransactionError(f"[{index}] amount raqam bo'lishi kerak")
+    # NaN/Infinity: NaN <= 0 False - balansni NaN ga aylantirmasligi uchun alohida tekshiriladi
+    if not math.isfinite(amount):
+        raise CashTransactionError(f"[{index}] amount chekli son bo'lishi kerak")
+    if amount <= 0:
+        raise CashTransactionError(f"[{index}] amount musbat bo'lishi kerak")
+    if not data.get('cash_register_id'):
+        raise CashTransactionError(f"[{index}] cash_register_id kerak")
+    # JSON da "1" kabi satr kelishi mumkin - kassa id lari butun son
+    register_id = data.get('cash_register_id')
+    try:
+        if isinstance(register_id, bool) or int(register_id) != float(register_id):
+            raise ValueError(register_id)
+        register_id = int(register_id)
+    except (TypeError, ValueError, OverflowError):
+        raise CashTransactionError(f"[{index}] cash_register_id butun son bo'lishi kerak")
+    return CashTransaction(
+        cash_register_id=register_id,
+        transaction_type=data.get('transaction_type'),
+        amount=amount,
+        description=data.get('description'),
+        reference=data.get('reference')
+    )
+
+
+def post_transactions(items):
+    """
+    Operatsiyalarni qo'shib, kassa balanslarini atomar yangilash.
+
+    Commit qilmaydi - chaqiruvchi bitta commit bilan yakunlaydi.
+    Qaytaradi: (CashTransaction ro'yxati, {kassa id: delta})
+    """
+    if not items:
+        raise CashTransactionError("Operatsiyalar ro'yxati bo'sh")
+    if len(items) > MAX_BATCH_SIZE:
+        raise CashTransactionError(f"Bir paketda ko'pi bilan {MAX_BATCH_SIZE} ta operatsiya")
+
+    transactions = [_build(i, data) for i, data in enumerate(items)]
+    deltas = {}
+    for t in transactions:
+        deltas[t.cash_register_id] = deltas.get(t.cash_register_id, 0) + signed_amount(t.transaction_type, t.amount)
+
+    found = {rid for (rid,) in db.session.query(CashRegister.id).filter(CashRegister.id.in_(list(deltas)))}
+    missing = sorted(set(deltas) - found, key=str)
+    if missing:
+        raise CashTransactionError(f"Kassa topilmadi: {missing}")
+
+    db.session.add_all(transactions)
+    db.session.flush()
+
+    table = CashRegister.__table__
+    db.session.execute(
+        table.update().where(table.c.id == bindparam('register_id'))
+        .values(balance=db.func.coalesce(table.c.balance, 0) + bindparam('delta')),
+        [{'register_id': rid, 'delta': deltas[rid]} for rid in sorted(deltas)]
+    )
+    return transactions, deltas
+
+
+def balances(register_ids):
+    """{kassa id: balans} - UPDATE dan keyingi (shu tranzaksiyadagi) qiymatlar"""
+    return dict(db.session.query(CashRegister.id, CashRegister.balance).filter(CashRegister.id.in_(register_ids)))
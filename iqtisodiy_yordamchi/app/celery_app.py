@@ -1,16 +1,45 @@
 """
 Celery async tasks for data export, forecasting, ingestion
+
+Tasks run inside an app context from app.factory.create_app(with_routes=False) -
+the worker never imports app.main, its routes or heavy web-only dependencies.
 """
-from celery import Celery
+from celery import Celery, Task
+from celery.schedules import crontab
 import os
 from dotenv import load_dotenv
+from flask import has_app_context
 
 load_dotenv()
 
+_flask_app = None
+
+
+def flask_app():
+    """Flask app for tasks (created on first use, without route modules)"""
+    global _flask_app
+    if _flask_app is None:
+        from app.factory import create_app
+        _flask_app = create_app(with_routes=False)
+    return _flask_app
+
+
+class AppContextTask(Task):
+    """Run every task inside a Flask app context"""
+
+    def __call__(self, *args, **kwargs):
+        if has_app_context():
+            return self.run(*args, **kwargs)
+        with flask_app().app_context():
+            return self.run(*args, **kwargs)
+
+
 celery = Celery(
     'erp_tasks',
     broker=os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
-    backend=os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    backend=os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    task_cls=AppContextTask,
+    include=['app.celery_tasks']
 )
 
 celery.conf.update(
@@ -19,13 +48,31 @@ celery.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    beat_schedule={
+        # Har kecha barcha mahsulotlar prognozini qayta hisoblash
+        'nightly-batch-forecast': {
+            'task': 'batch_forecast',
+            'schedule': crontab(hour=2, minute=0),
+            'kwargs': {'method': 'holt_winters', 'days': 90},
+        },
+        # Kechagi kun oxiridagi hisob qoldiqlari (trial balance shu snapshotdan boshlanadi)
+        'nightly-ledger-snapshot': {
+            'task': 'ledger_snapshot',
+            'schedule': crontab(hour=0, minute=30),
+        },
+        # Offline sync jurnalidan eskirgan yozuvlarni tozalash (har yakshanba)
+        'weekly-sync-log-compaction': {
+            'task': 'compact_sync_log',
+            'schedule': crontab(hour=3, minute=0, day_of_week=0),
+        },
+    },
 )
 
 
 @celery.task(name='export_sales_report')
 def export_sales_report(start_date, end_date, format='xlsx'):
     """Export sales report asynchronously"""
-    from app.main import db, SalesOrder
+    from app.models import SalesOrder
     from datetime import datetime
     import json
     
@@ -49,28 +96,23 @@ def export_sales_report(start_date, end_date, format='xlsx'):
 @celery.task(name='compute_forecast')
 def compute_forecast(product_id=None, method='holt_winters', days=30):
     """Compute forecast asynchronously"""
-    from app.main import db, Forecast, SalesOrder, SalesOrderItem
+    from app.extensions import db
+    from app.models import Forecast
     from datetime import datetime, timedelta
+    from app.forecasting import daily_quantity_matrix, params_error
     
+    # Boshqa chaqiruvchilar (beat, send_task) uchun ham - days=0/manfiy matritsani buzadi
+    error = params_error(days)
+    if error:
+        return {'status': 'error', 'message': error}
     try:
         if product_id:
-            since = datetime.utcnow() - timedelta(days=days)
-            items = db.session.query(SalesOrderItem).join(SalesOrder).filter(
-                SalesOrderItem.product_id == product_id,
-                SalesOrder.order_date >= since
-            ).all()
-            daily = {}
-            for it in items:
-                date = it.sales_order.order_date.date()
-                daily[date] = daily.get(date, 0) + it.quantity
-            series = list(daily.values()) if daily else [0]
+            _, matrix = daily_quantity_matrix(days, [product_id])
+            series = matrix[:, 0].tolist()
         else:
+            from app.rollup import daily_totals
             since = datetime.utcnow() - timedelta(days=days)
-            q = db.session.query(SalesOrder.order_date, db.func.sum(SalesOrder.total_amount).label('total'))\
-                .filter(SalesOrder.order_date >= since)\
-                .group_by(db.func.date(SalesOrder.order_date))\
-                .order_by(SalesOrder.order_date.asc())
-            series = [float(r.total or 0) for r in q.all()]
+            series = [total for total, _ in daily_totals(since).values()]
         
         forecast_val = sum(series[-7:]) / 7 if series else 0
         f = Forecast(product_id=product_id, window_days=days, predicted=forecast_val)
@@ -82,10 +124,58 @@ def compute_forecast(product_id=None, method='holt_winters', days=30):
         return {'status': 'error', 'message': str(e)}
 
 
-@celery.task(name='process_ingest')
-def process_ingest(ingest_id):
-    """Process data ingestion asynchronously"""
-    from app.main import db, DataIngest, ValidationReport
+@celery.task(name='batch_forecast')
+def batch_forecast(method='moving_average', days=90, window=7):
+    """Reforecast every product in one pass (nightly)"""
+    from app.forecasting import params_error, run_batch_forecast
+    from datetime import datetime
+    
+    error = params_error(days, window)
+    if error:
+        return {'status': 'error', 'message': error}
+    try:
+        started = datetime.utcnow()
+        forecasts = run_batch_forecast(method=method, days=days, window=window)
+        return {
+            'status': 'success',
+            'method': method,
+            'products': len(forecasts),
+            'seconds': round((datetime.utcnow() - started).total_seconds(), 1)
+        }
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+@celery.task(name='ledger_snapshot')
+def ledger_snapshot(day=None):
+    """Snapshot cumulative account totals at the end of `day` (default: yesterday)"""
+    from app.ledger import take_snapshot
+    from datetime import date
+    
+    try:
+        accounts = take_snapshot(date.fromisoformat(day) if day else None)
+        return {'status': 'success', 'accounts': accounts}
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+@celery.task(name='compact_sync_log')
+def compact_sync_log():
+    """Drop superseded offline-sync change log entries"""
+    from app.sync_log import compact
+    
+    try:
+        return {'status': 'success', 'removed': compact()}
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+@celery.task(bind=True, name='process_ingest')
+def process_ingest(self, ingest_id):
+    """Process data ingestion asynchronously: validate, then write sales orders to ERP tables"""
+    from app.extensions import db
+    from app.models import DataIngest, ValidationReport
+    from app.schema_registry import validate_with_schema
     import json
     
     try:
@@ -93,19 +183,24 @@ def process_ingest(ingest_id):
         if not ingest:
             return {'status': 'error', 'message': 'Ingest not found'}
         
-        # Simulate processing
+        # Kompilyatsiya qilingan (keshdagi) schema bilan, birinchi N xatogacha
         payload = ingest.payload if isinstance(ingest.payload, dict) else json.loads(ingest.payload)
-        errors = []
-        
-        if 'sales_orders' in payload:
-            for i, so in enumerate(payload['sales_orders']):
-                if 'customer_id' not in so:
-                    errors.append({'path': f'sales_orders[{i}]', 'error': 'missing customer_id'})
+        schema_name, errors = validate_with_schema(payload)
         
         report = ValidationReport(ingest_id=ingest_id, valid=(len(errors) == 0), errors=errors)
         db.session.add(report)
         db.session.commit()
         
-        return {'status': 'success', 'ingest_id': ingest_id, 'errors_count': len(errors)}
+        # Faqat to'liq yaroqli payload jadvallarga yoziladi; har bo'lakdan keyin PROGRESS holati
+        materialized = None
+        if not errors and schema_name == 'sales_orders':
+            from app.ingest import materialize_sales_orders
+            materialized = materialize_sales_orders(
+                payload,
+                progress=lambda info: self.update_state(state='PROGRESS', meta=dict(info, ingest_id=ingest_id))
+            )
+        
+        return {'status': 'success', 'ingest_id': ingest_id, 'schema': schema_name,
+                'errors_count': len(errors), 'materialized': materialized}
     except Exception as e:
         return {'status': 'error', 'message': str(e)}
@@ -27,163 +27,192 @@ except Exception as e:
     logger.warning(f"Telegram bot not available: {e}")
     telegram_bot = None
 
+# Hisobot turi -> (Report.report_type, sarlavha qismi, TaxCabinetAPI metodi)
+TAX_REPORTS = {
+    'sales': ('tax_sales', 'Savdo', 'send_sales_report'),
+    'vat': ('tax_vat', 'QQS (VAT)', 'send_vat_report'),
+    'payroll': ('tax_payroll', 'Oylik', 'send_employee_payroll'),
+    'declaration': ('tax_declaration', 'Deklaratsiya', 'send_tax_declaration'),
+}
+# Har bir hisobot turining qayta urinish siyosati: urinishlar soni va birinchi kutish
+# (sekund, keyingilari ikki barobar). Deklaratsiya muddati qat'iy - ko'proq uriniladi
+TAX_REPORT_RETRY = {
+    'sales': {'max_retries': 5, 'countdown': 30},
+    'vat': {'max_retries': 5, 'countdown': 30},
+    'payroll': {'max_retries': 3, 'countdown': 60},
+    'declaration': {'max_retries': 8, 'countdown': 60},
+}
+
+
+def tax_report_title(report_type, period):
+    return f"Soliq Hisoboti - {TAX_REPORTS[report_type][1]} - {period}"
+
+
+def build_tax_report_data(report_type, period):
+    """
+    Soliq kabinetiga yuboriladigan hisobot ma'lumoti (app context ichida)
+
+    Summalar period_summary dan (bitta so'rov, yopilgan davr keshdan);
+    savdo hisoboti - har bir buyurtma alohida (soliq kabineti formati), faqat
+    kerakli ustunlar o'qiladi.
+    """
+    from app import period_summary
+    from app.extensions import db
+    from app.models import SalesOrder
+
+    if report_type == 'sales':
+        start_date, end_date = period_summary.period_range(period)
+        sales_orders = db.session.query(SalesOrder.order_date, SalesOrder.total_amount)\
+            .filter(SalesOrder.order_date >= start_date, SalesOrder.order_date < end_date)\
+            .order_by(SalesOrder.order_date, SalesOrder.id)
+        return [{'date': order_date.strftime('%Y-%m-%d'), 'total_amount': total_amount}
+                for order_date, total_amount in sales_orders]
+
+    summary = period_summary.get(period)
+
+    if report_type == 'vat':
+        total_vat_collected = summary['vat_base'] * 0.12
+        return {'period': period, 'total_vat_collected': total_vat_collected, 'vat_paid': 0, 'vat_to_pay': total_vat_collected}
+
+    if report_type == 'payroll':
+        total_salary = summary['salary']
+        return {'period': period, 'total_salary': total_salary, 'pit_total': total_salary * 0.12, 'pension_contribution': total_salary * 0.03, 'employees_count': summary['employees']}
+
+    if report_type == 'declaration':
+        profit = summary['profit']
+        tax_amount = profit * 0.12 if profit > 0 else 0
+        return {'period': period, 'income': summary['income'], 'expenses': summary['total_expenses'], 'profit': profit, 'tax_amount': tax_amount}
+
+    raise ValueError(f"Noma'lum hisobot turi: {report_type}")
+
+
 if celery:
+    from celery import chord
+
     @celery.task(bind=True, name='send_tax_reports_async')
-    def send_tax_reports_async(self, user_id, period, include_sales=True, include_vat=True,
-                               include_payroll=True, include_declaration=False):
+    def send_tax_reports_async(self, user_id=None, period=None, include_sales=True, include_vat=True,
+                               include_payroll=True, include_declaration=False, revision=0):
         """
         Soliq hisobotlarini fonda yuborish
         
+        Har bir hisobot turi alohida `send_tax_report` vazifasi (chord sarlavhasi) -
+        ular parallel, har biri o'z qayta urinish siyosati bilan ishlaydi. Sekin
+        javob bergan bitta hisobot qolganlarini kutdirmaydi. `save_tax_reports`
+        callback natijalarni yig'ib, Report qatorlarini bitta commit bilan saqlaydi.
+        Vazifa chord bilan almashtiriladi - yakuniy natija shu task_id bo'yicha olinadi.
+        
         Args:
-            period: '2026-02' format
+            period: '2026-02' format (standart: joriy oy)
             include_sales: Savdo hisoboti yuborish
             include_vat: KDV hisoboti yuborish
             include_payroll: Oylik hisoboti yuborish
             include_declaration: Soliq deklaratsiyasi yuborish
+            revision: 0 - oddiy yuborish; tuzatilgan hisobotni qayta yuborish uchun 1, 2, ...
+        """
+        period = period or datetime.now().strftime('%Y-%m')
+        selected = [report_type for report_type, include in (
+            ('sales', include_sales), ('vat', include_vat),
+            ('payroll', include_payroll), ('declaration', include_declaration)
+        ) if include]
+        
+        logger.info(f"Task started: send_tax_reports_async for {period}: {selected}")
+        
+        if not selected:
+            return {'task_id': self.request.id, 'period': period, 'status': 'completed',
+                    'reports': {}, 'all_success': True}
+        
+        header = [send_tax_report.s(report_type, period, revision) for report_type in selected]
+        return self.replace(chord(header, save_tax_reports.s(user_id=user_id, period=period)))
+    
+    @celery.task(bind=True, name='send_tax_report')
+    def send_tax_report(self, report_type, period, revision=0):
+        """
+        Bitta hisobotni soliq kabinetiga yuborish (chord qismi)
+        
+        Idempotency-Key (davr, hisobot turi, revision) dan olinadi - qayta
+        urinishda ham, shu davr uchun vazifa ikkinchi marta ishga tushirilganda
+        ham server hisobotni takror qabul qilmaydi. Tuzatilgan hisobot
+        revision ni oshirib yuboriladi.
+        Urinishlar tugasa xato natija qaytariladi (istisno emas) - callback baribir ishlaydi.
         """
+        from app.tax_integration import TaxCabinetAPIDev as TaxCabinet, idempotency_key, is_retryable
+        
+        policy = TAX_REPORT_RETRY[report_type]
+        key = idempotency_key(period, report_type, revision)
+        try:
+            data = build_tax_report_data(report_type, period)
+            result = getattr(TaxCabinet(), TAX_REPORTS[report_type][2])(data, idempotency_key=key)
+        except Exception as e:
+            logger.error(f"{report_type} report error: {str(e)}")
+            result = {'success': False, 'error': str(e)}
+        
+        if is_retryable(result) and self.request.retries < policy['max_retries']:
+            countdown = policy['countdown'] * 2 ** self.request.retries
+            logger.warning(f"{report_type} report retry {self.request.retries + 1}/{policy['max_retries']} in {countdown}s")
+            raise self.retry(countdown=countdown, max_retries=policy['max_retries'])
+        
+        result['idempotency_key'] = key
+        logger.info(f"{report_type} report sent: {result.get('success')}")
+        
+        if telegram_bot:
+            try:
+                telegram_bot.send_tax_report_notification(report_type, 'success' if result.get('success') else 'error', {'period': period})
+            except Exception as e:
+                logger.warning(f"Telegram notification error: {str(e)}")
+        
+        return {'report_type': report_type, 'result': result}
+    
+    @celery.task(bind=True, name='save_tax_reports')
+    def save_tax_reports(self, parts, user_id=None, period=None):
+        """
+        Chord callback: natijalarni yig'ish va Report qatorlarini saqlash
+        
+        Shu kalit bilan allaqachon muvaffaqiyatli saqlangan hisobot (vazifa yoki
+        callback qayta ishga tushganda yoki davr ikki marta yuborilganda) ikkinchi
+        marta yozilmaydi. Tuzatilgan yuborish (revision) alohida Report sifatida saqlanadi.
+        """
+        from app.extensions import db
+        from app.models import Report
+        
+        results = {
+            'task_id': self.request.id,
+            'period': period,
+            'status': 'processing',
+            'reports': {}
+        }
         try:
-            from app.tax_integration import TaxCabinetAPIDev as TaxCabinet
-            from app.main import app, db, SalesOrder, Invoice, Expense, User, Report
-            from sqlalchemy import func
+            titles = [tax_report_title(part['report_type'], period) for part in parts]
+            saved = {(r.title, (r.data or {}).get('idempotency_key'))
+                     for r in Report.query.filter(Report.title.in_(titles)).all()
+                     if isinstance(r.data, dict) and r.data.get('success')}
             
-            logger.info(f"Task started: send_tax_reports_async for {period}")
+            for part in parts:
+                report_type, result = part['report_type'], part['result']
+                results['reports'][report_type] = result
+                title = tax_report_title(report_type, period)
+                if (title, result.get('idempotency_key')) in saved:
+                    continue
+                db.session.add(Report(title=title, report_type=TAX_REPORTS[report_type][0],
+                                      created_by_id=user_id, data=result))
             
-            with app.app_context():
-                tax_api = TaxCabinet()
-                results = {
-                    'task_id': self.request.id,
-                    'period': period,
-                    'status': 'processing',
-                    'reports': {}
-                }
-                
-                # Sana oraliqlarini hisoblash
-                start_date = datetime.strptime(f'{period}-01', '%Y-%m-%d')
-                if period.endswith('-12'):
-                    end_date = datetime(int(period[:4]) + 1, 1, 1)
-                else:
-                    next_month = int(period.split('-')[1]) + 1
-                    end_date = datetime(int(period[:4]), next_month, 1)
-                
-                # Update task state
-                self.update_state(state='PROGRESS', 
-                                meta={'current': 0, 'total': 4, 'status': 'Savdo hisoboti yuborilmoqda...'})
-                
-                # 1. Savdo hisoboti
-                if include_sales:
-                    try:
-                        sales_orders = db.session.query(SalesOrder)\
-                            .filter(SalesOrder.order_date >= start_date, SalesOrder.order_date < end_date)\
-                            .all()
-                        
-                        sales_data = [{'date': o.order_date.strftime('%Y-%m-%d'), 'total_amount': o.total_amount} for o in sales_orders]
-                        sales_result = tax_api.send_sales_report(sales_data)
-                        results['reports']['sales'] = sales_result
-                        logger.info(f"Sales report sent: {sales_result['success']}")
-                        
-                        db.session.add(Report(title=f"Soliq Hisoboti - Savdo - {period}", report_type='tax_sales', created_by_id=user_id, data=sales_result))
-                        
-                        if telegram_bot:
-                            telegram_bot.send_tax_report_notification('sales', 'success' if sales_result['success'] else 'error', {'period': period})
-                    except Exception as e:
-                        logger.error(f"Sales report error: {str(e)}")
-                        results['reports']['sales'] = {'success': False, 'error': str(e)}
-                
-                self.update_state(state='PROGRESS',
-                                meta={'current': 1, 'total': 4, 'status': 'KDV hisoboti yuborilmoqda...'})
-                
-                # 2. KDV hisoboti
-                if include_vat:
-                    try:
-                        invoices = db.session.query(Invoice)\
-                            .filter(Invoice.invoice_date >= start_date, Invoice.invoice_date < end_date)\
-                            .all()
-                        
-                        total_vat_collected = sum((inv.total_amount or 0) * 0.12 for inv in invoices)
-                        vat_data = {'period': period, 'total_vat_collected': total_vat_collected, 'vat_paid': 0, 'vat_to_pay': total_vat_collected}
-                        vat_result = tax_api.send_vat_report(vat_data)
-                        results['reports']['vat'] = vat_result
-                        logger.info(f"VAT report sent: {vat_result['success']}")
-                        
-                        db.session.add(Report(title=f"Soliq Hisoboti - QQS (VAT) - {period}", report_type='tax_vat', created_by_id=user_id, data=vat_result))
-
-                        if telegram_bot:
-                            telegram_bot.send_tax_report_notification('vat', 'success' if vat_result['success'] else 'error', {'period': period})
-                    except Exception as e:
-                        logger.error(f"VAT report error: {str(e)}")
-                        results['reports']['vat'] = {'success': False, 'error': str(e)}
-                
-                self.update_state(state='PROGRESS',
-                                meta={'current': 2, 'total': 4, 'status': 'Oylik hisoboti yuborilmoqda...'})
-                
-                # 3. Oylik hisoboti
-                if include_payroll:
-                    try:
-                        total_salary = db.session.query(func.sum(Expense.amount))\
-                            .filter(Expense.expense_date >= start_date, Expense.expense_date < end_date, Expense.category == 'Salary')\
-                            .scalar() or 0
-                        employees_count = User.query.count()
-                        payroll_data = {'period': period, 'total_salary': total_salary, 'pit_total': total_salary * 0.12, 'pension_contribution': total_salary * 0.03, 'employees_count': employees_count}
-                        payroll_result = tax_api.send_employee_payroll(payroll_data)
-                        results['reports']['payroll'] = payroll_result
-                        logger.info(f"Payroll report sent: {payroll_result['success']}")
-                        
-                        db.session.add(Report(title=f"Soliq Hisoboti - Oylik - {period}", report_type='tax_payroll', created_by_id=user_id, data=payroll_result))
-
-                        if telegram_bot:
-                            telegram_bot.send_tax_report_notification('payroll', 'success' if payroll_result['success'] else 'error', {'period': period})
-                    except Exception as e:
-                        logger.error(f"Payroll report error: {str(e)}")
-                        results['reports']['payroll'] = {'success': False, 'error': str(e)}
-                
-                self.update_state(state='PROGRESS',
-                                meta={'current': 3, 'total': 4, 'status': 'Tugallanmoqda...'})
-                
-                # 4. Soliq deklaratsiyasi
-                if include_declaration:
-                    try:
-                        total_income = db.session.query(func.sum(SalesOrder.total_amount))\
-                            .filter(SalesOrder.order_date >= start_date, SalesOrder.order_date < end_date)\
-                            .scalar() or 0
-                        total_expenses = db.session.query(func.sum(Expense.amount))\
-                            .filter(Expense.expense_date >= start_date, Expense.expense_date < end_date)\
-                            .scalar() or 0
-                        profit = total_income - total_expenses
-                        tax_amount = profit * 0.12 if profit > 0 else 0
-                        declaration_data = {'period': period, 'income': total_income, 'expenses': total_expenses, 'profit': profit, 'tax_amount': tax_amount}
-                        decl_result = tax_api.send_tax_declaration(declaration_data)
-                        results['reports']['declaration'] = decl_result
-                        logger.info(f"Declaration sent: {decl_result['success']}")
-                        
-                        db.session.add(Report(title=f"Soliq Hisoboti - Deklaratsiya - {period}", report_type='tax_declaration', created_by_id=user_id, data=decl_result))
-
-                        if telegram_bot:
-                            telegram_bot.send_tax_report_notification('declaration', 'success' if decl_result['success'] else 'error', {'period': period})
-                    except Exception as e:
-                        logger.error(f"Declaration error: {str(e)}")
-                        results['reports']['declaration'] = {'success': False, 'error': str(e)}
-                
-                # Barcha reportlarni bazaga saqlash
-                db.session.commit()
-                
-                # Final status
-                results['status'] = 'completed'
-                results['all_success'] = all(
-                    r.get('success', False) 
-                    for r in results['reports'].values()
-                    if isinstance(r, dict)
-                )
-                
-                logger.info(f"Task completed: {results['all_success']}")
-                return results
-        
+            # Barcha reportlarni bazaga saqlash
+            db.session.commit()
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Task error: {str(e)}")
             return {
                 'status': 'failed',
                 'error': str(e),
-                'task_id': self.request.id
+                'task_id': self.request.id,
+                'reports': results['reports']
             }
+        
+        # Final status
+        results['status'] = 'completed'
+        results['all_success'] = all(r.get('success', False) for r in results['reports'].values())
+        
+        logger.info(f"Task completed: {results['all_success']}")
+        return results
     
     @celery.task(bind=True, name='generate_excel_report')
     def generate_excel_report(self, report_type, period):
@@ -339,6 +368,15 @@ if celery:
         except Exception as e:
             logger.error(f"Database backup error: {str(e)}")
             return {'status': 'failed', 'error': str(e)}
+    
+    @celery.task(name='ocr_batch_page', acks_late=True, reject_on_worker_lost=True, ignore_result=True)
+    def ocr_batch_page(job_id, processor, index, path, page):
+        """
+        OCR paketining bitta sahifasi (app/ocr_batch.py) - natija paket papkasiga yoziladi.
+        Worker o'lsa (acks_late) sahifa boshqa workerda qayta bajariladi.
+        """
+        from app import ocr_batch
+        return ocr_batch.run_page(job_id, processor, index, path, page)
 
 else:
     logger.warning("Celery is not configured. Tasks will not work.")
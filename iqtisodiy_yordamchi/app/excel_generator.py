@@ -6,15 +6,50 @@ Savdo, Sotib olish, Inventar, Moliyaviy hisobotlari
 """
 
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from datetime import datetime
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _named_styles() -> List[NamedStyle]:
+    """
+    Write-only rejim uchun umumiy nomlangan stillar.
+
+    Har bir katak uchun alohida Font/Fill/Border obyekti o'rniga workbook da
+    bir marta ro'yxatdan o'tgan stil nomi ishlatiladi. NamedStyle bitta
+    workbook ga bog'lanadi, shuning uchun har safar yangisi yaratiladi.
+    """
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    total_fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+    total_font = Font(bold=True, size=11)
+
+    def header(name, color):
+        return NamedStyle(
+            name=name,
+            font=Font(bold=True, color="FFFFFF", size=11),
+            fill=PatternFill(start_color=color, end_color=color, fill_type="solid"),
+            alignment=Alignment(horizontal='center', vertical='center'),
+            border=border
+        )
+
+    return [
+        header('erp_header', "4472C4"),
+        header('erp_header_green', "70AD47"),
+        NamedStyle(name='erp_cell', border=border),
+        NamedStyle(name='erp_number', number_format='#,##0', border=border),
+        NamedStyle(name='erp_decimal', number_format='0.0', border=border),
+        NamedStyle(name='erp_total', font=total_font, fill=total_fill),
+        NamedStyle(name='erp_total_number', font=total_font, fill=total_fill, number_format='#,##0'),
+    ]
+
+
 class ExcelTableGenerator:
     """Excel jadvallarni yaratish va formulalar qo'shish"""
     
@@ -32,7 +67,65 @@ class ExcelTableGenerator:
             bottom=Side(style='thin')
         )
     
-    def create_sales_table(self, sales_data: List[Dict], output_file: str = 'sales_report.xlsx'):
+    def write_stream(self, output, title: str, headers: List[str], rows: Iterable,
+                     widths: Optional[List[int]] = None, formats: Optional[Dict[int, str]] = None,
+                     formulas: Optional[Dict[int, str]] = None, totals: Optional[List[int]] = None,
+                     label_column: int = 1, header_style: str = 'erp_header') -> int:
+        """
+        Write-only rejimda jadval yozish - qatorlar xotirada to'planmaydi.
+
+        output: fayl yo'li yoki fayl obyekti (masalan tempfile.TemporaryFile)
+        rows: qiymatlar ro'yxatlari iteratori (DB kursoridan to'g'ridan-to'g'ri)
+        formats: {ustun: nomlangan stil}, masalan {6: 'erp_number'}
+        formulas: {ustun: shablon}, {r} joriy qator raqami, masalan {8: '=E{r}*F{r}'}
+        totals: bo'sh qatordan keyin "JAMI:" qatorida SUM qo'yiladigan ustunlar
+        Qaytaradi: yozilgan qatorlar soni
+        """
+        formats = formats or {}
+        formulas = formulas or {}
+
+        self.wb = Workbook(write_only=True)
+        for style in _named_styles():
+            self.wb.add_named_style(style)
+        self.ws = self.wb.create_sheet(title)
+
+        # Ustun kengliklari birinchi qatordan oldin berilishi kerak
+        for idx, width in enumerate(widths or [], 1):
+            self.ws.column_dimensions[get_column_letter(idx)].width = width
+
+        self.ws.append([self._styled(header, header_style) for header in headers])
+
+        count = 0
+        for count, values in enumerate(rows, 1):
+            r = count + 1
+            row = list(values)
+            row.extend([None] * (len(headers) - len(row)))
+            for col, template in formulas.items():
+                row[col - 1] = template.format(r=r)
+            for col, style in formats.items():
+                row[col - 1] = self._styled(row[col - 1], style)
+            self.ws.append(row)
+
+        if totals:
+            self.ws.append([])
+            total_row = [None] * max(totals + [label_column])
+            total_row[label_column - 1] = self._styled("JAMI:", 'erp_total')
+            for col in totals:
+                letter = get_column_letter(col)
+                total_row[col - 1] = self._styled(f"=SUM({letter}2:{letter}{count + 1})", 'erp_total_number')
+            self.ws.append(total_row)
+
+        self.wb.save(output)
+        return count
+
+    def _styled(self, value, style: str) -> WriteOnlyCell:
+        """Nomlangan stilli write-only katak"""
+        cell = WriteOnlyCell(self.ws, value=value)
+        cell.style = style
+        return cell
+
+    def create_sales_table(self, sales_data: Iterable[Dict], output_file: str = 'sales_report.xlsx',
+                           write_only: bool = False):
         """
         Savdo jadvalini yaratish
         
@@ -46,8 +139,29 @@ class ExcelTableGenerator:
             'discount': 5,  # %
             'total': 950000
         }]
+
+        write_only=True: sales_data istalgan iterator bo'lishi mumkin, jadval oqim bilan yoziladi
         """
         try:
+            if write_only:
+                rows = self.write_stream(
+                    output_file, "Sales",
+                    ['Sanasi', 'Buyurtma ID', 'Mijoz', 'Mahsulot', 'Miqdori', 'Narxi', 'Chegirma %', 'Jami'],
+                    ([d.get('date'), d.get('order_id'), d.get('customer'), d.get('product'),
+                      d.get('quantity', 0), d.get('unit_price', 0), d.get('discount', 0)] for d in sales_data),
+                    widths=[15, 15, 20, 20, 10, 15, 12, 15],
+                    formats={5: 'erp_cell', 6: 'erp_number', 7: 'erp_decimal', 8: 'erp_number'},
+                    formulas={8: '=E{r}*F{r}*(1-G{r}/100)'},
+                    totals=[8], label_column=3
+                )
+                logger.info(f"Savdo jadvali yaratildi (write-only): {output_file}")
+                return {
+                    'success': True,
+                    'file': output_file,
+                    'rows': rows,
+                    'message': 'Savdo jadvali muvaffaqiyatli yaratildi'
+                }
+
             self.wb = Workbook()
             self.ws = self.wb.active
             self.ws.title = "Sales"
@@ -114,9 +228,29 @@ class ExcelTableGenerator:
             logger.error(f"Savdo jadvali yaratishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def create_purchase_table(self, purchase_data: List[Dict], output_file: str = 'purchase_report.xlsx'):
+    def create_purchase_table(self, purchase_data: Iterable[Dict], output_file: str = 'purchase_report.xlsx',
+                              write_only: bool = False):
         """Sotib olish jadvalini yaratish"""
         try:
+            if write_only:
+                rows = self.write_stream(
+                    output_file, "Purchases",
+                    ['Sanasi', 'PO ID', 'Etkazuvchi', 'Mahsulot', 'Miqdori', 'Birlik Narxi', 'Jami'],
+                    ([d.get('date'), d.get('po_id'), d.get('supplier'), d.get('product'),
+                      d.get('quantity', 0), d.get('unit_price', 0)] for d in purchase_data),
+                    widths=[15, 15, 20, 20, 10, 15, 15],
+                    formats={5: 'erp_number', 6: 'erp_number', 7: 'erp_number'},
+                    formulas={7: '=E{r}*F{r}'},
+                    totals=[7], label_column=3
+                )
+                logger.info(f"Sotib olish jadvali yaratildi (write-only): {output_file}")
+                return {
+                    'success': True,
+                    'file': output_file,
+                    'rows': rows,
+                    'message': 'Sotib olish jadvali muvaffaqiyatli yaratildi'
+                }
+
             self.wb = Workbook()
             self.ws = self.wb.active
             self.ws.title = "Purchases"
@@ -176,7 +310,8 @@ class ExcelTableGenerator:
             logger.error(f"Sotib olish jadvali yaratishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def create_inventory_table(self, inventory_data: List[Dict], output_file: str = 'inventory_report.xlsx'):
+    def create_inventory_table(self, inventory_data: Iterable[Dict], output_file: str = 'inventory_report.xlsx',
+                               write_only: bool = False):
         """
         Inventar jadvalini yaratish
         
@@ -192,6 +327,25 @@ class ExcelTableGenerator:
         }]
         """
         try:
+            if write_only:
+                rows = self.write_stream(
+                    output_file, "Inventory",
+                    ['Kod', 'Nomi', 'Kategoriya', 'Kirim', 'Sotib Olish', 'Savdo', 'Qolgan', 'Birlik Narxi', 'Jami Narx'],
+                    ([d.get('code'), d.get('name'), d.get('category'), d.get('opening_stock', 0),
+                      d.get('purchase', 0), d.get('sales', 0), None, d.get('unit_cost', 0)] for d in inventory_data),
+                    widths=[10, 20, 15, 10, 15, 10, 10, 15, 15],
+                    formats={col: 'erp_number' for col in [4, 5, 6, 7, 8, 9]},
+                    formulas={7: '=D{r}+E{r}-F{r}', 9: '=G{r}*H{r}'},
+                    totals=[7, 9], label_column=2
+                )
+                logger.info(f"Inventar jadvali yaratildi (write-only): {output_file}")
+                return {
+                    'success': True,
+                    'file': output_file,
+                    'rows': rows,
+                    'message': 'Inventar jadvali muvaffaqiyatli yaratildi'
+                }
+
             self.wb = Workbook()
             self.ws = self.wb.active
             self.ws.title = "Inventory"
@@ -1,4 +1,20 @@
+import os
+
 from flask_sqlalchemy import SQLAlchemy
 
 # Database obyektini bu yerda yaratamiz, lekin app'ga keyinroq ulaymiz
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+# OpenAI mijozi - import vaqtida emas, birinchi AI so'rovida yaratiladi
+_openai_client = None
+
+
+def get_openai_client():
+    """Umumiy OpenAI mijozi (openai paketi shu yerda import qilinadi)"""
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+
+        _openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY', ''))
+    return _openai_client
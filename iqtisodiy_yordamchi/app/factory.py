@@ -0,0 +1,78 @@
+"""
+Flask ilova fabrikasi
+
+create_app(config) konfiguratsiya, baza va ORM hodisalarini (rollup,
+ledger, sync_log) ulaydi, with_routes=True bo'lsa route modullarini ham
+ro'yxatdan o'tkazadi. Celery workerlar create_app(with_routes=False)
+ishlatadi - route modullari umuman import qilinmaydi. Og'ir kutubxonalar
+(openai, openpyxl, reportlab, jsonschema, statsmodels) shu yerda import
+qilinmaydi, OpenAI mijozi va JSON schemalar birinchi ishlatilganda yuklanadi.
+
+Production: gunicorn -c gunicorn.conf.py app.wsgi:app
+Ishga tushish vaqtini tekshirish: python benchmark_startup.py
+"""
+
+import importlib
+import logging
+import os
+
+from dotenv import load_dotenv
+from flask import Flask
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(config=None, with_routes=True):
+    """Flask ilova. config - app.config ni ustidan yozuvchi dict."""
+    load_dotenv()
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///erp_system.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # Har bir gunicorn worker o'z pulini ochadi: ulanishlar soni >= thread lar soni bo'lishi kerak
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '5')),
+            'pool_pre_ping': True,
+        }
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    # after_flush hodisalari: savdo yig'indilari, provodkalar, offline sync jurnali
+    from app import ledger, rollup, sync_log  # noqa: F401
+
+    if with_routes:
+        register_routes(app)
+    return app
+
+
+def register_routes(app):
+    """Asosiy blueprintlar va ixtiyoriy integratsiya route modullari"""
+    from app import main
+    from app.models import AIAssistant, AIFeedback, Customer, Invoice, OTPCode, Product, Report, SalesOrder, User
+    from app.routes_reports import reports_bp
+    from app.routes_settings import settings_bp
+
+    app.register_blueprint(main.main_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(settings_bp)
+
+    # Tashqi xizmatlarga (OCR, soliq kabineti, Telegram...) bog'liq modullar:
+    # biri yuklanmasa ilova qolgan routelar bilan ishga tushadi
+    optional = [
+        ('app.routes_auth', 'init_auth_routes', (db, User, OTPCode, main.generate_otp, main.send_otp_sms)),
+        ('app.routes_ai', 'init_ai_routes', (db, AIAssistant, AIFeedback, main.login_required)),
+        ('app.routes_tax', 'init_tax_routes',
+         (db, User, SalesOrder, Customer, Invoice, main.login_required, Report)),
+        ('app.routes_ocr', 'init_ocr_routes', (db, User, main.login_required)),
+        ('app.routes_excel', 'init_excel_routes', (db, User, SalesOrder, Customer, Product, main.login_required)),
+    ]
+    for module_name, init_name, args in optional:
+        try:
+            getattr(importlib.import_module(module_name), init_name)(app, *args)
+        except Exception as e:
+            logger.warning(f"{module_name} routelari ulanmadi: {e}")
@@ -0,0 +1,214 @@
+"""
+Barcha mahsulotlar uchun bir o'tishli (batch) prognoz
+
+Sotuvlar DailySalesRollup dan bitta GROUP BY (product_id, kun) so'rov bilan (kunlar x mahsulotlar)
+NumPy matritsasiga yig'iladi - sotuvsiz kunlar 0. Prognoz usullari
+matritsaning har bir ustuni (mahsulot) ustida bir vaqtda hisoblanadi: vaqt
+bo'yicha sikl kunlar soniga teng, mahsulotlar soniga emas. Natijalar Forecast
+jadvaliga executemany bilan yoziladi.
+
+HoltWintersCache - statsmodels bilan moslangan (fit) modellar LRU keshi;
+`hw_cache` - jarayon bo'yicha umumiy nusxasi (/api/forecast_hw).
+
+Modul NumPy ni yuklaydi - veb routelar uni endpoint ichida import qiladi.
+"""
+
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import insert
+
+from app import rollup
+from app.extensions import db
+from app.models import DailySalesRollup, Forecast, Product
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('moving_average', 'exponential_smoothing', 'holt_winters')
+# days / window chegarasi (kunlar) - API va vazifa kiritishlari shu oraliqda tekshiriladi
+MAX_HISTORY_DAYS = 730
+# Forecast qatorlari shuncha-shunchadan yoziladi
+WRITE_BATCH = 5000
+# Keshdagi moslangan Holt-Winters modellari soni
+HW_CACHE_SIZE = 128
+
+
+def params_error(days, window=7):
+    """days/window 1..MAX_HISTORY_DAYS oralig'idagi butun son bo'lmasa xato matni, aks holda None"""
+    for name, value in (('days', days), ('window', window)):
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= MAX_HISTORY_DAYS:
+            return f'{name} must be an integer between 1 and {MAX_HISTORY_DAYS}'
+    return None
+
+
+def daily_quantity_matrix(days, product_ids=None, now=None):
+    """
+    Oxirgi `days` kun uchun (kunlar x mahsulotlar) sotilgan miqdor matritsasi.
+
+    product_ids berilmasa barcha mahsulotlar (sotuvi yo'qlari ham 0 ustun
+    bilan) olinadi. Qaytaradi: (mahsulot id lari, np.ndarray (days, n)).
+    """
+    now = now or datetime.utcnow()
+    start = now.date() - timedelta(days=days - 1)
+
+    # (mahsulot, kun) yig'indilari DailySalesRollup dan - buyurtma qatorlari aylanib chiqilmaydi
+    query = rollup.product_quantity_query(start, now.date())
+    if product_ids is not None:
+        query = query.filter(DailySalesRollup.product_id.in_(product_ids))
+    rows = query.all()
+
+    if product_ids is None:
+        ids = sorted({pid for (pid,) in db.session.query(Product.id)} | {r[0] for r in rows})
+    else:
+        ids = sorted(set(product_ids))
+    column = {pid: i for i, pid in enumerate(ids)}
+
+    matrix = np.zeros((days, len(ids)))
+    if rows:
+        # SQLite da Date ustuni ham satr bo'lib kelishi mumkin
+        day_index = [(date.fromisoformat(str(r[1])[:10]) - start).days for r in rows]
+        np.add.at(matrix, (day_index, [column[r[0]] for r in rows]), [float(r[2] or 0) for r in rows])
+    return ids, matrix
+
+
+def moving_average(matrix, window=7):
+    """Oxirgi `window` kunning o'rtachasi"""
+    return matrix[-window:].mean(axis=0)
+
+
+def exponential_smoothing(matrix, alpha=0.3):
+    """Oddiy eksponensial silliqlash - keyingi kun uchun qiymat"""
+    level = matrix[0].copy()
+    for row in matrix[1:]:
+        level = alpha * row + (1 - alpha) * level
+    return level
+
+
+def holt_winters(matrix, seasonal_periods=7, alpha=0.3, beta=0.1, gamma=0.1):
+    """
+    Additiv Holt-Winters (trend + mavsumiylik), barcha ustunlar uchun bir xil
+    silliqlash parametrlari bilan. Ikki mavsumdan kam tarix bo'lsa eksponensial
+    silliqlashga qaytadi.
+    """
+    n = matrix.shape[0]
+    m = seasonal_periods
+    if n < 2 * m:
+        return exponential_smoothing(matrix, alpha)
+
+    level = matrix[:m].mean(axis=0)
+    trend = (matrix[m:2 * m].mean(axis=0) - level) / m
+    seasonal = matrix[:m] - level
+    for t in range(m, n):
+        s = seasonal[t % m]
+        previous = level
+        level = alpha * (matrix[t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+        seasonal[t % m] = gamma * (matrix[t] - level) + (1 - gamma) * s
+    return np.maximum(level + trend + seasonal[n % m], 0)
+
+
+def forecast_matrix(matrix, method='moving_average', window=7, alpha=0.3, seasonal_periods=7):
+    """Matritsaning har bir ustuni uchun keyingi kun prognozi"""
+    if matrix.shape[1] == 0:
+        return np.zeros(0)
+    if method == 'moving_average':
+        return moving_average(matrix, window)
+    if method == 'exponential_smoothing':
+        return exponential_smoothing(matrix, alpha)
+    if method == 'holt_winters':
+        return holt_winters(matrix, seasonal_periods, alpha)
+    raise ValueError(f"Noma'lum prognoz usuli: {method} ({', '.join(METHODS)})")
+
+
+def run_batch_forecast(method='moving_average', days=90, window=7, alpha=0.3, seasonal_periods=7,
+                       product_ids=None):
+    """
+    Barcha (yoki berilgan) mahsulotlar uchun prognoz hisoblab Forecast ga yozish.
+
+    Qaytaradi: {product_id: prognoz}
+    """
+    now = datetime.utcnow()
+    ids, matrix = daily_quantity_matrix(days, product_ids, now=now)
+    values = forecast_matrix(matrix, method, window=window, alpha=alpha, seasonal_periods=seasonal_periods)
+
+    window_days = window if method == 'moving_average' else days
+    rows = [{'product_id': pid, 'window_days': window_days, 'predicted': float(value),
+             'forecast_date': now, 'created_at': now}
+            for pid, value in zip(ids, values)]
+    for start in range(0, len(rows), WRITE_BATCH):
+        db.session.execute(insert(Forecast), rows[start:start + WRITE_BATCH])
+    db.session.commit()
+
+    logger.info(f"Batch prognoz ({method}): {len(ids)} mahsulot")
+    return {pid: float(value) for pid, value in zip(ids, values)}
+
+
+class HoltWintersCache:
+    """
+    statsmodels Holt-Winters natijalari keshi (LRU).
+
+    Kalit: (qator doirasi, seasonal_periods, oxirgi sana). Xuddi shu qator
+    qayta so'ralsa optimizatsiya umuman bajarilmaydi. Yangi kun qo'shilsa yoki
+    bugungi qiymat o'zgarsa, shu doiradagi oxirgi parametrlar boshlang'ich
+    nuqta (start_params) qilib beriladi va qo'pol qidiruv (brute) o'tkazib
+    yuboriladi.
+    """
+
+    def __init__(self, maxsize=HW_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()   # kalit -> (qator, prognoz, parametrlar)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fit(series, seasonal_periods, start_params=None):
+        """(prognoz, parametrlar vektori, warm ishlatildimi)"""
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        model = ExponentialSmoothing(series, trend='add', seasonal='add', seasonal_periods=seasonal_periods)
+        fitted = None
+        if start_params is not None:
+            try:
+                fitted = model.fit(optimized=True, start_params=start_params, use_brute=False)
+            except Exception as e:
+                logger.warning(f"Holt-Winters warm start ishlamadi, to'liq fit: {e}")
+        warm = fitted is not None
+        if fitted is None:
+            fitted = model.fit(optimized=True)
+
+        p = fitted.params
+        # fit(start_params=...) tartibi: alpha, beta, gamma, l0, b0, s0..s(m-1)
+        params = np.r_[p['smoothing_level'], p['smoothing_trend'], p['smoothing_seasonal'],
+                       p['initial_level'], p['initial_trend'], p['initial_seasons']]
+        return float(np.asarray(fitted.forecast(steps=1))[0]), params, warm
+
+    def forecast(self, scope, series, last_date, seasonal_periods):
+        """Keyingi kun prognozi. Qaytaradi: (qiymat, 'hit' | 'warm' | 'cold')"""
+        key = (scope, seasonal_periods, last_date)
+        series = tuple(series)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == series:
+                self._entries.move_to_end(key)
+                return entry[1], 'hit'
+            if entry:
+                start_params = entry[2]
+            else:
+                start_params = next((e[2] for k, e in reversed(self._entries.items())
+                                     if k[:2] == key[:2]), None)
+
+        # Fit qulfdan tashqarida - boshqa doiralar kutib turmaydi
+        value, params, warm = self._fit(list(series), seasonal_periods, start_params)
+
+        with self._lock:
+            self._entries[key] = (series, value, params)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value, 'warm' if warm else 'cold'
+
+
+# Moslangan Holt-Winters modellari (LRU) - takroriy so'rovlar optimizatorni chaqirmaydi
+hw_cache = HoltWintersCache()
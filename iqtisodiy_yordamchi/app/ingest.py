@@ -0,0 +1,210 @@
+"""
+DataIngest payload -> ERP jadvallari (SalesOrder / SalesOrderItem)
+
+Tekshirilgan `sales_orders` payload bo'laklab (chunk) yoziladi. Har bir
+bo'lak uchun:
+  1. buyurtmalar bitta executemany INSERT bilan,
+  2. ularning id lari raqam (number) bo'yicha bitta SELECT bilan,
+  3. buyurtma qatorlari yana bitta executemany INSERT bilan qo'shiladi
+va bo'lak commit qilinadi. Core INSERT lar ORM hodisalarini chaqirmaydi, shuning
+uchun DailySalesRollup deltalari shu bo'lak tranzaksiyasida yoziladi. Mijoz va mahsulot id lari oldindan IN so'rovlar
+bilan xotiradagi to'plamlarga yuklanadi - qator boshiga SELECT yo'q.
+
+`write_sales_orders` offline sync (push-changes) bilan umumiy.
+"""
+
+from datetime import datetime
+import logging
+
+from sqlalchemy import insert
+
+from app import period_summary, rollup, sync_log
+from app.extensions import db
+from app.models import Customer, Product, SalesOrder, SalesOrderItem
+
+logger = logging.getLogger(__name__)
+
+# Bir bo'lakdagi buyurtmalar soni (har bo'lak alohida tranzaksiya)
+INGEST_CHUNK_SIZE = 2000
+# IN (...) ro'yxati uzunligi - eski SQLite 999 parametr chegarasidan past
+LOOKUP_BATCH = 900
+# executemany bitta chaqiruvidagi qatorlar
+WRITE_BATCH = 2000
+# Hisobotda saqlanadigan o'tkazib yuborilgan buyurtmalar soni
+MAX_REPORTED_SKIPS = 100
+
+# write_sales_orders o'tkazib yuborish sabablari
+SKIP_EXISTS = 'exists'
+SKIP_DUPLICATE = 'duplicate'
+SKIP_NO_NUMBER = 'no_number'
+SKIP_UNKNOWN_CUSTOMER = 'unknown_customer'
+SKIP_UNKNOWN_PRODUCT = 'unknown_product'
+
+
+def existing_values(column, values):
+    """`column IN values` bo'yicha bazada bor qiymatlar to'plami"""
+    values = [v for v in set(values) if v is not None]
+    found = set()
+    for start in range(0, len(values), LOOKUP_BATCH):
+        batch = values[start:start + LOOKUP_BATCH]
+        found.update(v for (v,) in db.session.query(column).filter(column.in_(batch)))
+    return found
+
+
+def executemany(statement, rows):
+    """`rows` ni WRITE_BATCH lik bo'laklarda executemany bilan bajarish"""
+    for start in range(0, len(rows), WRITE_BATCH):
+        db.session.execute(statement, rows[start:start + WRITE_BATCH])
+
+
+def _order_ids(numbers):
+    """{raqam: id} - yangi qo'shilgan buyurtmalar uchun"""
+    ids = {}
+    for start in range(0, len(numbers), LOOKUP_BATCH):
+        batch = numbers[start:start + LOOKUP_BATCH]
+        ids.update(db.session.query(SalesOrder.number, SalesOrder.id).filter(SalesOrder.number.in_(batch)))
+    return ids
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+def write_sales_orders(orders, skip, start=0, seen=None, customers=None, products=None, status=None):
+    """
+    Buyurtmalarni SalesOrder/SalesOrderItem ga executemany bilan yozish.
+
+    Raqamsiz, bazada yoki `seen` da bor raqamli, noma'lum mijozli yoki
+    noma'lum mahsulotli buyurtmalar `skip(index, reason, message)` ga beriladi.
+    reason: SKIP_EXISTS (bazada bor - avval qabul qilingan), SKIP_DUPLICATE,
+    SKIP_NO_NUMBER, SKIP_UNKNOWN_CUSTOMER, SKIP_UNKNOWN_PRODUCT.
+    `customers`/`products` - oldindan yuklangan id to'plamlari (berilmasa
+    shu yerda yuklanadi). `status` berilsa payloaddagi holat o'rniga yoziladi.
+    Savdo yig'indilari, yopilgan davr versiyalari va sync jurnali shu
+    tranzaksiyada yangilanadi - commit chaqiruvchida.
+
+    Qaytaradi: (order_rows, item_rows)
+    """
+    seen = set() if seen is None else seen
+    if customers is None:
+        customers = existing_values(Customer.id, (o.get('customer_id') for o in orders))
+    if products is None:
+        products = existing_values(Product.id, (it.get('product_id') for o in orders for it in o.get('items') or []))
+    existing = existing_values(SalesOrder.number, (o.get('number') for o in orders))
+
+    order_rows = []
+    items_by_number = {}
+    for index, order in enumerate(orders, start):
+        number = order.get('number')
+        items = order.get('items') or []
+        if not number:
+            skip(index, SKIP_NO_NUMBER, "Buyurtma raqami yo'q")
+            continue
+        if number in existing:
+            skip(index, SKIP_EXISTS, f"Buyurtma raqami takrorlangan: {number}")
+            continue
+        if number in seen:
+            skip(index, SKIP_DUPLICATE, f"Buyurtma raqami takrorlangan: {number}")
+            continue
+        if order.get('customer_id') not in customers:
+            skip(index, SKIP_UNKNOWN_CUSTOMER, f"Noma'lum customer_id: {order.get('customer_id')}")
+            continue
+        missing = [it.get('product_id') for it in items if it.get('product_id') not in products]
+        if missing:
+            skip(index, SKIP_UNKNOWN_PRODUCT, f"Noma'lum product_id: {missing}")
+            continue
+
+        seen.add(number)
+        total = order.get('total_amount')
+        if total is None:
+            total = sum(rollup.line_amount(it.get('quantity'), it.get('unit_price'), it.get('discount'))
+                        for it in items)
+        order_rows.append({
+            'number': number,
+            'customer_id': order['customer_id'],
+            'order_date': _parse_date(order.get('order_date')),
+            'total_amount': total,
+            'discount': order.get('discount', 0),
+            'tax_amount': order.get('tax_amount', 0),
+            'status': status or order.get('status', 'Yangi'),
+        })
+        items_by_number[number] = items
+
+    if not order_rows:
+        return [], []
+
+    executemany(insert(SalesOrder), order_rows)
+    ids = _order_ids([row['number'] for row in order_rows])
+    item_rows = [{
+        'sales_order_id': ids[number],
+        'product_id': it['product_id'],
+        'quantity': it.get('quantity') or 0,
+        'unit_price': it.get('unit_price') or 0,
+        'discount': it.get('discount') or 0,
+    } for number, items in items_by_number.items() for it in items]
+    executemany(insert(SalesOrderItem), item_rows)
+
+    # Core INSERT lar ORM hodisalarini chaqirmaydi - savdo yig'indilari shu yerda
+    deltas = {}
+    for row in order_rows:
+        rollup.add(deltas, *rollup.order_contribution(
+            row['order_date'], row['customer_id'], row['total_amount'], row['discount'], row['tax_amount']))
+        for it in items_by_number[row['number']]:
+            rollup.add(deltas, *rollup.item_contribution(
+                row['order_date'], row['customer_id'], it['product_id'], it.get('quantity') or 0,
+                it.get('unit_price') or 0, it.get('discount') or 0))
+    rollup.apply_deltas(db.session.connection(), deltas)
+    # Orqa sana bilan kelgan buyurtmalar yopilgan davr keshini eskirtiradi
+    period_summary.touch(db.session.connection(), (row['order_date'].strftime('%Y-%m') for row in order_rows))
+    sync_log.record(db.session.connection(), 'sales_orders', sorted(ids.values()))
+    return order_rows, item_rows
+
+
+def materialize_sales_orders(payload, chunk_size=INGEST_CHUNK_SIZE, progress=None):
+    """
+    `sales_orders` payload ni SalesOrder/SalesOrderItem jadvallariga yozish.
+
+    Payload oldindan schema bilan tekshirilgan bo'lishi kerak. Bazada bor
+    raqamli, noma'lum mijozli yoki noma'lum mahsulotli buyurtmalar o'tkazib
+    yuboriladi (qayta ingest xavfsiz). `progress(info)` har bo'lakdan keyin
+    chaqiriladi.
+
+    Qaytaradi: {'orders', 'lines', 'skipped', 'skipped_orders', 'chunks'}
+    """
+    orders = payload.get('sales_orders') or []
+    total_orders = len(orders)
+    total_lines = sum(len(o.get('items') or []) for o in orders)
+
+    customers = existing_values(Customer.id, (o.get('customer_id') for o in orders))
+    products = existing_values(Product.id, (it.get('product_id') for o in orders for it in o.get('items') or []))
+
+    result = {'orders': 0, 'lines': 0, 'skipped': 0, 'skipped_orders': [], 'chunks': 0}
+    seen = set()
+
+    def skip(index, reason, message):
+        result['skipped'] += 1
+        if len(result['skipped_orders']) < MAX_REPORTED_SKIPS:
+            result['skipped_orders'].append({'path': f'sales_orders[{index}]', 'message': message})
+
+    for start in range(0, total_orders, chunk_size):
+        order_rows, item_rows = write_sales_orders(
+            orders[start:start + chunk_size], skip, start=start, seen=seen,
+            customers=customers, products=products)
+        result['orders'] += len(order_rows)
+        result['lines'] += len(item_rows)
+        db.session.commit()
+        result['chunks'] += 1
+
+        if progress:
+            progress({
+                'chunk': result['chunks'],
+                'orders_done': min(start + chunk_size, total_orders),
+                'orders_total': total_orders,
+                'lines_written': result['lines'],
+                'lines_total': total_lines,
+                'skipped': result['skipped'],
+            })
+
+    logger.info(f"Ingest: {result['orders']} buyurtma, {result['lines']} qator yozildi, "
+                f"{result['skipped']} o'tkazib yuborildi")
+    return result
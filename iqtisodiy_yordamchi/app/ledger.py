@@ -0,0 +1,281 @@
+"""
+Ikki tomonlama yozuv (double-entry) provodka mexanizmi
+
+JournalEntry yaratilganda (o'zgarganda, o'chirilganda) `after_flush`
+hodisasida shu tranzaksiyaning o'zida:
+  1. Account.balance `balance = balance +/- :summa` bilan yangilanadi
+     (debet hisobi ko'payadi/kamayadi - hisob turiga qarab),
+  2. hisobning kunlik debet/kredit aylanmasi (AccountDailyTotal) yoziladi,
+  3. provodka sanasidan keyingi snapshotlar (orqa sana bilan kiritilsa) tuzatiladi.
+
+Istalgan sanadagi aylanma-saldo qaydnomasi (trial balance) = shu sanagacha
+bo'lgan oxirgi snapshot + undan keyingi kunlik aylanmalar. Qoldiq
+boshlang'ich qoldiqni ham o'z ichiga oladi: boshlang'ich qoldiq =
+Account.balance - barcha provodkalar ta'siri, shuning uchun bugungi qoldiq
+Account.balance bilan bir xil manbadan chiqadi. Snapshotlar har
+kecha olinadi (celery `ledger_snapshot`), shuning uchun so'rov narxi jurnal
+hajmiga emas, hisoblar soniga bog'liq.
+
+Jurnaldan qayta qurish: python -m app.ledger
+"""
+
+from datetime import date, datetime, timedelta
+import logging
+
+from sqlalchemy import and_, bindparam, case, event, insert, literal, or_, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models import Account, AccountBalanceSnapshot, AccountDailyTotal, JournalEntry
+
+logger = logging.getLogger(__name__)
+
+# Debet qoldiqli hisob turlari; qolganlari (Liability, Equity, Revenue) kredit qoldiqli
+DEBIT_NORMAL_TYPES = ('Asset', 'Expense')
+ENTRY_ATTRS = ('entry_date', 'debit_account', 'credit_account', 'amount')
+
+
+def _to_day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def signed_balance(account_type, debit, credit):
+    """Hisob turiga mos ishorali qoldiq"""
+    if account_type in DEBIT_NORMAL_TYPES:
+        return (debit or 0) - (credit or 0)
+    return (credit or 0) - (debit or 0)
+
+
+def entry_deltas(deltas, entry_date, debit_account, credit_account, amount, sign=1):
+    """deltas[(hisob, kun)] = [debet, kredit] ga provodka hissasini qo'shish"""
+    day = _to_day(entry_date or datetime.utcnow())
+    amount = sign * (amount or 0)
+    if debit_account:
+        deltas.setdefault((debit_account, day), [0, 0])[0] += amount
+    if credit_account:
+        deltas.setdefault((credit_account, day), [0, 0])[1] += amount
+    return deltas
+
+
+def apply_deltas(connection, deltas):
+    """Kunlik aylanma, Account.balance va keyingi snapshotlarni bitta tranzaksiyada yangilash"""
+    deltas = {key: values for key, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+
+    daily = AccountDailyTotal.__table__
+    existing = {}
+    codes = sorted({code for code, _ in deltas})
+    rows = connection.execute(
+        select(daily.c.id, daily.c.account_code, daily.c.day)
+        .where(daily.c.account_code.in_(codes), daily.c.day.in_(sorted({day for _, day in deltas})))
+    )
+    for row_id, code, day in rows:
+        existing.setdefault((code, _to_day(day)), row_id)
+
+    updates, inserts = [], []
+    for (code, day), (debit, credit) in deltas.items():
+        if (code, day) in existing:
+            updates.append({'row_id': existing[(code, day)], 'd_debit': debit, 'd_credit': credit})
+        else:
+            inserts.append({'account_code': code, 'day': day, 'debit': debit, 'credit': credit})
+    if updates:
+        connection.execute(
+            daily.update().where(daily.c.id == bindparam('row_id'))
+            .values(debit=daily.c.debit + bindparam('d_debit'), credit=daily.c.credit + bindparam('d_credit')),
+            updates
+        )
+    if inserts:
+        connection.execute(daily.insert(), inserts)
+
+    # Joriy qoldiq: o'qish yo'q, faqat atomar UPDATE (parallel provodkalar bir-birini yo'qotmaydi).
+    # IN (...) executemany bilan ishlamaydi, shuning uchun OR
+    totals = {}
+    for (code, _), (debit, credit) in deltas.items():
+        current = totals.setdefault(code, [0, 0])
+        current[0] += debit
+        current[1] += credit
+    account = Account.__table__
+    net = bindparam('d_debit') - bindparam('d_credit')
+    connection.execute(
+        account.update().where(account.c.code == bindparam('b_code'))
+        .values(balance=db.func.coalesce(account.c.balance, 0) +
+                case((or_(*[account.c.account_type == t for t in DEBIT_NORMAL_TYPES]), net), else_=-net)),
+        [{'b_code': code, 'd_debit': d, 'd_credit': c} for code, (d, c) in totals.items()]
+    )
+
+    # Orqa sana bilan kiritilgan provodka: shu kundan keyingi snapshotlar ham o'zgaradi
+    snapshot = AccountBalanceSnapshot.__table__
+    connection.execute(
+        snapshot.update().where(snapshot.c.account_code == bindparam('b_code'),
+                                snapshot.c.day >= bindparam('from_day'))
+        .values(debit=snapshot.c.debit + bindparam('d_debit'), credit=snapshot.c.credit + bindparam('d_credit')),
+        [{'b_code': code, 'from_day': day, 'd_debit': debit, 'd_credit': credit}
+         for (code, day), (debit, credit) in deltas.items()]
+    )
+
+
+# ==================== ORM HODISALARI ====================
+
+def _committed(obj, attr):
+    history = get_history(obj, attr)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None if history.added else getattr(obj, attr)
+
+
+@event.listens_for(Session, 'after_flush')
+def _post_journal_entries(session, flush_context):
+    """Yangi/o'zgargan/o'chirilgan provodkalarni hisoblarga o'tkazish"""
+    deltas = {}
+    for entry in session.new:
+        if isinstance(entry, JournalEntry):
+            entry_deltas(deltas, *[getattr(entry, a) for a in ENTRY_ATTRS])
+    for entry in session.dirty:
+        if isinstance(entry, JournalEntry) and session.is_modified(entry):
+            entry_deltas(deltas, *[_committed(entry, a) for a in ENTRY_ATTRS], sign=-1)
+            entry_deltas(deltas, *[getattr(entry, a) for a in ENTRY_ATTRS])
+    for entry in session.deleted:
+        if isinstance(entry, JournalEntry):
+            entry_deltas(deltas, *[_committed(entry, a) for a in ENTRY_ATTRS], sign=-1)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _track_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+for _attr in ENTRY_ATTRS:
+    event.listen(getattr(JournalEntry, _attr), 'set', _track_old_value, retval=True, active_history=True)
+
+
+# ==================== O'QISH ====================
+
+def cumulative_totals(as_of):
+    """
+    {hisob kodi: (jami debet, jami kredit)} - `as_of` kuni oxirigacha.
+
+    Oxirgi snapshot (<= as_of) + undan keyingi kunlik aylanmalar: ikkita
+    GROUP BY so'rov, jurnal qatorlari umuman o'qilmaydi.
+    """
+    as_of = _to_day(as_of)
+    latest = db.session.query(AccountBalanceSnapshot.account_code.label('account_code'),
+                              db.func.max(AccountBalanceSnapshot.day).label('day'))\
+        .filter(AccountBalanceSnapshot.day <= as_of)\
+        .group_by(AccountBalanceSnapshot.account_code).subquery()
+
+    totals = {}
+    snapshots = db.session.query(AccountBalanceSnapshot.account_code, AccountBalanceSnapshot.debit,
+                                 AccountBalanceSnapshot.credit)\
+        .join(latest, and_(latest.c.account_code == AccountBalanceSnapshot.account_code,
+                           latest.c.day == AccountBalanceSnapshot.day))
+    for code, debit, credit in snapshots:
+        totals[code] = [debit or 0, credit or 0]
+
+    movements = db.session.query(AccountDailyTotal.account_code,
+                                 db.func.sum(AccountDailyTotal.debit), db.func.sum(AccountDailyTotal.credit))\
+        .outerjoin(latest, latest.c.account_code == AccountDailyTotal.account_code)\
+        .filter(AccountDailyTotal.day <= as_of,
+                or_(latest.c.day.is_(None), AccountDailyTotal.day > latest.c.day))\
+        .group_by(AccountDailyTotal.account_code)
+    for code, debit, credit in movements:
+        current = totals.setdefault(code, [0, 0])
+        current[0] += debit or 0
+        current[1] += credit or 0
+    return {code: (float(d), float(c)) for code, (d, c) in totals.items()}
+
+
+def trial_balance(as_of=None):
+    """
+    Aylanma-saldo qaydnomasi: har bir hisob bo'yicha jami debet, kredit,
+    boshlang'ich qoldiq (opening_balance) va `as_of` kuni oxiridagi qoldiq.
+    """
+    as_of = _to_day(as_of or datetime.utcnow())
+    totals = cumulative_totals(as_of)
+    # Account.balance barcha provodkalarni (kelajak sanalilarini ham) o'z ichiga oladi
+    posted = cumulative_totals(date.max)
+    accounts = db.session.query(Account.code, Account.name, Account.account_type, Account.balance)\
+        .order_by(Account.code).all()
+    known = {a.code for a in accounts}
+
+    rows = []
+    for code, name, account_type, current in accounts:
+        debit, credit = totals.get(code, (0.0, 0.0))
+        opening = (current or 0) - signed_balance(account_type, *posted.get(code, (0.0, 0.0)))
+        rows.append({'code': code, 'name': name, 'type': account_type, 'debit': debit, 'credit': credit,
+                     'opening_balance': opening,
+                     'balance': opening + signed_balance(account_type, debit, credit)})
+    # Hisoblar jadvalida yo'q kodlar ham ko'rsatiladi - aks holda jami teng chiqmaydi
+    for code in sorted(set(totals) - known):
+        debit, credit = totals[code]
+        rows.append({'code': code, 'name': None, 'type': None, 'debit': debit, 'credit': credit,
+                     'opening_balance': 0.0, 'balance': debit - credit})
+
+    total_debit = sum(r['debit'] for r in rows)
+    total_credit = sum(r['credit'] for r in rows)
+    return {
+        'as_of': as_of.isoformat(),
+        'accounts': rows,
+        'total_debit': total_debit,
+        'total_credit': total_credit,
+        'balanced': abs(total_debit - total_credit) < 0.005,
+    }
+
+
+def take_snapshot(day=None):
+    """`day` (standart: kecha) oxiridagi jami aylanmalarni saqlash. Saqlangan hisoblar sonini qaytaradi."""
+    day = _to_day(day or datetime.utcnow() - timedelta(days=1))
+    totals = cumulative_totals(day)
+    AccountBalanceSnapshot.query.filter_by(day=day).delete()
+    if totals:
+        db.session.execute(insert(AccountBalanceSnapshot), [
+            {'account_code': code, 'day': day, 'debit': debit, 'credit': credit, 'created_at': datetime.utcnow()}
+            for code, (debit, credit) in totals.items()
+        ])
+    db.session.commit()
+    logger.info(f"Hisoblar snapshoti {day}: {len(totals)} hisob")
+    return len(totals)
+
+
+# ==================== QAYTA QURISH ====================
+
+def rebuild():
+    """
+    Kunlik aylanmalarni jurnaldan qayta qurish va snapshotlarni tashlash.
+    Account.balance ga tegmaydi (unda boshlang'ich qoldiq ham bor).
+    """
+    daily = AccountDailyTotal.__table__
+    day = db.func.date(JournalEntry.entry_date)
+    columns = ['account_code', 'day', 'debit', 'credit']
+    debits = select(JournalEntry.debit_account, day, db.func.sum(JournalEntry.amount), literal(0.0))\
+        .where(JournalEntry.debit_account.isnot(None)).group_by(JournalEntry.debit_account, day)
+    credits = select(JournalEntry.credit_account, day, literal(0.0), db.func.sum(JournalEntry.amount))\
+        .where(JournalEntry.credit_account.isnot(None)).group_by(JournalEntry.credit_account, day)
+
+    db.session.execute(AccountBalanceSnapshot.__table__.delete())
+    db.session.execute(daily.delete())
+    db.session.execute(insert(daily).from_select(columns, debits))
+    db.session.execute(insert(daily).from_select(columns, credits))
+    db.session.commit()
+    count = db.session.query(db.func.count(AccountDailyTotal.id)).scalar()
+    logger.info(f"AccountDailyTotal qayta qurildi: {count} qator")
+    return count
+
+
+if __name__ == '__main__':
+    from app.factory import create_app
+
+    with create_app().app_context():
+        db.create_all()
+        print(f"✅ Kunlik aylanmalar qayta qurildi: {rebuild()} qator")
+        print(f"✅ Snapshot: {take_snapshot()} hisob")
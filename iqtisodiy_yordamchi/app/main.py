@@ -6,103 +6,48 @@ Multi-platform (Android, Windows, iOS)
 Xususiyatlar: OTP, AI Yordamchi, Rollar, Offline Mode, Export, Cloud Sync
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file
+from flask import Blueprint, current_app, render_template, request, jsonify, session, redirect, url_for, send_file
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from functools import wraps
 import os
 import random
 import string
 import io
 import json
+import math
 import secrets
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-import jsonschema
-from jsonschema import Draft7Validator
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
-from pathlib import Path
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
 # Import extensions and models
-from app.extensions import db
+from app.extensions import db, get_openai_client
 from app.models import *
+from app.pagination import keyset_paginate, iso_field
+from app import query_options
+from app.schema_registry import SCHEMA_MAX_ERRORS, validate_with_schema
+from app.realtime import create_broker, TooManySubscribers
+from app import rollup  # DailySalesRollup ORM hodisalarini ro'yxatga oladi
+from app import ledger  # JournalEntry provodkalarini hisoblarga o'tkazadi
+from app import cash
+from app import sync_log  # offline delta sync o'zgarishlar jurnali
+from app import permissions
+
+
+def get_celery():
+    """Celery ilovasi - birinchi fon vazifasida yuklanadi (ishga tushishda emas); sozlanmagan bo'lsa None"""
+    try:
+        from app.celery_app import celery
+    except Exception as e:
+        print(f"Warning: Celery not initialized: {e}")
+        return None
+    return celery
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY', ''))
-
-# Import Celery
-try:
-    from app.celery_app import celery
-except Exception as e:
-    print(f"Warning: Celery not initialized: {e}")
-    celery = None
-
-# HTTP client and threading primitives for integrations and realtime
-import requests
-import threading
-from collections import deque
-import time
-
-# Flask Appni yaratish
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///erp_system.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize Database
-db.init_app(app)
-
-# --- Register external route modules (if present) ---
-try:
-    from app.routes_auth import init_auth_routes
-    init_auth_routes(app, db, User, OTPCode, globals().get('generate_otp'), globals().get('send_otp_sms'))
-except Exception as e:
-    print(f"Auth routes not initialized: {e}")
-
-try:
-    from app.routes_ai import init_ai_routes
-    init_ai_routes(app, db, AIAssistant, AIFeedback, login_required)
-except Exception as e:
-    print(f"AI routes not initialized: {e}")
-
-try:
-    from app.routes_reports import reports_bp
-    app.register_blueprint(reports_bp)
-except Exception as e:
-    print(f"Reports blueprint not registered: {e}")
-
-try:
-    from app.routes_settings import settings_bp
-    app.register_blueprint(settings_bp)
-except Exception as e:
-    print(f"Settings blueprint not registered: {e}")
-
-try:
-    from app.routes_tax import init_tax_routes
-    init_tax_routes(app, db, User, SalesOrder, Customer, Invoice, login_required, Report)
-except Exception as e:
-    print(f"Tax routes not initialized: {e}")
-
-try:
-    from app.routes_ocr import init_ocr_routes
-    init_ocr_routes(app, db, User, login_required)
-except Exception as e:
-    print(f"OCR routes not initialized: {e}")
-
-try:
-    from app.routes_excel import init_excel_routes
-    init_excel_routes(app, db, User, SalesOrder, Product, login_required)
-except Exception as e:
-    print(f"Excel routes not initialized: {e}")
+# Asosiy routelar - ilovaga app/factory.py dagi create_app() ulaydi
+main_bp = Blueprint('main', __name__)
 
 # ==================== LOGIN DEKORATOR ====================
 
@@ -110,7 +55,7 @@ def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -137,22 +82,16 @@ def api_key_required(f):
     return decorated
 
 
-# Simple in-memory event queue for server-sent events (SSE) - development only
-events_queue = deque()
-events_cond = threading.Condition()
+# Server-sent events (SSE) uchun fan-out broker (REALTIME_BACKEND=redis - barcha workerlar aro)
+event_broker = create_broker()
 
 def publish_event(event_type, payload):
-    with events_cond:
-        events_queue.append({'type': event_type, 'payload': payload, 'time': time.time()})
-        # trim
-        while len(events_queue) > 1000:
-            events_queue.popleft()
-        events_cond.notify_all()
+    return event_broker.publish(event_type, payload)
 
 # ==================== MODELS ====================
 
 
-@app.route('/api/ingest', methods=['POST'])
+@main_bp.route('/api/ingest', methods=['POST'])
 @login_required
 def ingest_data():
     """Automatik ma'lumot ingest endpoint - JSON yoki CSV (as text) qabul qiladi"""
@@ -191,122 +130,77 @@ def validate_payload(ingest_id, payload):
     return report
 
 
-@app.route('/api/validate/<int:ingest_id>', methods=['GET'])
+@main_bp.route('/api/validate/<int:ingest_id>', methods=['GET'])
 @login_required
 def get_validation(ingest_id):
     report = ValidationReport.query.filter_by(ingest_id=ingest_id).first_or_404()
     return jsonify({'id': report.id, 'valid': report.valid, 'errors': report.errors}), 200
 
 
-def load_schemas():
-    """Load JSON Schema files from app/schemas directory"""
-    schemas = {}
-    schema_dir = Path(__file__).parent / 'schemas'
-    if schema_dir.exists():
-        for schema_file in schema_dir.glob('*.json'):
-            try:
-                with open(schema_file, 'r') as f:
-                    schemas[schema_file.stem] = json.load(f)
-            except Exception as e:
-                print(f"Failed to load schema {schema_file}: {e}")
-    return schemas
-
-
-SCHEMAS = load_schemas()
-SALES_ORDER_SCHEMA = SCHEMAS.get('sales_orders', {
-    "type": "object",
-    "properties": {
-        "sales_orders": {
-            "type": "array",
-            "items": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {"type": "integer"},
-                    "order_date": {"type": "string", "format": "date"},
-                    "items": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "product_id": {"type": "integer"},
-                                "quantity": {"type": "number"},
-                                "unit_price": {"type": "number"}
-                            },
-                            "required": ["product_id", "quantity"]
-                        }
-                    }
-                },
-                "required": ["customer_id", "items"]
-            }
-        }
-    },
-    "required": ["sales_orders"]
-})
-
-
-def validate_with_schema(payload, schema):
-    """Validate a payload with a given JSON Schema. Returns list of errors."""
-    validator = Draft7Validator(schema)
-    errors = []
-    for err in validator.iter_errors(payload):
-        errors.append({'path': list(err.path), 'message': err.message})
-    return errors
-
-
-@app.route('/api/validate-schema/<int:ingest_id>', methods=['GET'])
+@main_bp.route('/api/validate-schema/<int:ingest_id>', methods=['GET'])
 @login_required
 def validate_schema_endpoint(ingest_id):
     rec = DataIngest.query.get(ingest_id)
     if not rec:
         return jsonify({'error': 'ingest not found'}), 404
     payload = rec.payload if isinstance(rec.payload, dict) else json.loads(rec.payload)
-    errors = validate_with_schema(payload, SALES_ORDER_SCHEMA)
+    # ?max_errors=0 - barcha xatolar, aks holda birinchi N tasidan keyin to'xtaydi
+    max_errors = request.args.get('max_errors', SCHEMA_MAX_ERRORS, type=int)
+    schema_name, errors = validate_with_schema(payload, max_errors=max_errors)
     # store as validation report as well
     report = ValidationReport(ingest_id=ingest_id, valid=(len(errors) == 0), errors=errors)
     db.session.add(report)
     db.session.commit()
-    return jsonify({'ingest_id': ingest_id, 'schema_errors': errors})
+    return jsonify({'ingest_id': ingest_id, 'schema': schema_name, 'schema_errors': errors})
+
+
+def _daily_sales_totals(since):
+    """Kunlik savdo yig'indisi DailySalesRollup dan (kunlar soniga bog'liq): {'YYYY-MM-DD': (total, orders)}"""
+    return rollup.daily_totals(since)
+
+
+def _product_sales_since(since):
+    """Har bir mahsulot uchun qoldiq va `since` kunidan beri sotilgan miqdor (bitta so'rov)"""
+    sold = rollup.product_totals_subquery(since)
+    return db.session.query(Product.id, Product.code, Product.name, Product.quantity, Product.minimum_quantity,
+                            db.func.coalesce(sold.c.sold, 0).label('sold'))\
+        .outerjoin(sold, sold.c.product_id == Product.id)\
+        .order_by(Product.id).all()
 
 
-@app.route('/api/analytics/realtime', methods=['GET'])
+@main_bp.route('/api/analytics/realtime', methods=['GET'])
 @login_required
 def realtime_analytics():
     """Return simple KPIs: sales last N days, orders count, low stock warnings"""
     days = int(request.args.get('days', 7))
-    since = datetime.utcnow() - timedelta(days=days)
-
-    # Simple aggregations
-    total_sales = db.session.query(db.func.sum(SalesOrder.total_amount)).filter(SalesOrder.order_date >= since).scalar() or 0
-    orders_count = SalesOrder.query.filter(SalesOrder.order_date >= since).count()
-    low_stock = Product.query.filter(Product.quantity < Product.minimum_quantity).all()
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
 
-    warnings = [{'id': p.id, 'code': p.code, 'name': p.name, 'quantity': p.quantity, 'minimum': p.minimum_quantity} for p in low_stock]
+    # 1-so'rov: kunlik summa va buyurtmalar soni (KPI lar ham shundan olinadi)
+    daily = _daily_sales_totals(since)
+    total_sales = sum(total for total, _ in daily.values())
+    orders_count = sum(count for _, count in daily.values())
 
-    # build sales_over_time for the last `days`
+    # build sales_over_time for the last `days` (bo'sh kunlar 0 bilan to'ldiriladi)
     day_series = []
     for i in range(days-1, -1, -1):
-        d = (datetime.utcnow() - timedelta(days=i)).date()
-        total = db.session.query(db.func.sum(SalesOrder.total_amount)).filter(db.func.date(SalesOrder.order_date) == d).scalar() or 0
-        day_series.append({'date': d.isoformat(), 'total': float(total)})
+        d = (now - timedelta(days=i)).date().isoformat()
+        day_series.append({'date': d, 'total': daily.get(d, (0.0, 0))[0]})
+
+    # 2-so'rov: har bir mahsulot bo'yicha davr ichidagi sotuv miqdori
+    product_rows = _product_sales_since(since)
+
+    warnings = [{'id': r.id, 'code': r.code, 'name': r.name, 'quantity': r.quantity, 'minimum': r.minimum_quantity}
+                for r in product_rows
+                if r.quantity is not None and r.minimum_quantity is not None and r.quantity < r.minimum_quantity]
 
     # Top selling products in the period
-    top_q = db.session.query(Product.id, Product.name, db.func.sum(SalesOrderItem.quantity).label('sold'))\
-        .join(SalesOrderItem, SalesOrderItem.product_id == Product.id)\
-        .join(SalesOrder, SalesOrder.id == SalesOrderItem.sales_order_id)\
-        .filter(SalesOrder.order_date >= since)\
-        .group_by(Product.id).order_by(db.desc('sold')).limit(10)
-    top = [{'product_id': r.id, 'name': r.name, 'sold': int(r.sold or 0)} for r in top_q]
-
-    # Slow moving products (low sales and above minimum_stock threshold)
-    slow_q = db.session.query(Product.id, Product.name, Product.quantity, db.func.coalesce(db.func.sum(SalesOrderItem.quantity), 0).label('sold'))\
-        .outerjoin(SalesOrderItem, SalesOrderItem.product_id == Product.id)\
-        .outerjoin(SalesOrder, SalesOrder.id == SalesOrderItem.sales_order_id)\
-        .filter(db.func.date(SalesOrder.order_date) >= since)
-    slow = []
-    for r in slow_q.group_by(Product.id).all():
-        sold = int(r.sold or 0)
-        if sold < 1 and r.quantity > 0:
-            slow.append({'product_id': r.id, 'name': r.name, 'on_hand': r.quantity, 'sold': sold})
+    sold_rows = sorted((r for r in product_rows if r.sold), key=lambda r: r.sold, reverse=True)
+    top = [{'product_id': r.id, 'name': r.name, 'sold': int(r.sold)} for r in sold_rows[:10]]
+
+    # Slow moving products (no sales in the period but still on hand)
+    slow = [{'product_id': r.id, 'name': r.name, 'on_hand': r.quantity, 'sold': int(r.sold or 0)}
+            for r in product_rows if int(r.sold or 0) < 1 and (r.quantity or 0) > 0]
 
     return jsonify({
         'total_sales': float(total_sales),
@@ -318,46 +212,61 @@ def realtime_analytics():
     }), 200
 
 
-@app.route('/api/forecast', methods=['GET'])
+@main_bp.route('/api/forecast', methods=['GET'])
 @login_required
 def forecast():
-    """Simple moving-average forecast per product_id using recent sales orders"""
+    """Forecast per product_id from zero-filled daily sales (moving_average / exponential_smoothing / holt_winters)"""
+    from app import forecasting  # NumPy - ishga tushishda yuklanmaydi
     product_id = request.args.get('product_id', type=int)
     window = request.args.get('window', 7, type=int)
     days = request.args.get('days', 30, type=int)
+    method = request.args.get('method', 'moving_average')
 
     if not product_id:
         return jsonify({'error': 'product_id required'}), 400
-
-    since = datetime.utcnow() - timedelta(days=days)
-
-    # Aggregate daily sold quantities for product
-    # For simplicity assume SalesOrderItem exists and relates to SalesOrder
-    items = db.session.query(SalesOrderItem).join(SalesOrder).filter(
-        SalesOrderItem.product_id == product_id,
-        SalesOrder.order_date >= since
-    ).all()
-
-    # compute daily totals
-    daily = {}
-    for it in items:
-        date = it.sales_order.order_date.date()
-        daily[date] = daily.get(date, 0) + it.quantity
-
-    if not daily:
+    if method not in forecasting.METHODS:
+        return jsonify({'error': 'unknown method', 'methods': list(forecasting.METHODS)}), 400
+    error = forecasting.params_error(days, window)
+    if error:
+        return jsonify({'error': error}), 400
+
+    # Kunlik miqdorlar bitta GROUP BY so'rov bilan (ORM obyektlarsiz)
+    ids, matrix = forecasting.daily_quantity_matrix(days, [product_id])
+    if not matrix.any():
         return jsonify({'product_id': product_id, 'prediction': 0, 'reason': 'no historical data'}), 200
 
-    arr = list(daily.values())
-    # moving average of last `window` days
-    window_vals = arr[-window:]
-    predicted = sum(window_vals) / len(window_vals) if window_vals else 0
+    predicted = float(forecasting.forecast_matrix(matrix, method, window=window)[0])
 
     # persist forecast record
     f = Forecast(product_id=product_id, window_days=window, predicted=predicted)
     db.session.add(f)
     db.session.commit()
 
-    return jsonify({'product_id': product_id, 'predicted': predicted, 'window': window}), 200
+    return jsonify({'product_id': product_id, 'predicted': predicted, 'window': window, 'method': method}), 200
+
+
+@main_bp.route('/api/forecast/batch', methods=['POST'])
+@login_required
+def forecast_batch():
+    """Barcha mahsulotlar uchun prognozni fonda qayta hisoblash"""
+    celery = get_celery()
+    if not celery:
+        return jsonify({'error': 'Celery not configured'}), 500
+
+    from app import forecasting
+
+    data = request.get_json(silent=True) or {}
+    method = data.get('method', 'moving_average')
+    if method not in forecasting.METHODS:
+        return jsonify({'error': 'unknown method', 'methods': list(forecasting.METHODS)}), 400
+    # Noto'g'ri qiymat vazifani ishchida yiqitadi (days=0 -> IndexError) - shu yerda rad etiladi
+    days, window = data.get('days', 90), data.get('window', 7)
+    error = forecasting.params_error(days, window)
+    if error:
+        return jsonify({'error': error}), 400
+
+    task = celery.send_task('batch_forecast', kwargs={'method': method, 'days': days, 'window': window})
+    return jsonify({'task_id': task.id, 'status': 'queued'}), 202
 
 
 def exponential_smoothing(series, alpha=0.5):
@@ -370,39 +279,41 @@ def exponential_smoothing(series, alpha=0.5):
     return s
 
 
-@app.route('/api/forecast_es', methods=['GET'])
+@main_bp.route('/api/forecast_es', methods=['GET'])
 @login_required
 def forecast_es():
     """Exponential smoothing forecast"""
     return jsonify({'status': 'ok'})
 
 
-@app.route('/api/forecast_hw', methods=['GET'])
+@main_bp.route('/api/forecast_hw', methods=['GET'])
 @login_required
 def forecast_hw():
     """Holt-Winters exponential smoothing forecast (more sophisticated)"""
+    from app.forecasting import hw_cache
     days = int(request.args.get('days', 30))
     seasonal_periods = int(request.args.get('seasonal', 7))
 
-    since = datetime.utcnow() - timedelta(days=days)
-    q = db.session.query(SalesOrder.order_date, db.func.sum(SalesOrder.total_amount).label('total'))\
-        .filter(SalesOrder.order_date >= since).group_by(db.func.date(SalesOrder.order_date)).order_by(SalesOrder.order_date.asc())
-    rows = list(q)
-    series = [float(r.total or 0) for r in rows]
+    now = datetime.utcnow()
+    # Kunlik summalar bitta GROUP BY bilan; sotuvsiz kunlar 0 - mavsum hafta kunlariga mos qoladi
+    daily = _daily_sales_totals(now - timedelta(days=days))
+    dates = [(now - timedelta(days=i)).date().isoformat() for i in range(days - 1, -1, -1)]
+    series = [daily.get(d, (0.0, 0))[0] for d in dates]
 
-    if len(series) < seasonal_periods + 2:
+    if len(daily) < seasonal_periods + 2:
         return jsonify({'error': 'Not enough data for Holt-Winters', 'min_required': seasonal_periods + 2}), 400
 
     try:
-        # Fit Holt-Winters with trend and seasonal components
-        model = ExponentialSmoothing(series, trend='add', seasonal='add', seasonal_periods=seasonal_periods)
-        fitted = model.fit(optimized=True)
-        forecast_value = float(fitted.forecast(steps=1).iloc[0])
+        # Fit Holt-Winters with trend and seasonal components (keshdan yoki warm start bilan)
+        forecast_value, cache_status = hw_cache.forecast(('sales_total', days), series, dates[-1], seasonal_periods)
         
-        f = Forecast(product_id=None, window_days=days, predicted=forecast_value)
-        db.session.add(f)
-        db.session.commit()
-        return jsonify({'forecast': forecast_value, 'method': 'holt_winters', 'params': {'days': days, 'seasonal': seasonal_periods}})
+        # Keshdan olingan natija allaqachon saqlangan
+        if cache_status != 'hit':
+            f = Forecast(product_id=None, window_days=days, predicted=forecast_value)
+            db.session.add(f)
+            db.session.commit()
+        return jsonify({'forecast': forecast_value, 'method': 'holt_winters', 'cache': cache_status,
+                        'params': {'days': days, 'seasonal': seasonal_periods}})
     except Exception as e:
         return jsonify({'error': f'Holt-Winters fit failed: {str(e)}'}), 400
     # Exponential smoothing forecast using recent daily totals
@@ -421,7 +332,7 @@ def forecast_hw():
     return jsonify({'forecast': forecast_value, 'method': 'exponential_smoothing', 'params': {'alpha': alpha, 'days': days}})
 
 
-@app.route('/api/recommendations', methods=['GET'])
+@main_bp.route('/api/recommendations', methods=['GET'])
 @login_required
 def recommendations():
     """Return simple recommendations: restock, discounts, automation suggestions."""
@@ -456,7 +367,7 @@ def recommendations():
     return jsonify({'restock': restock, 'discounts': discount, 'automation': automation}), 200
 
 
-@app.route('/api/ai/ask', methods=['GET', 'POST'])
+@main_bp.route('/api/ai/ask', methods=['GET', 'POST'])
 @login_required
 def ask_ai():
     """AI assistant Q&A endpoint - use GPT-4 if API key available, fallback to KB"""
@@ -474,7 +385,7 @@ def ask_ai():
     # Try GPT-4 if API key is configured
     if os.getenv('OPENAI_API_KEY'):
         try:
-            response = openai_client.chat.completions.create(
+            response = get_openai_client().chat.completions.create(
                 model='gpt-4',
                 messages=[
                     {
@@ -549,29 +460,24 @@ def send_otp_sms(phone, otp_code):
 
 
 def get_user_permissions(user_id):
-    """Foydalanuvchi ruxsatnomalarini olish"""
-    user = User.query.get(user_id)
-    if user and user.role:
-        return user.role.permissions or {}
-    return {}
+    """Foydalanuvchi ruxsatnomalarini olish (app/permissions keshidan, bazaga so'rovsiz)"""
+    access = permissions.get_access(user_id)
+    return access['permissions'] if access else {}
 
 
 def check_permission(user_id, module, action='read'):
     """Ruxsatnom tekshirish"""
-    permissions = get_user_permissions(user_id)
-    if module in permissions:
-        return action in permissions[module]
-    return False
+    return permissions.check_permission(user_id, module, action)
 
-@app.route('/')
+@main_bp.route('/')
 def index():
     """Bosh sahifa"""
     if 'user_id' not in session:
-        return redirect(url_for('login'))
-    return redirect(url_for('dashboard'))
+        return redirect(url_for('main.login'))
+    return redirect(url_for('main.dashboard'))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@main_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """Ro'yxatdan o'tish"""
     if request.method == 'POST':
@@ -593,7 +499,7 @@ def register():
     return render_template('register.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@main_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Kirish"""
     if request.method == 'POST':
@@ -612,21 +518,21 @@ def login():
     return render_template('login.html')
 
 
-@app.route('/logout')
+@main_bp.route('/logout')
 def logout():
     """Chiqish"""
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
 
-@app.route('/dashboard')
+@main_bp.route('/dashboard')
 @login_required
 def dashboard():
     """Asosiy dashboard"""
     total_customers = Customer.query.count()
     total_suppliers = Supplier.query.count()
     total_products = Product.query.count()
-    total_sales = db.session.query(db.func.sum(SalesOrder.total_amount)).scalar() or 0
+    total_sales = rollup.period_totals()['amount']
     total_purchases = db.session.query(db.func.sum(PurchaseOrder.total_amount)).scalar() or 0
     
     return render_template('dashboard.html', 
@@ -639,10 +545,11 @@ def dashboard():
 
 # ==================== ASYNC TASK ENDPOINTS ====================
 
-@app.route('/api/export/sales-report', methods=['POST'])
+@main_bp.route('/api/export/sales-report', methods=['POST'])
 @login_required
 def export_sales_report_async():
     """Async export of sales report to Excel"""
+    celery = get_celery()
     if not celery:
         return jsonify({'error': 'Celery not configured'}), 500
     
@@ -655,10 +562,11 @@ def export_sales_report_async():
     return jsonify({'task_id': task.id, 'status': 'queued'}), 202
 
 
-@app.route('/api/forecast/async', methods=['POST'])
+@main_bp.route('/api/forecast/async', methods=['POST'])
 @login_required
 def forecast_async():
     """Async forecast computation"""
+    celery = get_celery()
     if not celery:
         return jsonify({'error': 'Celery not configured'}), 500
     
@@ -666,15 +574,20 @@ def forecast_async():
     product_id = data.get('product_id')
     method = data.get('method', 'holt_winters')
     days = data.get('days', 30)
+    from app.forecasting import params_error
+    error = params_error(days)
+    if error:
+        return jsonify({'error': error}), 400
     
     task = celery.send_task('compute_forecast', args=[product_id, method, days])
     return jsonify({'task_id': task.id, 'status': 'queued'}), 202
 
 
-@app.route('/api/ingest/async', methods=['POST'])
+@main_bp.route('/api/ingest/async', methods=['POST'])
 @login_required
 def ingest_async():
     """Async data ingestion and validation"""
+    celery = get_celery()
     if not celery:
         return jsonify({'error': 'Celery not configured'}), 500
     
@@ -691,10 +604,11 @@ def ingest_async():
     return jsonify({'ingest_id': ingest.id, 'task_id': task.id, 'status': 'queued'}), 202
 
 
-@app.route('/api/task/<task_id>', methods=['GET'])
+@main_bp.route('/api/task/<task_id>', methods=['GET'])
 @login_required
 def get_task_status(task_id):
     """Get status of async task"""
+    celery = get_celery()
     if not celery:
         return jsonify({'error': 'Celery not configured'}), 500
     
@@ -716,7 +630,7 @@ def get_task_status(task_id):
     return jsonify(response)
 
 
-@app.route('/api/integrations/telegram/webhook', methods=['POST'])
+@main_bp.route('/api/integrations/telegram/webhook', methods=['POST'])
 def telegram_webhook():
     """Telegram webhook receiver. Configure in Telegram Bot settings to point here."""
     data = request.get_json(force=True, silent=True) or {}
@@ -731,6 +645,8 @@ def telegram_webhook():
         text = message.get('text') if isinstance(message, dict) else None
         if bot_token and chat_id and text:
             reply = os.getenv('TELEGRAM_AUTOREPLY', 'Rahmat, xabaringiz qabul qilindi.')
+            import requests
+
             url = f'https://api.telegram.org/bot{bot_token}/sendMessage'
             requests.post(url, json={'chat_id': chat_id, 'text': reply})
     except Exception as e:
@@ -739,7 +655,7 @@ def telegram_webhook():
     return jsonify({'status': 'ok'}), 200
 
 
-@app.route('/api/integrations/payments/notify', methods=['POST'])
+@main_bp.route('/api/integrations/payments/notify', methods=['POST'])
 @api_key_required
 def payments_notify():
     """Payment gateway callback. Records payment and triggers post-processing."""
@@ -751,7 +667,7 @@ def payments_notify():
     status = data.get('status', 'unknown')
     metadata = data.get('metadata', {})
 
-    p = Payment(provider=provider, provider_id=provider_id, amount=amount, currency=currency, status=status, metadata=metadata)
+    p = Payment(provider=provider, provider_id=provider_id, amount=amount, currency=currency, status=status, meta=metadata)
     db.session.add(p)
     db.session.commit()
 
@@ -760,7 +676,7 @@ def payments_notify():
     return jsonify({'status': 'recorded', 'payment_id': p.id}), 200
 
 
-@app.route('/api/integrations/mobile/push', methods=['POST'])
+@main_bp.route('/api/integrations/mobile/push', methods=['POST'])
 @api_key_required
 def mobile_push():
     """Stub endpoint to send mobile push notifications (FCM/APNs)."""
@@ -775,54 +691,62 @@ def mobile_push():
     return jsonify({'status': 'queued'}), 202
 
 
-@app.route('/api/realtime/stream')
+@main_bp.route('/api/realtime/stream')
 @api_key_required
 def realtime_stream():
     """Server-Sent Events stream for realtime updates (development).
     Client should connect with `X-API-KEY` header or ?api_key=..."""
+    # Brauzer qayta ulanganda Last-Event-ID ni o'zi yuboradi
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        events = event_broker.subscribe(int(last_event_id) if last_event_id else None)
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID butun son bo\'lishi kerak'}), 400
+    except TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503
+
     def event_stream():
-        last_index = 0
-        while True:
-            with events_cond:
-                if not events_queue:
-                    events_cond.wait(timeout=30)
-                # yield all events
-                while events_queue:
-                    ev = events_queue.popleft()
-                    yield f"event: {ev['type']}\n"
-                    yield f"data: {json.dumps(ev['payload'])}\n\n"
-            time.sleep(0.1)
-
-    return app.response_class(event_stream(), mimetype='text/event-stream')
-
-
-@app.route('/api/realtime/publish', methods=['POST'])
+        for event in events:
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            event_id, event_type, payload = event
+            yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(payload)}\n\n"
+
+    response = current_app.response_class(event_stream(), mimetype='text/event-stream')
+    # Uzilganda (oqim boshlanmagan bo'lsa ham) obunachi o'rni bo'shatiladi
+    response.call_on_close(events.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@main_bp.route('/api/realtime/publish', methods=['POST'])
 @api_key_required
 def realtime_publish():
     data = request.get_json(force=True, silent=True) or {}
     event_type = data.get('type', 'custom')
     payload = data.get('payload', {})
-    publish_event(event_type, payload)
-    return jsonify({'status': 'published'}), 200
+    event_id = publish_event(event_type, payload)
+    return jsonify({'status': 'published', 'id': event_id}), 200
 
 
 # ==================== CUSTOMER ROUTES ====================
 
-@app.route('/api/customers', methods=['GET', 'POST'])
+@main_bp.route('/api/customers', methods=['GET', 'POST'])
 @login_required
 def manage_customers():
     """Mijozlarni boshqarish"""
     if request.method == 'GET':
-        customers = Customer.query.all()
-        return jsonify([{
-            'id': c.id,
-            'name': c.name,
-            'phone': c.phone,
-            'email': c.email,
-            'address': c.address,
-            'inn': c.inn,
-            'credit_limit': c.credit_limit
-        } for c in customers])
+        return keyset_paginate(Customer.query, Customer, {
+            'id': None,
+            'name': None,
+            'phone': None,
+            'email': None,
+            'address': None,
+            'inn': None,
+            'credit_limit': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -839,7 +763,7 @@ def manage_customers():
         return jsonify({'id': customer.id, 'message': 'Mijoz qo\'shildi'}), 201
 
 
-@app.route('/api/customers/<int:customer_id>', methods=['GET', 'PUT', 'DELETE'])
+@main_bp.route('/api/customers/<int:customer_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
 def customer_detail(customer_id):
     """Bir mijozning ma'lumotlari"""
@@ -875,21 +799,20 @@ def customer_detail(customer_id):
 
 # ==================== SUPPLIER ROUTES ====================
 
-@app.route('/api/suppliers', methods=['GET', 'POST'])
+@main_bp.route('/api/suppliers', methods=['GET', 'POST'])
 @login_required
 def manage_suppliers():
     """Etkazuvchilarni boshqarish"""
     if request.method == 'GET':
-        suppliers = Supplier.query.all()
-        return jsonify([{
-            'id': s.id,
-            'name': s.name,
-            'phone': s.phone,
-            'email': s.email,
-            'address': s.address,
-            'inn': s.inn,
-            'bank_account': s.bank_account
-        } for s in suppliers])
+        return keyset_paginate(Supplier.query, Supplier, {
+            'id': None,
+            'name': None,
+            'phone': None,
+            'email': None,
+            'address': None,
+            'inn': None,
+            'bank_account': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -906,7 +829,7 @@ def manage_suppliers():
         return jsonify({'id': supplier.id, 'message': 'Etkazuvchi qo\'shildi'}), 201
 
 
-@app.route('/api/suppliers/<int:supplier_id>', methods=['GET', 'PUT', 'DELETE'])
+@main_bp.route('/api/suppliers/<int:supplier_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
 def supplier_detail(supplier_id):
     """Bir etkazuvchining ma'lumotlari"""
@@ -942,23 +865,22 @@ def supplier_detail(supplier_id):
 
 # ==================== PRODUCT ROUTES ====================
 
-@app.route('/api/products', methods=['GET', 'POST'])
+@main_bp.route('/api/products', methods=['GET', 'POST'])
 @login_required
 def manage_products():
     """Mahsulotlarni boshqarish"""
     if request.method == 'GET':
-        products = Product.query.all()
-        return jsonify([{
-            'id': p.id,
-            'code': p.code,
-            'name': p.name,
-            'category': p.category,
-            'unit': p.unit,
-            'purchase_price': p.purchase_price,
-            'sale_price': p.sale_price,
-            'quantity': p.quantity,
-            'minimum_quantity': p.minimum_quantity
-        } for p in products])
+        return keyset_paginate(Product.query, Product, {
+            'id': None,
+            'code': None,
+            'name': None,
+            'category': None,
+            'unit': None,
+            'purchase_price': None,
+            'sale_price': None,
+            'quantity': None,
+            'minimum_quantity': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -978,7 +900,7 @@ def manage_products():
         return jsonify({'id': product.id, 'message': 'Mahsulot qo\'shildi'}), 201
 
 
-@app.route('/api/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
+@main_bp.route('/api/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
 def product_detail(product_id):
     """Bir mahsulotning ma'lumotlari"""
@@ -1020,23 +942,23 @@ def product_detail(product_id):
 
 # ==================== SALES ORDER ROUTES ====================
 
-@app.route('/api/sales-orders', methods=['GET', 'POST'])
+@main_bp.route('/api/sales-orders', methods=['GET', 'POST'])
 @login_required
 def manage_sales_orders():
     """Sotuvlar buyurtmalarini boshqarish"""
     if request.method == 'GET':
-        orders = SalesOrder.query.all()
-        return jsonify([{
-            'id': o.id,
-            'number': o.number,
-            'customer_id': o.customer_id,
-            'customer_name': o.customer.name,
-            'order_date': o.order_date.isoformat(),
-            'total_amount': o.total_amount,
-            'discount': o.discount,
-            'tax_amount': o.tax_amount,
-            'status': o.status
-        } for o in orders])
+        return keyset_paginate(SalesOrder.query, SalesOrder, {
+            'id': None,
+            'number': None,
+            'customer_id': None,
+            'customer_name': lambda o: o.customer.name,
+            'order_date': iso_field('order_date'),
+            'total_amount': None,
+            'discount': None,
+            'tax_amount': None,
+            'status': None
+        }, depends={'customer_name': ['customer_id']},
+           eager={'customer_name': query_options.sales_order_customer})
 
     if request.method == 'POST':
         data = request.json
@@ -1053,11 +975,11 @@ def manage_sales_orders():
         return jsonify({'id': order.id, 'number': order.number, 'message': 'Buyurtma qo\'shildi'}), 201
 
 
-@app.route('/api/sales-orders/<int:order_id>', methods=['GET', 'PUT', 'DELETE'])
+@main_bp.route('/api/sales-orders/<int:order_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
 def sales_order_detail(order_id):
     """Bir sotuvlar buyurtmasining ma'lumotlari"""
-    order = SalesOrder.query.get_or_404(order_id)
+    order = SalesOrder.query.options(*query_options.sales_order_detail()).get_or_404(order_id)
 
     if request.method == 'GET':
         return jsonify({
@@ -1097,21 +1019,21 @@ def sales_order_detail(order_id):
 
 # ==================== PURCHASE ORDER ROUTES ====================
 
-@app.route('/api/purchase-orders', methods=['GET', 'POST'])
+@main_bp.route('/api/purchase-orders', methods=['GET', 'POST'])
 @login_required
 def manage_purchase_orders():
     """Sotib olish buyurtmalarini boshqarish"""
     if request.method == 'GET':
-        orders = PurchaseOrder.query.all()
-        return jsonify([{
-            'id': o.id,
-            'number': o.number,
-            'supplier_id': o.supplier_id,
-            'supplier_name': o.supplier.name,
-            'order_date': o.order_date.isoformat(),
-            'total_amount': o.total_amount,
-            'status': o.status
-        } for o in orders])
+        return keyset_paginate(PurchaseOrder.query, PurchaseOrder, {
+            'id': None,
+            'number': None,
+            'supplier_id': None,
+            'supplier_name': lambda o: o.supplier.name,
+            'order_date': iso_field('order_date'),
+            'total_amount': None,
+            'status': None
+        }, depends={'supplier_name': ['supplier_id']},
+           eager={'supplier_name': query_options.purchase_order_supplier})
 
     if request.method == 'POST':
         data = request.json
@@ -1126,11 +1048,11 @@ def manage_purchase_orders():
         return jsonify({'id': order.id, 'number': order.number, 'message': 'Buyurtma qo\'shildi'}), 201
 
 
-@app.route('/api/purchase-orders/<int:order_id>', methods=['GET', 'PUT', 'DELETE'])
+@main_bp.route('/api/purchase-orders/<int:order_id>', methods=['GET', 'PUT', 'DELETE'])
 @login_required
 def purchase_order_detail(order_id):
     """Bir sotib olish buyurtmasining ma'lumotlari"""
-    order = PurchaseOrder.query.get_or_404(order_id)
+    order = PurchaseOrder.query.options(*query_options.purchase_order_detail()).get_or_404(order_id)
 
     if request.method == 'GET':
         return jsonify({
@@ -1165,18 +1087,17 @@ def purchase_order_detail(order_id):
 
 # ==================== INVENTORY ROUTES ====================
 
-@app.route('/api/inventory', methods=['GET', 'POST'])
+@main_bp.route('/api/inventory', methods=['GET', 'POST'])
 @login_required
 def manage_inventory():
     """Inventarizatsiyani boshqarish"""
     if request.method == 'GET':
-        inventories = Inventory.query.all()
-        return jsonify([{
-            'id': i.id,
-            'number': i.number,
-            'inventory_date': i.inventory_date.isoformat(),
-            'status': i.status
-        } for i in inventories])
+        return keyset_paginate(Inventory.query, Inventory, {
+            'id': None,
+            'number': None,
+            'inventory_date': iso_field('inventory_date'),
+            'status': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -1189,21 +1110,20 @@ def manage_inventory():
         return jsonify({'id': inventory.id, 'number': inventory.number, 'message': 'Inventarizatsiya qo\'shildi'}), 201
 
 
-@app.route('/api/inventory/<int:inv_id>/items', methods=['GET', 'POST'])
+@main_bp.route('/api/inventory/<int:inv_id>/items', methods=['GET', 'POST'])
 @login_required
 def inventory_items(inv_id):
     """Inventarizatsiya elementlarini boshqarish"""
     inventory = Inventory.query.get_or_404(inv_id)
 
     if request.method == 'GET':
-        items = InventoryItem.query.filter_by(inventory_id=inv_id).all()
-        return jsonify([{
-            'id': item.id,
-            'product_code': item.product_code,
-            'expected_quantity': item.expected_quantity,
-            'actual_quantity': item.actual_quantity,
-            'difference': item.difference
-        } for item in items])
+        return keyset_paginate(InventoryItem.query.filter_by(inventory_id=inv_id), InventoryItem, {
+            'id': None,
+            'product_code': None,
+            'expected_quantity': None,
+            'actual_quantity': None,
+            'difference': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -1222,21 +1142,21 @@ def inventory_items(inv_id):
 
 # ==================== INVOICE ROUTES ====================
 
-@app.route('/api/invoices', methods=['GET', 'POST'])
+@main_bp.route('/api/invoices', methods=['GET', 'POST'])
 @login_required
 def manage_invoices():
     """Hisob-fakturalarni boshqarish"""
     if request.method == 'GET':
-        invoices = Invoice.query.all()
-        return jsonify([{
-            'id': i.id,
-            'number': i.number,
-            'customer_name': i.customer.name,
-            'invoice_date': i.invoice_date.isoformat(),
-            'total_amount': i.total_amount,
-            'paid_amount': i.paid_amount,
-            'status': i.status
-        } for i in invoices])
+        return keyset_paginate(Invoice.query, Invoice, {
+            'id': None,
+            'number': None,
+            'customer_name': lambda i: i.customer.name,
+            'invoice_date': iso_field('invoice_date'),
+            'total_amount': None,
+            'paid_amount': None,
+            'status': None
+        }, depends={'customer_name': ['customer_id']},
+           eager={'customer_name': query_options.invoice_customer})
 
     if request.method == 'POST':
         data = request.json
@@ -1255,19 +1175,18 @@ def manage_invoices():
 
 # ==================== CASH REGISTER ROUTES ====================
 
-@app.route('/api/cash-registers', methods=['GET', 'POST'])
+@main_bp.route('/api/cash-registers', methods=['GET', 'POST'])
 @login_required
 def manage_cash_registers():
     """Kasallarni boshqarish"""
     if request.method == 'GET':
-        registers = CashRegister.query.all()
-        return jsonify([{
-            'id': r.id,
-            'name': r.name,
-            'code': r.code,
-            'balance': r.balance,
-            'currency': r.currency
-        } for r in registers])
+        return keyset_paginate(CashRegister.query, CashRegister, {
+            'id': None,
+            'name': None,
+            'code': None,
+            'balance': None,
+            'currency': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -1282,61 +1201,71 @@ def manage_cash_registers():
         return jsonify({'id': register.id, 'message': 'Kassa qo\'shildi'}), 201
 
 
-@app.route('/api/cash-transactions', methods=['GET', 'POST'])
+@main_bp.route('/api/cash-transactions', methods=['GET', 'POST'])
 @login_required
 def manage_cash_transactions():
     """Kassa operatsiyalari"""
     if request.method == 'GET':
-        transactions = CashTransaction.query.all()
-        return jsonify([{
-            'id': t.id,
-            'cash_register_id': t.cash_register_id,
-            'transaction_date': t.transaction_date.isoformat(),
-            'transaction_type': t.transaction_type,
-            'amount': t.amount,
-            'description': t.description,
-            'reference': t.reference
-        } for t in transactions])
+        return keyset_paginate(CashTransaction.query, CashTransaction, {
+            'id': None,
+            'cash_register_id': None,
+            'transaction_date': iso_field('transaction_date'),
+            'transaction_type': None,
+            'amount': None,
+            'description': None,
+            'reference': None
+        })
 
     if request.method == 'POST':
         data = request.json
-        transaction = CashTransaction(
-            cash_register_id=data.get('cash_register_id'),
-            transaction_type=data.get('transaction_type'),
-            amount=data.get('amount'),
-            description=data.get('description'),
-            reference=data.get('reference')
-        )
-        
-        # Kassa balansini yangilash
-        register = CashRegister.query.get(data.get('cash_register_id'))
-        if transaction.transaction_type == 'Kirim':
-            register.balance += transaction.amount
-        else:
-            register.balance -= transaction.amount
-        
-        db.session.add(transaction)
+        try:
+            # Balans `balance = balance + :delta` bilan, operatsiya bilan bitta tranzaksiyada
+            (transaction,), _ = cash.post_transactions([data])
+        except cash.CashTransactionError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         db.session.commit()
         return jsonify({'id': transaction.id, 'message': 'Operatsiya qo\'shildi'}), 201
 
 
+@main_bp.route('/api/cash-transactions/batch', methods=['POST'])
+@login_required
+def batch_cash_transactions():
+    """Bir nechta kassa operatsiyasini bitta commit bilan o'tkazish"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('transactions'), list):
+        return jsonify({'error': 'transactions ro\'yxati (obyekt ichida) kerak'}), 400
+    try:
+        transactions, deltas = cash.post_transactions(data['transactions'])
+        result = cash.balances(list(deltas))
+    except cash.CashTransactionError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    return jsonify({
+        'ids': [t.id for t in transactions],
+        'count': len(transactions),
+        'balances': {str(rid): balance for rid, balance in result.items()},
+        'message': 'Operatsiyalar qo\'shildi'
+    }), 201
+
+
 # ==================== EXPENSE ROUTES ====================
 
-@app.route('/api/expenses', methods=['GET', 'POST'])
+@main_bp.route('/api/expenses', methods=['GET', 'POST'])
 @login_required
 def manage_expenses():
     """Xarajatlarni boshqarish"""
     if request.method == 'GET':
-        expenses = Expense.query.all()
-        return jsonify([{
-            'id': e.id,
-            'number': e.number,
-            'category': e.category,
-            'amount': e.amount,
-            'expense_date': e.expense_date.isoformat(),
-            'payment_method': e.payment_method,
-            'status': e.status
-        } for e in expenses])
+        return keyset_paginate(Expense.query, Expense, {
+            'id': None,
+            'number': None,
+            'category': None,
+            'amount': None,
+            'expense_date': iso_field('expense_date'),
+            'payment_method': None,
+            'status': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -1355,52 +1284,70 @@ def manage_expenses():
 
 # ==================== ACCOUNTING ROUTES ====================
 
-@app.route('/api/journal-entries', methods=['GET', 'POST'])
+@main_bp.route('/api/journal-entries', methods=['GET', 'POST'])
 @login_required
 def manage_journal_entries():
     """Bухgалтерия jurnali"""
     if request.method == 'GET':
-        entries = JournalEntry.query.all()
-        return jsonify([{
-            'id': e.id,
-            'entry_number': e.entry_number,
-            'entry_date': e.entry_date.isoformat(),
-            'debit_account': e.debit_account,
-            'credit_account': e.credit_account,
-            'amount': e.amount,
-            'description': e.description,
-            'status': e.status
-        } for e in entries])
+        return keyset_paginate(JournalEntry.query, JournalEntry, {
+            'id': None,
+            'entry_number': None,
+            'entry_date': iso_field('entry_date'),
+            'debit_account': None,
+            'credit_account': None,
+            'amount': None,
+            'description': None,
+            'status': None
+        })
 
     if request.method == 'POST':
         data = request.json
+        debit_account, credit_account = data.get('debit_account'), data.get('credit_account')
+        if not debit_account or not credit_account or debit_account == credit_account:
+            return jsonify({'error': 'debit_account va credit_account har xil bo\'lishi kerak'}), 400
+        try:
+            amount = float(data.get('amount'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'amount raqam bo\'lishi kerak'}), 400
+        # NaN/Infinity hisob qoldiqlari va kunlik yig'indilarga yozilmasin (NaN <= 0 False)
+        if not math.isfinite(amount):
+            return jsonify({'error': 'amount chekli son bo\'lishi kerak'}), 400
+        if amount <= 0:
+            return jsonify({'error': 'amount musbat bo\'lishi kerak'}), 400
+        found = {code for (code,) in db.session.query(Account.code)
+                 .filter(Account.code.in_([debit_account, credit_account]))}
+        missing = sorted({debit_account, credit_account} - found)
+        if missing:
+            return jsonify({'error': f"Noma'lum hisob: {', '.join(missing)}"}), 400
+
         entry = JournalEntry(
             entry_number=f"JE-{datetime.utcnow().timestamp()}",
-            debit_account=data.get('debit_account'),
-            credit_account=data.get('credit_account'),
-            amount=data.get('amount'),
+            entry_date=datetime.fromisoformat(data['entry_date']) if data.get('entry_date') else datetime.utcnow(),
+            debit_account=debit_account,
+            credit_account=credit_account,
+            amount=amount,
             description=data.get('description'),
             status=data.get('status', 'Yangi')
         )
+        # Hisob qoldiqlari shu commit ichida yangilanadi (app/ledger.py)
         db.session.add(entry)
         db.session.commit()
         return jsonify({'id': entry.id, 'message': 'Journal qo\'shildi'}), 201
 
 
-@app.route('/api/accounts', methods=['GET', 'POST'])
+@main_bp.route('/api/accounts', methods=['GET', 'POST'])
 @login_required
 def manage_accounts():
     """Bухgалтерия hisoblarini boshqarish"""
     if request.method == 'GET':
-        accounts = Account.query.all()
-        return jsonify([{
-            'id': a.id,
-            'code': a.code,
-            'name': a.name,
-            'account_type': a.account_type,
-            'balance': a.balance,
-            'currency': a.currency
-        } for a in accounts])
+        return keyset_paginate(Account.query, Account, {
+            'id': None,
+            'code': None,
+            'name': None,
+            'account_type': None,
+            'balance': None,
+            'currency': None
+        })
 
     if request.method == 'POST':
         data = request.json
@@ -1418,11 +1365,11 @@ def manage_accounts():
 
 # ==================== REPORTS ====================
 
-@app.route('/api/reports/dashboard')
+@main_bp.route('/api/reports/dashboard')
 @login_required
 def reports_dashboard():
     """Dashboard hisoboti"""
-    total_sales = db.session.query(db.func.sum(SalesOrder.total_amount)).scalar() or 0
+    total_sales = rollup.period_totals()['amount']
     total_purchases = db.session.query(db.func.sum(PurchaseOrder.total_amount)).scalar() or 0
     total_expenses = db.session.query(db.func.sum(Expense.amount)).scalar() or 0
     cash_balance = db.session.query(db.func.sum(CashRegister.balance)).scalar() or 0
@@ -1436,81 +1383,103 @@ def reports_dashboard():
     })
 
 
-@app.route('/api/reports/sales')
+@main_bp.route('/api/reports/sales')
 @login_required
 def sales_report():
     """Sotuvlar hisoboti"""
-    orders = SalesOrder.query.all()
-    return jsonify([{
-        'id': o.id,
-        'number': o.number,
-        'customer': o.customer.name,
-        'amount': o.total_amount,
-        'discount': o.discount,
-        'date': o.order_date.isoformat(),
-        'status': o.status
-    } for o in orders])
-
-
-@app.route('/api/reports/purchases')
+    return keyset_paginate(SalesOrder.query, SalesOrder, {
+        'id': None,
+        'number': None,
+        'customer': lambda o: o.customer.name,
+        'amount': lambda o: o.total_amount,
+        'discount': None,
+        'date': iso_field('order_date'),
+        'status': None
+    }, depends={'customer': ['customer_id'], 'amount': ['total_amount'], 'date': ['order_date']},
+       eager={'customer': query_options.sales_order_customer})
+
+
+@main_bp.route('/api/reports/purchases')
 @login_required
 def purchases_report():
     """Sotib olish hisoboti"""
-    orders = PurchaseOrder.query.all()
-    return jsonify([{
-        'id': o.id,
-        'number': o.number,
-        'supplier': o.supplier.name,
-        'amount': o.total_amount,
-        'date': o.order_date.isoformat(),
-        'status': o.status
-    } for o in orders])
-
-
-@app.route('/api/reports/inventory-status')
+    return keyset_paginate(PurchaseOrder.query, PurchaseOrder, {
+        'id': None,
+        'number': None,
+        'supplier': lambda o: o.supplier.name,
+        'amount': lambda o: o.total_amount,
+        'date': iso_field('order_date'),
+        'status': None
+    }, depends={'supplier': ['supplier_id'], 'amount': ['total_amount'], 'date': ['order_date']},
+       eager={'supplier': query_options.purchase_order_supplier})
+
+
+@main_bp.route('/api/reports/inventory-status')
 @login_required
 def inventory_status_report():
     """Inventar xolati hisoboti"""
-    products = Product.query.all()
-    return jsonify([{
-        'id': p.id,
-        'code': p.code,
-        'name': p.name,
-        'quantity': p.quantity,
-        'minimum_quantity': p.minimum_quantity,
-        'status': 'Kam qolgan' if p.quantity < p.minimum_quantity else 'Norm'
-    } for p in products])
-
-
-@app.route('/api/reports/financial')
+    return keyset_paginate(Product.query, Product, {
+        'id': None,
+        'code': None,
+        'name': None,
+        'quantity': None,
+        'minimum_quantity': None,
+        'status': lambda p: 'Kam qolgan' if p.quantity < p.minimum_quantity else 'Norm'
+    }, depends={'status': ['quantity', 'minimum_quantity']})
+
+
+@main_bp.route('/api/reports/financial')
 @login_required
 def financial_report():
-    """Moliyaviy hisobot"""
-    accounts = Account.query.all()
-    total_assets = sum([a.balance for a in accounts if a.account_type == 'Asset'])
-    total_liabilities = sum([a.balance for a in accounts if a.account_type == 'Liability'])
+    """Moliyaviy hisobot (?as_of=YYYY-MM-DD - shu kun oxiridagi holat, standart - bugun)"""
+    as_of = request.args.get('as_of')
+    try:
+        day = date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        return jsonify({'error': 'as_of YYYY-MM-DD formatida bo\'lishi kerak'}), 400
+    # Ikkala holat ham bitta manbadan: boshlang'ich qoldiq + shu kungacha provodkalar
+    accounts = ledger.trial_balance(day)['accounts']
+
+    total_assets = sum(a['balance'] for a in accounts if a['type'] == 'Asset')
+    total_liabilities = sum(a['balance'] for a in accounts if a['type'] == 'Liability')
     equity = total_assets - total_liabilities
 
     return jsonify({
+        'as_of': as_of,
         'total_assets': total_assets,
         'total_liabilities': total_liabilities,
         'equity': equity,
         'accounts': [{
-            'code': a.code,
-            'name': a.name,
-            'type': a.account_type,
-            'balance': a.balance
+            'code': a['code'],
+            'name': a['name'],
+            'type': a['type'],
+            'balance': a['balance']
         } for a in accounts]
     })
 
 
+@main_bp.route('/api/reports/trial-balance')
+@login_required
+def trial_balance_report():
+    """Aylanma-saldo qaydnomasi (?date=YYYY-MM-DD, standart - bugun)"""
+    try:
+        as_of = date.fromisoformat(request.args['date']) if request.args.get('date') else None
+    except ValueError:
+        return jsonify({'error': 'date YYYY-MM-DD formatida bo\'lishi kerak'}), 400
+    return jsonify(ledger.trial_balance(as_of))
+
+
 # ==================== DATABASE ====================
 
-def init_db():
+def init_db(app):
     """Database yaratish"""
     with app.app_context():
         db.create_all()
-        
+
+        # Mavjud bazalar uchun versiyalangan migratsiyalar (indekslar va h.k.)
+        from app.migrations import upgrade
+        upgrade(db.engine)
+
         # Default rol yaratish
         if Role.query.count() == 0:
             roles_data = [
@@ -1619,7 +1588,7 @@ def init_db():
 
 
 # TEST FUNKSIYALARI
-def run_tests():
+def run_tests(app):
     """Tizimning barcha komponentlarini test qilish"""
     print("\n" + "="*60)
     print("🧪 TEST SINOVI - SMART SAVDO ILOVASI")
@@ -1630,7 +1599,7 @@ def run_tests():
         print("📊 TEST 1: Database Ulanishi")
         try:
             # Database'ni yaratish
-            init_db()
+            init_db(app)
             user_count = User.query.count()
             print("   ✅ Database qayd'ga olindi")
             print(f"   ✅ Foydalanuvchilar: {user_count}\n")
@@ -1867,16 +1836,21 @@ def run_tests():
     print("   ✅ API Endpoints: TAYYOR")
     print("   ✅ Hisobotlar: TAYYOR")
     print("   ✅ Fayllar: TAYYOR")
-    print("\n🚀 ISHGA TUSHIRISH UCHUN: python app/main.py")
-    print("🧪 TEST UCHUN: python app/main.py --test")
+    print("\n🚀 ISHGA TUSHIRISH UCHUN: python -m app.main")
+    print("🧪 TEST UCHUN: python -m app.main --test")
     print("="*60 + "\n")
 
 
 if __name__ == '__main__':
     import sys
-    
+    from app.factory import create_app
+
+    # Lokal ishlab chiqish serveri. Production: gunicorn -c gunicorn.conf.py app.wsgi:app
+    app = create_app()
     if '--test' in sys.argv:
-        run_tests()
+        run_tests(app)
+    elif '--init-db' in sys.argv:
+        init_db(app)
     else:
-        init_db()
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        init_db(app)
+        app.run(debug=os.getenv('FLASK_DEBUG', 'true').lower() == 'true', host='0.0.0.0', port=5000)
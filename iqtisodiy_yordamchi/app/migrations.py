@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Versiyalangan sxema migratsiyalari
+
+`db.create_all()` mavjud jadvallarga yangi indekslarni qo'shmaydi, shuning
+uchun ishlab turgan bazalar uchun o'zgarishlar shu yerda versiya bo'yicha
+yoziladi. Qo'llangan versiyalar `schema_migrations` jadvalida saqlanadi.
+Barcha statementlar SQLite va PostgreSQL da bir xil ishlaydi. Statement
+o'rnida `fn(conn)` ham bo'lishi mumkin (masalan, `add_column`).
+
+Ishga tushirish: python -m app.migrations
+"""
+
+from datetime import datetime
+import logging
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def add_column(table, column, ddl_type):
+    """ALTER TABLE ... ADD COLUMN - create_all ustunni allaqachon yaratgan bo'lsa o'tkazib yuboriladi"""
+    def apply(conn):
+        if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+    return apply
+
+# (versiya, nomi, statementlar) - faqat oxiriga qo'shiladi, eskilari o'zgartirilmaydi
+MIGRATIONS = [
+    (1, 'hot_filter_indexes', [
+        # main.realtime_analytics, forecast, celery_tasks: order_date oralig'i
+        'CREATE INDEX IF NOT EXISTS ix_sales_order_order_date ON sales_order (order_date)',
+        # buyurtma qatorlari (selectinload) va mahsulot bo'yicha sotuvlar
+        'CREATE INDEX IF NOT EXISTS ix_sales_order_item_order_product ON sales_order_item (sales_order_id, product_id)',
+        'CREATE INDEX IF NOT EXISTS ix_sales_order_item_product_order ON sales_order_item (product_id, sales_order_id)',
+        # celery_tasks QQS hisoboti: invoice_date oralig'i
+        'CREATE INDEX IF NOT EXISTS ix_invoice_invoice_date ON invoice (invoice_date)',
+        # deklaratsiya (faqat sana) va oylik (category = 'Salary' + sana)
+        'CREATE INDEX IF NOT EXISTS ix_expense_expense_date ON expense (expense_date)',
+        'CREATE INDEX IF NOT EXISTS ix_expense_category_date ON expense (category, expense_date)',
+        'CREATE INDEX IF NOT EXISTS ix_cash_transaction_register_date ON cash_transaction (cash_register_id, transaction_date)',
+        # routes_tax tarixi: report_type + created_at DESC
+        'CREATE INDEX IF NOT EXISTS ix_report_type_created ON report (report_type, created_at)',
+        'CREATE INDEX IF NOT EXISTS ix_validation_report_ingest_id ON validation_report (ingest_id)',
+        'CREATE INDEX IF NOT EXISTS ix_inventory_log_product_created ON inventory_log (product_id, created_at)',
+    ]),
+    # daily_sales_rollup jadvalini create_all yaratadi; mavjud savdolarni yig'ish (app/rollup.rebuild bilan bir xil)
+    (2, 'daily_sales_rollup_backfill', [
+        'DELETE FROM daily_sales_rollup',
+        'INSERT INTO daily_sales_rollup (day, product_id, customer_id, orders, qty, amount, discount, tax_amount) '
+        'SELECT date(order_date), NULL, customer_id, COUNT(id), 0, COALESCE(SUM(total_amount), 0), '
+        'COALESCE(SUM(discount), 0), COALESCE(SUM(tax_amount), 0) '
+        'FROM sales_order GROUP BY date(order_date), customer_id',
+        'INSERT INTO daily_sales_rollup (day, product_id, customer_id, orders, qty, amount, discount, tax_amount) '
+        'SELECT date(o.order_date), i.product_id, o.customer_id, 0, SUM(i.quantity), '
+        'SUM(i.quantity * i.unit_price * (1 - COALESCE(i.discount, 0) / 100.0)), 0, 0 '
+        'FROM sales_order_item i JOIN sales_order o ON o.id = i.sales_order_id '
+        'GROUP BY date(o.order_date), i.product_id, o.customer_id',
+    ]),
+    # Provodkalar endi Account.balance ni yangilaydi; eski jurnal aylanmalari bir marta qo'shiladi
+    (3, 'ledger_daily_totals_backfill', [
+        'DELETE FROM account_balance_snapshot',
+        'DELETE FROM account_daily_total',
+        'INSERT INTO account_daily_total (account_code, day, debit, credit) '
+        'SELECT debit_account, date(entry_date), SUM(amount), 0 FROM journal_entry '
+        'WHERE debit_account IS NOT NULL GROUP BY debit_account, date(entry_date)',
+        'INSERT INTO account_daily_total (account_code, day, debit, credit) '
+        'SELECT credit_account, date(entry_date), 0, SUM(amount) FROM journal_entry '
+        'WHERE credit_account IS NOT NULL GROUP BY credit_account, date(entry_date)',
+        "UPDATE account SET balance = COALESCE(balance, 0) + COALESCE(("
+        "SELECT CASE WHEN account.account_type IN ('Asset', 'Expense') "
+        "THEN SUM(t.debit - t.credit) ELSE SUM(t.credit - t.debit) END "
+        "FROM account_daily_total t WHERE t.account_code = account.code), 0)",
+    ]),
+    # Delta sync: mavjud qatorlar jurnalga yoziladi - since=0 to'liq boshlang'ich yuklashni beradi
+    (4, 'sync_change_backfill', [
+        "INSERT INTO sync_change (table_name, row_id, created_at) SELECT 'customers', id, CURRENT_TIMESTAMP FROM customer",
+        "INSERT INTO sync_change (table_name, row_id, created_at) SELECT 'products', id, CURRENT_TIMESTAMP FROM product",
+        "INSERT INTO sync_change (table_name, row_id, created_at) "
+        "SELECT 'sales_orders', id, CURRENT_TIMESTAMP FROM sales_order",
+    ]),
+    # Sync token commit tartibida (sync_change.seq); eski tokenlar (id) yaroqli qoladi - seq = id
+    (5, 'sync_change_commit_sequence', [
+        add_column('sync_change', 'seq', 'BIGINT'),
+        'UPDATE sync_change SET seq = id WHERE seq IS NULL',
+        'CREATE INDEX IF NOT EXISTS ix_sync_change_seq ON sync_change (seq)',
+        'INSERT INTO sync_sequence (id, value) SELECT 1, 0 WHERE NOT EXISTS (SELECT 1 FROM sync_sequence WHERE id = 1)',
+        'UPDATE sync_sequence SET value = (SELECT COALESCE(MAX(seq), 0) FROM sync_change) '
+        'WHERE id = 1 AND value < (SELECT COALESCE(MAX(seq), 0) FROM sync_change)',
+    ]),
+]
+
+
+def applied_versions(conn):
+    """Qo'llangan migratsiya versiyalari"""
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)'
+    ))
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def upgrade(engine):
+    """Qo'llanmagan migratsiyalarni tartib bilan, har birini alohida tranzaksiyada qo'llash"""
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(text(statement))
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                {'v': version, 'n': name, 't': datetime.utcnow()}
+            )
+        logger.info(f"Migratsiya qo'llandi: {version:04d}_{name}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    from app.extensions import db
+    from app.factory import create_app
+
+    with create_app().app_context():
+        db.create_all()
+        versions = upgrade(db.engine)
+        print(f"✅ Qo'llangan migratsiyalar: {versions}" if versions else "✅ Yangi migratsiya yo'q")
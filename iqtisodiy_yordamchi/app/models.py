@@ -92,6 +92,10 @@ class SalesOrder(db.Model):
     items = db.relationship('SalesOrderItem', backref='sales_order', lazy=True, cascade='all, delete-orphan')
     invoices = db.relationship('Invoice', backref='sales_order', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_sales_order_order_date', 'order_date'),
+    )
+
 class SalesOrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     sales_order_id = db.Column(db.Integer, db.ForeignKey('sales_order.id'), nullable=False)
@@ -100,6 +104,32 @@ class SalesOrderItem(db.Model):
     unit_price = db.Column(db.Float, nullable=False)
     discount = db.Column(db.Float, default=0)
 
+    __table_args__ = (
+        db.Index('ix_sales_order_item_order_product', 'sales_order_id', 'product_id'),
+        db.Index('ix_sales_order_item_product_order', 'product_id', 'sales_order_id'),
+    )
+
+class DailySalesRollup(db.Model):
+    """
+    Kunlik savdo yig'indilari (app/rollup.py yuritadi).
+    product_id NULL - buyurtma darajasidagi qator (orders, amount, discount, tax_amount),
+    aks holda mahsulot qatori (qty, amount = qator summasi).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer)
+    customer_id = db.Column(db.Integer)
+    orders = db.Column(db.Integer, default=0)
+    qty = db.Column(db.Float, default=0)
+    amount = db.Column(db.Float, default=0)
+    discount = db.Column(db.Float, default=0)
+    tax_amount = db.Column(db.Float, default=0)
+
+    __table_args__ = (
+        db.Index('ix_daily_sales_rollup_day_product', 'day', 'product_id', 'customer_id'),
+        db.Index('ix_daily_sales_rollup_product_day', 'product_id', 'day'),
+    )
+
 class PurchaseOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.String(50), unique=True, nullable=False)
@@ -144,6 +174,10 @@ class Invoice(db.Model):
     paid_amount = db.Column(db.Float, default=0)
     status = db.Column(db.String(50), default='Yangi')
 
+    __table_args__ = (
+        db.Index('ix_invoice_invoice_date', 'invoice_date'),
+    )
+
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     provider = db.Column(db.String(50))
@@ -151,7 +185,8 @@ class Payment(db.Model):
     amount = db.Column(db.Float)
     currency = db.Column(db.String(10), default='UZS')
     status = db.Column(db.String(50))
-    metadata = db.Column(db.JSON)
+    # 'metadata' Declarative API da band nom - ustun nomi o'zgarmagan
+    meta = db.Column('metadata', db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class CashRegister(db.Model):
@@ -173,6 +208,10 @@ class CashTransaction(db.Model):
     reference = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_cash_transaction_register_date', 'cash_register_id', 'transaction_date'),
+    )
+
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.String(50), unique=True, nullable=False)
@@ -184,6 +223,11 @@ class Expense(db.Model):
     status = db.Column(db.String(50), default='Yangi')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_expense_expense_date', 'expense_date'),
+        db.Index('ix_expense_category_date', 'category', 'expense_date'),
+    )
+
 class JournalEntry(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     entry_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -204,6 +248,31 @@ class Account(db.Model):
     currency = db.Column(db.String(10), default='UZS')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class AccountDailyTotal(db.Model):
+    """ Hisob bo'yicha kunlik debet/kredit aylanmasi (app/ledger.py yuritadi) """
+    id = db.Column(db.Integer, primary_key=True)
+    account_code = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    debit = db.Column(db.Float, default=0)
+    credit = db.Column(db.Float, default=0)
+
+    __table_args__ = (
+        db.Index('ix_account_daily_total_account_day', 'account_code', 'day'),
+    )
+
+class AccountBalanceSnapshot(db.Model):
+    """ `day` kuni oxiridagi jami debet/kredit (boshidan beri) """
+    id = db.Column(db.Integer, primary_key=True)
+    account_code = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    debit = db.Column(db.Float, default=0)
+    credit = db.Column(db.Float, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('account_code', 'day', name='uq_account_balance_snapshot_account_day'),
+    )
+
 class AIAssistant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.String(500), nullable=False)
@@ -228,6 +297,10 @@ class InventoryLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    __table_args__ = (
+        db.Index('ix_inventory_log_product_created', 'product_id', 'created_at'),
+    )
+
 class OfflineSync(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -237,6 +310,30 @@ class OfflineSync(db.Model):
     pending_changes = db.Column(db.JSON)
     is_synced = db.Column(db.Boolean, default=False)
 
+class SyncChange(db.Model):
+    """ Offline sinxronizatsiya uchun o'zgarishlar jurnali (app/sync_log.py). seq - commit tartibidagi token """
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    # Commit paytida beriladi (SyncSequence); NULL - tranzaksiya hali commit qilinmagan
+    seq = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_sync_change_table_row', 'table_name', 'row_id'),
+        db.Index('ix_sync_change_seq', 'seq'),
+    )
+
+class SyncSequence(db.Model):
+    """ Yagona qator (id=1): oxirgi berilgan SyncChange.seq - commit paytida qulflanadi """
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+class PeriodVersion(db.Model):
+    """ Yopilgan davr ma'lumotlari versiyasi (app/period_summary.py keshi) - o'zgarishda oshiriladi """
+    period = db.Column(db.String(7), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 class SystemConfig(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
@@ -254,6 +351,10 @@ class Report(db.Model):
     chart_type = db.Column(db.String(50))
     export_format = db.Column(db.String(50))
 
+    __table_args__ = (
+        db.Index('ix_report_type_created', 'report_type', 'created_at'),
+    )
+
 class DataIngest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     source = db.Column(db.String(100))
@@ -268,6 +369,10 @@ class ValidationReport(db.Model):
     errors = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_validation_report_ingest_id', 'ingest_id'),
+    )
+
 class Forecast(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer)
@@ -0,0 +1,372 @@
+"""
+Parallel OCR paketlari (batch)
+
+Yuklangan fayllar sahifalarga bo'linadi (ko'p sahifali TIFF; PDF - pdf2image
+o'rnatilgan bo'lsa) va har bir sahifa alohida vazifa sifatida OCR qilinadi.
+Tesseract CPU ga bog'liq, har bir Tesseract jarayoni bitta thread bilan
+ishlaydi (OMP_THREAD_LIMIT=1). Ijrochi (OCR_BATCH_BACKEND):
+  - celery (REDIS_URL redis:// bo'lsa standart): har bir sahifa `ocr_batch_page`
+    Celery vazifasi. Parallellik bitta joyda - worker --concurrency bilan -
+    gunicorn workerlari soniga ko'paymaydi. Vazifalar acks_late: worker
+    o'lsa sahifa qayta bajariladi. OCR_CELERY_JOB_STALE_SECONDS davomida
+    birorta sahifa tugamasa (worker ishlamayapti, navbat tozalangan) `status()`
+    paketni failed deb belgilaydi.
+  - local (brokersiz, bitta jarayonli ishga tushirish): shu jarayondagi
+    ProcessPoolExecutor (OCR_WORKERS yoki yadrolar soni). Paket egasi bo'lgan
+    jarayon heartbeat faylini yangilab turadi; jarayon to'xtasa (gunicorn
+    max_requests bilan qayta ishga tushishi) `status()` paketni
+    OCR_JOB_STALE_SECONDS dan keyin failed deb belgilaydi.
+
+Holat paket papkasidagi fayllarda: job.json (sahifalar ro'yxati, egasi
+user_id) va pages/NNNNN.json (har bir sahifa natijasi, atomar yoziladi) -
+istalgan worker `status()` bilan o'qiy oladi. `submit()` darhol qaytadi.
+
+Tekshirish: python check_ocr_batch.py
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOBS_FOLDER = os.getenv('OCR_JOBS_FOLDER', 'uploads/documents/batches')
+JOB_FILE = 'job.json'
+PAGES_DIR = 'pages'
+HEARTBEAT_FILE = 'heartbeat'
+# local: egasi jarayon heartbeat ni shu oraliqda yangilaydi
+HEARTBEAT_INTERVAL = 5
+# local: heartbeat shuncha sekund yangilanmasa paket failed
+STALE_SECONDS = int(os.getenv('OCR_JOB_STALE_SECONDS', '60'))
+# celery: yuborilgandan yoki oxirgi tugagan sahifadan beri shuncha sekund
+# yangi natija bo'lmasa paket failed (navbatdagi kutish ham shunga kiradi)
+CELERY_STALE_SECONDS = int(os.getenv('OCR_CELERY_JOB_STALE_SECONDS', '900'))
+MULTI_PAGE_FORMATS = ('.tif', '.tiff', '.pdf')
+BACKENDS = ('celery', 'local')
+
+_executor = None
+_executor_lock = threading.Lock()
+# local: shu jarayonda tugamagan sahifalar soni {job_id: n}
+_active = {}
+_active_lock = threading.Lock()
+_heartbeat_thread = None
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+def backend():
+    """OCR_BATCH_BACKEND yoki REDIS_URL bo'yicha: 'celery' | 'local'"""
+    configured = os.getenv('OCR_BATCH_BACKEND', '').lower()
+    if configured in BACKENDS:
+        return configured
+    return 'celery' if os.getenv('REDIS_URL', '').startswith(('redis://', 'rediss://')) else 'local'
+
+
+def pool_size():
+    """OCR_WORKERS yoki shu jarayonga ruxsat berilgan yadrolar soni"""
+    configured = int(os.getenv('OCR_WORKERS', '0'))
+    if configured > 0:
+        return configured
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker():
+    # Tesseract (OpenMP) har jarayonda bitta thread - parallellik jarayonlar soni bilan
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def get_executor():
+    """local: jarayon uchun umumiy pul (birinchi paketda yaratiladi - gunicorn fork dan keyin)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: thread li (gthread) workerdan fork qilish xavfsiz emas
+                _executor = ProcessPoolExecutor(max_workers=pool_size(),
+                                                mp_context=multiprocessing.get_context('spawn'),
+                                                initializer=_init_worker)
+    return _executor
+
+
+# ==================== SAHIFA VAZIFASI ====================
+
+_processors = {}
+
+
+def processor_path(processor_cls):
+    """Celery xabari uchun klass manzili: 'modul:Klass'"""
+    return f'{processor_cls.__module__}:{processor_cls.__qualname__}'
+
+
+def _processor(processor):
+    """Jarayon ichida qayta ishlatiladigan processor (klass yoki 'modul:Klass')"""
+    instance = _processors.get(processor)
+    if instance is None:
+        cls = processor
+        if isinstance(processor, str):
+            module, name = processor.split(':')
+            cls = getattr(importlib.import_module(module), name)
+        instance = _processors[processor] = cls()
+    return instance
+
+
+def _ocr_page(processor, path, page):
+    """Bitta sahifani OCR qilish (pul jarayoni yoki Celery workerida ishlaydi)"""
+    try:
+        result = _processor(processor).extract_invoice_data(path, page=page)
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    return dict(result, file=os.path.basename(path), page=page)
+
+
+def run_page(job_id, processor, index, path, page):
+    """Sahifani OCR qilib natijasini pages/ ga yozish. Muvaffaqiyatni qaytaradi."""
+    _init_worker()
+    result = _ocr_page(processor, path, page)
+    _write_json(_page_file(job_id, index), result)
+    return bool(result.get('success'))
+
+
+# ==================== SAHIFALAR ====================
+
+def page_count(path):
+    """Fayldagi sahifalar soni (aniqlab bo'lmasa 1)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MULTI_PAGE_FORMATS:
+        return 1
+    try:
+        if extension == '.pdf':
+            from pdf2image import pdfinfo_from_path  # ixtiyoriy bog'liqlik
+            return int(pdfinfo_from_path(path)['Pages'])
+        from PIL import Image
+        with Image.open(path) as image:
+            return getattr(image, 'n_frames', 1)
+    except Exception as e:
+        logger.warning(f"Sahifalar sonini aniqlab bo'lmadi ({path}): {e}")
+        return 1
+
+
+def expand_pages(paths):
+    """[(fayl, sahifa)] - har bir sahifa alohida vazifa"""
+    return [(path, page) for path in paths for page in range(page_count(path))]
+
+
+def run(processor_cls, paths):
+    """Fayllarni local pulda parallel OCR qilish va natijalarni tartib bilan qaytarish (bloklaydi)"""
+    tasks = expand_pages(paths)
+    if not tasks:
+        return []
+    executor = get_executor()
+    futures = [executor.submit(_ocr_page, processor_cls, path, page) for path, page in tasks]
+    return [future.result() for future in futures]
+
+
+# ==================== JOBLAR ====================
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def job_folder(job_id):
+    """Paket fayllari va job.json papkasi"""
+    if not _JOB_ID.match(job_id or ''):
+        raise ValueError(f"Noto'g'ri job id: {job_id}")
+    return os.path.join(JOBS_FOLDER, job_id)
+
+
+def _page_file(job_id, index):
+    return os.path.join(job_folder(job_id), PAGES_DIR, f'{index:05d}.json')
+
+
+def _write_json(path, data):
+    """Atomar yozish - boshqa workerlar yarim yozilgan faylni o'qimaydi"""
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def _touch(path):
+    with open(path, 'a'):
+        os.utime(path)
+
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL)
+        with _active_lock:
+            jobs = list(_active)
+        for job_id in jobs:
+            try:
+                _touch(os.path.join(job_folder(job_id), HEARTBEAT_FILE))
+            except OSError as e:
+                logger.warning(f"OCR paketi heartbeat yozilmadi ({job_id}): {e}")
+
+
+def _start_heartbeat():
+    global _heartbeat_thread
+    with _active_lock:
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name='ocr-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def _local_done(job_id, index, path, page, future):
+    """local: pul jarayoni yiqilsa (natija yozilmagan) xato natijasini yozish"""
+    error = future.exception()
+    if error is not None:
+        try:
+            _write_json(_page_file(job_id, index),
+                        {'success': False, 'error': str(error), 'file': os.path.basename(path), 'page': page})
+        except OSError as e:
+            logger.error(f"OCR paketi natijasini yozib bo'lmadi ({job_id}): {e}")
+    with _active_lock:
+        _active[job_id] -= 1
+        if not _active[job_id]:
+            del _active[job_id]
+            logger.info(f"OCR paketi {job_id} tugadi")
+
+
+def _submit_local(job_id, processor_cls, tasks):
+    with _active_lock:
+        _active[job_id] = len(tasks)
+    _start_heartbeat()
+    executor = get_executor()
+    for index, (path, page) in enumerate(tasks):
+        future = executor.submit(run_page, job_id, processor_cls, index, path, page)
+        future.add_done_callback(lambda f, i=index, p=path, n=page: _local_done(job_id, i, p, n, f))
+
+
+def _submit_celery(job_id, processor_cls, tasks):
+    from celery import group
+    from app.celery_tasks import ocr_batch_page
+
+    processor = processor_path(processor_cls)
+    group(ocr_batch_page.s(job_id, processor, index, path, page)
+          for index, (path, page) in enumerate(tasks)).apply_async()
+
+
+def submit(job_id, processor_cls, paths, user_id=None):
+    """
+    Paketni ijrochiga (Celery yoki local pul) yuborish va darhol qaytish.
+
+    Fayllar `job_folder(job_id)` ichida bo'lishi kerak. user_id - paket egasi,
+    status(user_id=...) faqat unga natijalarni qaytaradi.
+    Qaytaradi: boshlang'ich holat (status() bilan bir xil shakl)
+    """
+    folder = job_folder(job_id)
+    tasks = expand_pages(paths)
+    mode = backend()
+    if mode == 'celery':
+        try:
+            from app.celery_tasks import ocr_batch_page  # noqa: F401 - Celery o'rnatilganini tekshirish
+        except ImportError as e:
+            logger.warning(f"Celery mavjud emas, OCR paketi local pulda: {e}")
+            mode = 'local'
+
+    os.makedirs(os.path.join(folder, PAGES_DIR), exist_ok=True)
+    _touch(os.path.join(folder, HEARTBEAT_FILE))
+    _write_json(os.path.join(folder, JOB_FILE), {
+        'job_id': job_id,
+        'user_id': user_id,
+        'backend': mode,
+        'workers': pool_size() if mode == 'local' else None,
+        'tasks': [[path, page] for path, page in tasks],
+        'started_at': datetime.now().isoformat(),
+    })
+    if tasks:
+        if mode == 'celery':
+            _submit_celery(job_id, processor_cls, tasks)
+        else:
+            _submit_local(job_id, processor_cls, tasks)
+    logger.info(f"OCR paketi {job_id}: {len(tasks)} sahifa, ijrochi {mode}")
+    return status(job_id, user_id=user_id)
+
+
+def _mark_failed(folder, job, error):
+    job = dict(job, status='failed', error=error, finished_at=datetime.now().isoformat())
+    _write_json(os.path.join(folder, JOB_FILE), job)
+    logger.error(f"OCR paketi {job['job_id']} to'xtatildi: {error}")
+    return job
+
+
+def status(job_id, include_results=True, user_id=None):
+    """Paket holati (istalgan workerdan) - topilmasa yoki user_id egasi bo'lmasa None"""
+    try:
+        folder = job_folder(job_id)
+    except ValueError:
+        return None
+    try:
+        with open(os.path.join(folder, JOB_FILE), encoding='utf-8') as f:
+            job = json.load(f)
+    except FileNotFoundError:
+        return None
+    if user_id is not None and job.get('user_id') != user_id:
+        return None
+
+    tasks = job['tasks']
+    results = [None] * len(tasks)
+    finished_at = None
+    pages = os.path.join(folder, PAGES_DIR)
+    for name in os.listdir(pages) if os.path.isdir(pages) else []:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(pages, name)
+        with open(path, encoding='utf-8') as f:
+            results[int(name[:-5])] = json.load(f)
+        finished_at = max(finished_at or 0, os.path.getmtime(path))
+
+    total = len(tasks)
+    completed = sum(1 for r in results if r is not None)
+    successful = sum(1 for r in results if r is not None and r.get('success'))
+    state = job.get('status')
+    if completed == total:
+        state = 'completed'
+    elif state != 'failed':
+        # heartbeat submit() da yoziladi; local da egasi jarayon uni yangilab turadi
+        try:
+            last_seen = os.path.getmtime(os.path.join(folder, HEARTBEAT_FILE))
+        except OSError:
+            last_seen = 0
+        if job.get('backend') == 'local':
+            # Egasi jarayon to'xtagan (qayta ishga tushgan) - natijalar endi kelmaydi
+            idle = time.time() - last_seen
+            if idle > STALE_SECONDS:
+                job = _mark_failed(folder, job, f"OCR jarayoni {int(idle)}s javob bermadi (worker qayta ishga tushgan)")
+        else:
+            # Celery: sahifa vazifalari yo'qolgan (worker yo'q, navbat tozalangan)
+            idle = time.time() - max(last_seen, finished_at or 0)
+            if idle > CELERY_STALE_SECONDS:
+                job = _mark_failed(folder, job, f"OCR sahifalari {int(idle)}s davomida bajarilmadi "
+                                                f"(Celery worker ishlamayapti yoki navbat tozalangan)")
+        state = job.get('status')
+
+    state_data = {
+        'job_id': job_id,
+        'status': state or 'running',
+        'backend': job.get('backend'),
+        'total': total,
+        'completed': completed,
+        'successful': successful,
+        'failed': completed - successful,
+        'progress': round(completed / total * 100, 1) if total else 100.0,
+        'workers': job.get('workers'),
+        'started_at': job.get('started_at'),
+        'finished_at': datetime.fromtimestamp(finished_at).isoformat()
+        if completed == total and finished_at else job.get('finished_at'),
+    }
+    if job.get('error'):
+        state_data['error'] = job['error']
+    if include_results:
+        state_data['results'] = results
+    return state_data
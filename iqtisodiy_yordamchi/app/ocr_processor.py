@@ -4,6 +4,13 @@
 OCR (Optical Character Recognition) Moduli
 Qogozi hujjatlarni skanerlash va matn ajratib olish
 Tesseract.js (JavaScript) yoki pytesseract (Python) orqali
+
+Har bir sahifa uchun Tesseract bir marta ishlaydi (`image_to_data`): matn
+so'z qutilaridan (blok/paragraf/qator) qayta yig'iladi, ishonch darajasi
+shu so'zlardan hisoblanadi. OCR_MAX_IMAGE_SIDE dan katta skanlar oldin
+kichraytiriladi va oq-qora (Otsu chegarasi) qilinadi.
+
+Oldin/keyin benchmarki: python benchmark_ocr.py
 """
 
 import pytesseract
@@ -17,6 +24,75 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PDF sahifalarini rasmga aylantirish aniqligi
+PDF_DPI = int(os.getenv('OCR_PDF_DPI', '300'))
+# Tesseract ga beriladigan rasmning eng uzun tomoni (px). A4 300 DPI da ~3500 -
+# undan katta skanlar (600 DPI, telefon kamerasi) tezlik uchun kichraytiriladi
+MAX_IMAGE_SIDE = int(os.getenv('OCR_MAX_IMAGE_SIDE', '3500'))
+
+
+def otsu_threshold(histogram: List[int]) -> int:
+    """Kulrang histogramma uchun Otsu chegarasi (sinflararo dispersiya maksimumi)"""
+    total = sum(histogram)
+    sum_all = sum(i * h for i, h in enumerate(histogram))
+    weight_bg = sum_bg = 0
+    best, threshold = -1.0, 127
+    for i, h in enumerate(histogram):
+        weight_bg += h
+        if not weight_bg:
+            continue
+        weight_fg = total - weight_bg
+        if not weight_fg:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def prepare_image(image, max_side: int = MAX_IMAGE_SIDE):
+    """Katta rasmni kichraytirish va binar (oq-qora) qilish; kichiklari o'zgarmaydi"""
+    if max(image.size) <= max_side:
+        return image
+    gray = image.convert('L')
+    gray.thumbnail((max_side, max_side), Image.LANCZOS)
+    threshold = otsu_threshold(gray.histogram())
+    return gray.point([255 if value > threshold else 0 for value in range(256)], '1')
+
+
+def text_from_data(data: Dict) -> str:
+    """
+    image_to_data so'z qutilaridan matnni tiklash (image_to_string bilan bir xil
+    tartib): so'zlar - bo'sh joy, qatorlar - yangi qator, paragraf/blok - bo'sh qator.
+    """
+    lines, words, line_key, paragraph_key = [], [], None, None
+    for i, word in enumerate(data['text']):
+        word = (word or '').strip()
+        if not word:
+            continue
+        paragraph = (data['page_num'][i], data['block_num'][i], data['par_num'][i])
+        line = paragraph + (data['line_num'][i],)
+        if line != line_key:
+            if words:
+                lines.append(' '.join(words))
+            if paragraph_key is not None and paragraph != paragraph_key:
+                lines.append('')
+            words, line_key, paragraph_key = [], line, paragraph
+        words.append(word)
+    if words:
+        lines.append(' '.join(words))
+    return '\n'.join(lines)
+
+
+def mean_confidence(data: Dict) -> float:
+    """So'zlarning o'rtacha ishonch darajasi (0..1); -1 (so'z bo'lmagan qatorlar) hisobga olinmaydi"""
+    scores = [float(conf) for conf, word in zip(data['conf'], data['text'])
+              if (word or '').strip() and float(conf) > 0]
+    return sum(scores) / len(scores) / 100 if scores else 0.0
+
 class OCRProcessor:
     """OCR (Tesseract) bilan hujjatlarni qayta ishlash"""
     
@@ -30,13 +106,24 @@ class OCRProcessor:
             logger.warning(f"Tesseract OCR o'rnatilmagan: {e}")
             logger.info("O'rnatish: https://github.com/UB-Mannheim/tesseract/wiki")
     
-    def extract_text_from_image(self, image_path: str, lang: str = 'uzb+eng') -> Dict:
+    def _load_image(self, image_path: str, page: int = 0):
+        """Rasm yoki ko'p sahifali fayl (TIFF, PDF) ning bitta sahifasi"""
+        if image_path.lower().endswith('.pdf'):
+            from pdf2image import convert_from_path  # ixtiyoriy bog'liqlik - PDF uchun
+            return convert_from_path(image_path, dpi=PDF_DPI, first_page=page + 1, last_page=page + 1)[0]
+        image = Image.open(image_path)
+        if page:
+            image.seek(page)
+        return image
+    
+    def extract_text_from_image(self, image_path: str, lang: str = 'uzb+eng', page: int = 0) -> Dict:
         """
         Rasmdan matn ajratib olish
         
         Args:
             image_path: Rasm fayilining yo'li
             lang: Tesseract tillar kodi (uzb=O'zbek, eng=English)
+            page: Ko'p sahifali fayldagi sahifa (0 dan)
         
         Returns:
             {'success': bool, 'text': str, 'confidence': float}
@@ -45,33 +132,32 @@ class OCRProcessor:
             if not os.path.exists(image_path):
                 return {'success': False, 'error': f'Fayl topilmadi: {image_path}'}
             
-            # Rasmni ochish
-            image = Image.open(image_path)
+            # Rasmni ochish va katta skanlarni tayyorlash
+            image = self._load_image(image_path, page)
+            original_size = image.size
+            image = prepare_image(image)
             
-            # OCR ni ishga tushirish
-            text = pytesseract.image_to_string(image, lang=lang)
-            
-            # Ma'lumotlarni olish
-            data = pytesseract.image_to_data(image, lang=lang, output_type='dict')
-            confidence = sum([int(c) for c in data['conf'] if int(c) > 0]) / len([c for c in data['conf'] if int(c) > 0]) if len(data['conf']) > 0 else 0
+            # OCR ni bitta marta ishga tushirish - matn ham, ishonch ham so'z qutilaridan
+            data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
             
             logger.info(f"OCR muvaffaqiyatli: {image_path}")
             
             return {
                 'success': True,
-                'text': text.strip(),
-                'confidence': confidence / 100,
+                'text': text_from_data(data).strip(),
+                'confidence': mean_confidence(data),
                 'language': lang,
-                'file': image_path
+                'file': image_path,
+                'preprocessed': image.size != original_size
             }
         
         except Exception as e:
             logger.error(f"OCR xatosi: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def extract_invoice_data(self, image_path: str) -> Dict:
+    def extract_invoice_data(self, image_path: str, page: int = 0) -> Dict:
         """
-        Hisob-fakturadan ma'lumotlarni ajratib olish
+        Hisob-fakturadan ma'lumotlarni ajratib olish (ko'p sahifali faylda - `page` sahifasidan)
         
         Returns:
             {
@@ -83,7 +169,7 @@ class OCRProcessor:
             }
         """
         try:
-            result = self.extract_text_from_image(image_path)
+            result = self.extract_text_from_image(image_path, page=page)
             
             if not result['success']:
                 return result
@@ -201,6 +287,8 @@ class OCRProcessor:
     def process_multiple_invoices(self, folder_path: str) -> List[Dict]:
         """
         Papka'dagi barcha hisob-fakturalarni qayta ishlash
+        
+        Sahifalar app.ocr_batch puli orqali parallel OCR qilinadi.
         """
         results = []
         
@@ -208,13 +296,13 @@ class OCRProcessor:
             logger.error(f"Papka topilmadi: {folder_path}")
             return results
         
-        supported_formats = ('.jpg', '.jpeg', '.png', '.pdf', '.bmp')
+        supported_formats = ('.jpg', '.jpeg', '.png', '.pdf', '.bmp', '.tif', '.tiff')
+        
+        from app import ocr_batch
         
-        for file in os.listdir(folder_path):
-            if file.lower().endswith(supported_formats):
-                file_path = os.path.join(folder_path, file)
-                result = self.extract_invoice_data(file_path)
-                results.append(result)
+        files = [os.path.join(folder_path, file) for file in sorted(os.listdir(folder_path))
+                 if file.lower().endswith(supported_formats)]
+        results = ocr_batch.run(type(self), files)
         
         logger.info(f"Jami {len(results)} ta hisob-faktura qayta ishlandi")
         
@@ -285,7 +373,7 @@ class DocumentScanner:
 class OCRProcessorDev(OCRProcessor):
     """Test uchun demo version"""
     
-    def extract_text_from_image(self, image_path: str, lang: str = 'uzb+eng') -> Dict:
+    def extract_text_from_image(self, image_path: str, lang: str = 'uzb+eng', page: int = 0) -> Dict:
         logger.info(f"[DEV] OCR: {image_path}")
         return {
             'success': True,
@@ -295,7 +383,7 @@ class OCRProcessorDev(OCRProcessor):
             'file': image_path
         }
     
-    def extract_invoice_data(self, image_path: str) -> Dict:
+    def extract_invoice_data(self, image_path: str, page: int = 0) -> Dict:
         logger.info(f"[DEV] Invoice extraction: {image_path}")
         return {
             'success': True,
@@ -0,0 +1,134 @@
+"""
+Offline qurilmalardan kelgan o'zgarishlarni paket bilan qabul qilish
+
+push-changes tanasi JSON, gzip (Content-Encoding: gzip) yoki msgpack
+(Content-Type: application/msgpack) bo'lishi mumkin. Sotuv buyurtmalari
+uchun:
+  1. barcha mahsulotlar, mijozlar va mavjud raqamlar IN so'rovlar bilan oldindan yuklanadi,
+  2. buyurtmalar va qatorlar executemany INSERT bilan yoziladi
+     (app.ingest.write_sales_orders - DataIngest bilan umumiy),
+  3. ombor qoldig'i har bir mahsulot uchun bitta yig'ilgan
+     `UPDATE product SET quantity = quantity - :qty` bilan kamaytiriladi.
+Hammasi bitta tranzaksiyada - chaqiruvchi commit qiladi.
+"""
+
+from collections import OrderedDict
+import json
+import logging
+import zlib
+
+from sqlalchemy import bindparam
+
+from app import sync_log
+from app.extensions import db
+from app.ingest import SKIP_EXISTS, executemany, write_sales_orders
+from app.models import Product
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+# Ochilgan (decompress) tana chegarasi - gzip bombadan himoya
+MAX_SYNC_BODY = 50 * 1024 * 1024
+
+
+class SyncPayloadError(ValueError):
+    """Tanani o'qib bo'lmadi"""
+
+
+class UnsupportedPayload(SyncPayloadError):
+    """Format qo'llab-quvvatlanmaydi (msgpack o'rnatilmagan)"""
+
+
+def decode_body(raw, content_encoding=None, mimetype=None):
+    """So'rov tanasini dict ga aylantirish (gzip va/yoki msgpack bo'lishi mumkin)"""
+    if (content_encoding or '').lower() == 'gzip':
+        inflater = zlib.decompressobj(31)
+        try:
+            raw = inflater.decompress(raw, MAX_SYNC_BODY)
+        except zlib.error as e:
+            raise SyncPayloadError(f"gzip tanasi buzilgan: {e}")
+        if inflater.unconsumed_tail:
+            raise SyncPayloadError(f"Ochilgan tana {MAX_SYNC_BODY} baytdan katta")
+
+    if mimetype in MSGPACK_MIMETYPES:
+        try:
+            import msgpack  # ixtiyoriy bog'liqlik - faqat msgpack mijozlar uchun
+        except ImportError:
+            raise UnsupportedPayload("msgpack serverda o'rnatilmagan")
+        try:
+            data = msgpack.unpackb(raw, raw=False)
+        except Exception as e:
+            raise SyncPayloadError(f"msgpack tanasi buzilgan: {e}")
+    else:
+        try:
+            data = json.loads(raw or b'{}')
+        except ValueError as e:
+            raise SyncPayloadError(f"JSON tanasi buzilgan: {e}")
+
+    if not isinstance(data, dict):
+        raise SyncPayloadError("Tana obyekt bo'lishi kerak")
+    return data
+
+
+def push_sales_orders(operations):
+    """
+    `create` operatsiyalaridagi buyurtmalarni yozish va qoldiqni kamaytirish.
+
+    Bazada bor raqamli buyurtmalar (qayta yuborilgan paket) o'tkazib
+    yuboriladi - ular avval qabul qilingan. Qolgan o'tkazib yuborilganlar
+    (noma'lum mijoz/mahsulot, raqamsiz, paket ichida takror) rad etilgan -
+    `rejected` > 0 bo'lsa qurilma ularni qayta yuborishi kerak.
+    `skipped_orders` da o'tkazib yuborilgan har bir buyurtma bor (cheklovsiz).
+    Qaytaradi: {'orders', 'lines', 'skipped', 'rejected', 'skipped_orders'}
+    """
+    creates = [op.get('data') or {} for op in operations if op.get('type') == 'create']
+    result = {'orders': 0, 'lines': 0, 'skipped': 0, 'rejected': 0, 'skipped_orders': []}
+    if not creates:
+        return result
+
+    def skip(index, reason, message):
+        result['skipped'] += 1
+        if reason != SKIP_EXISTS:
+            result['rejected'] += 1
+        result['skipped_orders'].append({'index': index, 'number': creates[index].get('number'),
+                                         'reason': reason, 'message': message})
+
+    order_rows, item_rows = write_sales_orders(creates, skip, status='Synced')
+    if not order_rows:
+        return result
+
+    # Ombor qoldig'i: mahsulot boshiga bitta UPDATE, id tartibida (deadlock bo'lmasligi uchun)
+    sold = {}
+    for row in item_rows:
+        sold[row['product_id']] = sold.get(row['product_id'], 0) + row['quantity']
+    product = Product.__table__
+    executemany(
+        product.update().where(product.c.id == bindparam('product_id'))
+        .values(quantity=db.func.coalesce(product.c.quantity, 0) - bindparam('sold')),
+        [{'product_id': pid, 'sold': qty} for pid, qty in sorted(sold.items()) if qty]
+    )
+    # Delta sync jurnali: qoldig'i o'zgargan mahsulotlar (buyurtmalar write_sales_orders da)
+    sync_log.record(db.session.connection(), 'products', sorted(pid for pid, qty in sold.items() if qty))
+
+    result['orders'] = len(order_rows)
+    result['lines'] = len(item_rows)
+    return result
+
+
+def push_inventory(operations):
+    """`update` operatsiyalari: qoldiqni berilgan qiymatga o'rnatish (oxirgisi yutadi)"""
+    latest = OrderedDict()
+    for op in operations:
+        if op.get('type') == 'update':
+            data = op.get('data') or {}
+            if data.get('id') is not None:
+                latest[data['id']] = data.get('quantity')
+    if not latest:
+        return 0
+    product = Product.__table__
+    executemany(
+        product.update().where(product.c.id == bindparam('product_id')).values(quantity=bindparam('new_quantity')),
+        [{'product_id': pid, 'new_quantity': qty} for pid, qty in sorted(latest.items(), key=lambda kv: str(kv[0]))]
+    )
+    sync_log.record(db.session.connection(), 'products', list(latest))
+    return len(latest)
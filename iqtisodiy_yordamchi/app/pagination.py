@@ -0,0 +1,80 @@
+"""
+Ro'yxat endpointlari uchun keyset pagination va maydon proyeksiyasi
+
+    GET /api/<resurs>?after_id=120&limit=50&fields=id,name
+
+Javob tanasi avvalgidek JSON ro'yxat bo'lib qoladi, keyingi sahifa
+kursori esa `X-Next-Cursor` sarlavhasida qaytariladi.
+"""
+
+from flask import request, jsonify
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def iso_field(attr):
+    """Sana ustuni uchun getter: isoformat yoki None"""
+    def getter(obj):
+        value = getattr(obj, attr)
+        return value.isoformat() if value else None
+    return getter
+
+
+def keyset_paginate(query, model, fields, depends=None, eager=None):
+    """
+    So'rovni `id > after_id` bo'yicha sahifalab, JSON javob qaytarish.
+
+    Args:
+        query: filtrlangan (lekin tartiblanmagan) SQLAlchemy query
+        model: asosiy model (kursor uchun `model.id` ishlatiladi)
+        fields: {'maydon': getter yoki None} - None bo'lsa getattr(obj, maydon)
+        depends: ustun bo'lmagan maydonlar uchun kerakli ustunlar,
+                 masalan {'customer_name': ['customer_id']}
+        eager: maydon tanlangandagina qo'llanadigan loader opsiyalari,
+               masalan {'customer_name': query_options.sales_order_customer}
+    """
+    depends = depends or {}
+    eager = eager or {}
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    selected = list(fields)
+    requested = request.args.get('fields')
+    if requested:
+        selected = [f.strip() for f in requested.split(',') if f.strip()]
+        unknown = [f for f in selected if f not in fields]
+        if unknown:
+            return jsonify({'error': 'Noma\'lum maydonlar', 'fields': unknown}), 400
+
+    # Faqat kerakli ustunlarni yuklash (PK har doim yuklanadi)
+    column_keys = set(inspect(model).column_attrs.keys())
+    columns = {f for f in selected if f in column_keys}
+    for f in selected:
+        columns.update(depends.get(f, []))
+    columns.add('id')
+    query = query.options(load_only(*[getattr(model, c) for c in sorted(columns)]))
+    for f in selected:
+        if f in eager:
+            query = query.options(*eager[f]())
+
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    rows = query.order_by(model.id.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    response = jsonify([{
+        name: (fields[name](obj) if fields[name] else getattr(obj, name))
+        for name in selected
+    } for obj in rows])
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    return response
@@ -0,0 +1,359 @@
+"""
+Davr (oy) bo'yicha moliyaviy yig'indilar - soliq hisobotlari va formalar uchun
+
+`get()`: savdo (DailySalesRollup), QQS bazasi (Invoice), xarajatlar (Expense,
+toifalari shartli SUM(CASE ...) bilan), xaridlar (PurchaseOrder) va xodimlar
+soni bitta SELECT bilan olinadi: har bir jadval bir marta, bitta qatorli
+yig'indi subquery sifatida o'qiladi - ORM obyektlari yuklanmaydi.
+
+`details()`: formalar uchun taqsimotlar - top mahsulotlar, top mijozlar,
+kunlik savdo (hammasi DailySalesRollup dan, SQL da GROUP BY + LIMIT) va
+kassa kirim/chiqimi (bitta so'rov). Narx buyurtma qatorlari soniga emas,
+davrdagi yig'indi qatorlariga bog'liq. `inventory()` - joriy ombor holati.
+
+Yopilgan davrlar (joriy oydan oldingi) natijasi jarayon ichida CACHE_TTL
+sekund saqlanadi va davr versiyasi (PeriodVersion) bilan belgilanadi. Yopilgan
+davrdagi yozuv o'zgarsa (buyurtma qatorlari ham - ota buyurtma sanasi
+bo'yicha) versiya shu tranzaksiyada oshiriladi: ORM orqali `after_flush` da,
+Core yo'llarida `touch()` bilan. Har bir keshli o'qish versiyani (PK bo'yicha
+bitta qator) tekshiradi, shuning uchun boshqa worker yoki Celery jarayonida
+qilingan tuzatish darhol ko'rinadi. Joriy oy har safar qayta hisoblanadi.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import and_, bindparam, case, event, select, true
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app import rollup
+from app.cash import INCOME_TYPE
+from app.models import (CashRegister, CashTransaction, Customer, DailySalesRollup, Expense, Invoice, PeriodVersion,
+                        Product, PurchaseOrder, PurchaseOrderItem, SalesOrder, SalesOrderItem, User)
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv('PERIOD_SUMMARY_CACHE_TTL', '21600'))
+# Keshdagi yozuvlar chegarasi (eng eskisi chiqariladi)
+CACHE_SIZE = 120
+SALARY_CATEGORY = 'Salary'
+UTILITIES_CATEGORY = 'Utilities'
+# Top mahsulot/mijozlar va kam qolgan mahsulotlar ro'yxati uzunligi
+TOP_N = int(os.getenv('PERIOD_SUMMARY_TOP_N', '10'))
+LOW_STOCK_LIMIT = 50
+# Model -> davrni belgilovchi sana ustuni
+DATE_ATTRS = {SalesOrder: 'order_date', Invoice: 'invoice_date', Expense: 'expense_date',
+              PurchaseOrder: 'order_date', CashTransaction: 'transaction_date'}
+# Qator modeli -> (ota buyurtma id ustuni, ota model) - davr ota sanasidan olinadi
+ITEM_PARENTS = {SalesOrderItem: ('sales_order_id', SalesOrder),
+                PurchaseOrderItem: ('purchase_order_id', PurchaseOrder)}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def period_range(period):
+    """'2026-02' -> (oy boshi, keyingi oy boshi)"""
+    start = datetime.strptime(f'{period}-01', '%Y-%m-%d')
+    if start.month == 12:
+        return start, datetime(start.year + 1, 1, 1)
+    return start, datetime(start.year, start.month + 1, 1)
+
+
+def is_closed(period, now=None):
+    """Davr tugaganmi (keyingi oy boshlangan)"""
+    return period_range(period)[1] <= (now or datetime.now())
+
+
+def _sum(column, *conditions):
+    value = case((and_(*conditions), column)) if conditions else column
+    return db.func.coalesce(db.func.sum(value), 0)
+
+
+def _query(start, end):
+    sales = select(
+        _sum(DailySalesRollup.orders, DailySalesRollup.product_id.is_(None)).label('orders'),
+        _sum(DailySalesRollup.amount, DailySalesRollup.product_id.is_(None)).label('amount'),
+        _sum(DailySalesRollup.discount, DailySalesRollup.product_id.is_(None)).label('discount'),
+        _sum(DailySalesRollup.tax_amount, DailySalesRollup.product_id.is_(None)).label('tax_amount'),
+        _sum(DailySalesRollup.qty, DailySalesRollup.product_id.isnot(None)).label('qty'),
+    ).where(DailySalesRollup.day >= start.date(), DailySalesRollup.day < end.date()).subquery()
+
+    invoices = select(
+        db.func.count(Invoice.id).label('count'),
+        _sum(Invoice.total_amount).label('total'),
+    ).where(Invoice.invoice_date >= start, Invoice.invoice_date < end).subquery()
+
+    expenses = select(
+        _sum(Expense.amount).label('total'),
+        _sum(Expense.amount, Expense.category == SALARY_CATEGORY).label('salary'),
+        _sum(Expense.amount, Expense.category == UTILITIES_CATEGORY).label('utilities'),
+    ).where(Expense.expense_date >= start, Expense.expense_date < end).subquery()
+
+    purchases = select(
+        db.func.count(PurchaseOrder.id).label('count'),
+        _sum(PurchaseOrder.total_amount).label('total'),
+    ).where(PurchaseOrder.order_date >= start, PurchaseOrder.order_date < end).subquery()
+
+    purchase_items = select(
+        _sum(PurchaseOrderItem.quantity).label('quantity'),
+    ).join(PurchaseOrder, PurchaseOrder.id == PurchaseOrderItem.purchase_order_id)\
+        .where(PurchaseOrder.order_date >= start, PurchaseOrder.order_date < end).subquery()
+
+    employees = select(db.func.count(User.id).label('count')).subquery()
+
+    # Har bir subquery bitta qator qaytaradi - ON TRUE bilan birlashtiriladi
+    return select(
+        sales.c.orders, sales.c.amount, sales.c.discount, sales.c.tax_amount, sales.c.qty,
+        invoices.c.count.label('invoice_count'), invoices.c.total.label('invoice_total'),
+        expenses.c.total.label('expense_total'), expenses.c.salary, expenses.c.utilities,
+        purchases.c.count.label('purchase_count'), purchases.c.total.label('purchase_total'),
+        purchase_items.c.quantity.label('purchase_quantity'), employees.c.count.label('employees'),
+    ).select_from(sales).join(invoices, true()).join(expenses, true())\
+        .join(purchases, true()).join(purchase_items, true()).join(employees, true())
+
+
+def compute(period):
+    """Davr yig'indilarini bitta so'rov bilan hisoblash (keshsiz)"""
+    start, end = period_range(period)
+    row = db.session.execute(_query(start, end)).one()
+    income = float(row.amount)
+    expenses = float(row.expense_total)
+    salary = float(row.salary)
+    utilities = float(row.utilities)
+    return {
+        'period': period,
+        'start_date': start.strftime('%Y-%m-%d'),
+        'end_date': end.strftime('%Y-%m-%d'),
+        'sales_orders': int(row.orders),
+        'sales_amount': income,
+        'sales_quantity': float(row.qty),
+        'sales_discount': float(row.discount),
+        'sales_tax': float(row.tax_amount),
+        'invoice_count': int(row.invoice_count),
+        'vat_base': float(row.invoice_total),
+        'salary': salary,
+        'utilities': utilities,
+        'other_expenses': expenses - salary - utilities,
+        'total_expenses': expenses,
+        'purchase_orders': int(row.purchase_count),
+        'purchases': float(row.purchase_total),
+        'purchase_quantity': float(row.purchase_quantity),
+        'income': income,
+        'profit': income - expenses,
+        'employees': int(row.employees),
+    }
+
+
+def _top_products(start, end, limit):
+    ranked = select(
+        DailySalesRollup.product_id.label('product_id'),
+        db.func.sum(DailySalesRollup.qty).label('quantity'),
+        db.func.sum(DailySalesRollup.amount).label('amount'),
+    ).where(DailySalesRollup.product_id.isnot(None),
+            DailySalesRollup.day >= start.date(), DailySalesRollup.day < end.date())\
+        .group_by(DailySalesRollup.product_id)\
+        .order_by(db.func.sum(DailySalesRollup.amount).desc()).limit(limit).subquery()
+    rows = db.session.execute(
+        select(ranked.c.product_id, Product.code, Product.name, ranked.c.quantity, ranked.c.amount)
+        .outerjoin(Product, Product.id == ranked.c.product_id).order_by(ranked.c.amount.desc())
+    )
+    return [{'product_id': r.product_id, 'code': r.code, 'name': r.name,
+             'quantity': float(r.quantity or 0), 'amount': float(r.amount or 0)} for r in rows]
+
+
+def _top_customers(start, end, limit):
+    ranked = select(
+        DailySalesRollup.customer_id.label('customer_id'),
+        db.func.sum(DailySalesRollup.orders).label('orders'),
+        db.func.sum(DailySalesRollup.amount).label('amount'),
+    ).where(DailySalesRollup.product_id.is_(None),
+            DailySalesRollup.day >= start.date(), DailySalesRollup.day < end.date())\
+        .group_by(DailySalesRollup.customer_id)\
+        .order_by(db.func.sum(DailySalesRollup.amount).desc()).limit(limit).subquery()
+    rows = db.session.execute(
+        select(ranked.c.customer_id, Customer.name, ranked.c.orders, ranked.c.amount)
+        .outerjoin(Customer, Customer.id == ranked.c.customer_id).order_by(ranked.c.amount.desc())
+    )
+    return [{'customer_id': r.customer_id, 'name': r.name,
+             'orders': int(r.orders or 0), 'amount': float(r.amount or 0)} for r in rows]
+
+
+def _cash_flow(start, end):
+    """Kassa: davr boshi qoldig'i, davrdagi kirim/chiqim, davr oxiri qoldig'i"""
+    signed = case((CashTransaction.transaction_type == INCOME_TYPE, CashTransaction.amount),
+                  else_=-CashTransaction.amount)
+    in_period = and_(CashTransaction.transaction_date >= start, CashTransaction.transaction_date < end)
+    movements = select(
+        _sum(CashTransaction.amount, in_period, CashTransaction.transaction_type == INCOME_TYPE).label('inflow'),
+        _sum(CashTransaction.amount, in_period, CashTransaction.transaction_type != INCOME_TYPE).label('outflow'),
+        # Davr boshidan hozirgacha sof o'zgarish - joriy balansdan ayirib boshlang'ich qoldiq olinadi
+        db.func.coalesce(db.func.sum(signed), 0).label('since_start'),
+    ).where(CashTransaction.transaction_date >= start).subquery()
+    balances = select(_sum(CashRegister.balance).label('balance')).subquery()
+    row = db.session.execute(
+        select(movements.c.inflow, movements.c.outflow, movements.c.since_start, balances.c.balance)
+        .select_from(movements).join(balances, true())
+    ).one()
+    opening = float(row.balance) - float(row.since_start)
+    inflow, outflow = float(row.inflow), float(row.outflow)
+    return {'opening_balance': opening, 'inflow': inflow, 'outflow': outflow,
+            'closing_balance': opening + inflow - outflow}
+
+
+def compute_details(period, top_n=TOP_N):
+    """Davr taqsimotlari (keshsiz): top mahsulot/mijozlar, kunlik savdo, kassa"""
+    start, end = period_range(period)
+    daily = rollup.daily_totals(start, end - timedelta(days=1))
+    return {
+        'period': period,
+        'top_products': _top_products(start, end, top_n),
+        'top_customers': _top_customers(start, end, top_n),
+        'daily_sales': [{'date': day, 'total_amount': total, 'orders_count': orders}
+                        for day, (total, orders) in daily.items()],
+        'cash': _cash_flow(start, end),
+    }
+
+
+def inventory(low_stock_limit=LOW_STOCK_LIMIT):
+    """
+    Joriy ombor holati: toifalar bo'yicha yig'indilar (bitta GROUP BY) va
+    kam qolgan (quantity < minimum_quantity) mahsulotlar ro'yxati.
+    """
+    quantity = db.func.coalesce(Product.quantity, 0)
+    low = quantity < db.func.coalesce(Product.minimum_quantity, 0)
+    categories = db.session.execute(
+        select(Product.category, db.func.count(Product.id), db.func.sum(quantity),
+               db.func.sum(quantity * Product.purchase_price),
+               db.func.sum(case((quantity <= 0, 1), else_=0)), db.func.sum(case((low, 1), else_=0)))
+        .group_by(Product.category).order_by(Product.category)
+    ).all()
+    items = db.session.execute(
+        select(Product.id, Product.code, Product.name, quantity.label('quantity'), Product.minimum_quantity)
+        .where(low).order_by(quantity - db.func.coalesce(Product.minimum_quantity, 0)).limit(low_stock_limit)
+    ).all()
+    return {
+        'total_items': sum(int(c[1]) for c in categories),
+        'total_quantity': float(sum(c[2] or 0 for c in categories)),
+        'total_value': float(sum(c[3] or 0 for c in categories)),
+        'out_of_stock_count': sum(int(c[4] or 0) for c in categories),
+        'low_stock_count': sum(int(c[5] or 0) for c in categories),
+        'categories': [{'category': c[0], 'products': int(c[1]), 'quantity': float(c[2] or 0),
+                        'value': float(c[3] or 0)} for c in categories],
+        'low_stock_items': [{'id': r.id, 'code': r.code, 'name': r.name, 'quantity': r.quantity,
+                             'minimum': r.minimum_quantity} for r in items],
+    }
+
+
+def version(period):
+    """Davr ma'lumotlari versiyasi (o'zgarmagan davr - 0)"""
+    return db.session.query(PeriodVersion.version).filter(PeriodVersion.period == period).scalar() or 0
+
+
+def touch(connection, periods):
+    """Yopilgan davrlar versiyasini oshirish (chaqiruvchi tranzaksiyasida) - barcha jarayonlar keshi eskiradi"""
+    periods = sorted(p for p in set(periods) if p and is_closed(p))
+    if not periods:
+        return
+    table = PeriodVersion.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        # Parallel tranzaksiyalar bir xil yangi davrni qo'shsa ham xato bo'lmasin
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(table).values([{'period': p, 'version': 1} for p in periods])
+        connection.execute(statement.on_conflict_do_update(index_elements=[table.c.period],
+                                                           set_={'version': table.c.version + 1}))
+    else:
+        known = set(connection.execute(select(table.c.period).where(table.c.period.in_(periods))).scalars())
+        if known:
+            connection.execute(
+                table.update().where(table.c.period == bindparam('p')).values(version=table.c.version + 1),
+                [{'p': p} for p in sorted(known)]
+            )
+        missing = [{'period': p, 'version': 1} for p in periods if p not in known]
+        if missing:
+            connection.execute(table.insert(), missing)
+    invalidate_local(periods)
+
+
+def _cached(key, period, loader):
+    if not is_closed(period):
+        return loader()
+
+    # Versiya hisoblashdan oldin o'qiladi: oradagi tuzatish keyingi o'qishda ko'rinadi
+    current = version(period)
+    now = time.monotonic()
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > now and cached[1] == current:
+            _cache.move_to_end(key)
+            return dict(cached[2])
+
+    value = loader()
+    with _lock:
+        _cache[key] = (now + CACHE_TTL, current, value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(value)
+
+
+def get(period):
+    """Davr yig'indilari - yopilgan davr keshdan"""
+    return _cached(('summary', period), period, lambda: compute(period))
+
+
+def details(period, top_n=TOP_N):
+    """Davr taqsimotlari - yopilgan davr keshdan"""
+    return _cached(('details', period, top_n), period, lambda: compute_details(period, top_n))
+
+
+def invalidate_local(periods=None):
+    """Shu jarayon keshidan davrlarni (yoki hammasini) tashlash"""
+    with _lock:
+        if periods is None:
+            _cache.clear()
+        else:
+            for key in [key for key in _cache if key[1] in periods]:
+                del _cache[key]
+
+
+def invalidate(period=None):
+    """Bitta davr (yoki hammasi) keshini shu jarayonda tashlash"""
+    invalidate_local(None if period is None else {period})
+
+
+def _periods(obj, attr):
+    history = get_history(obj, attr)
+    return {value.strftime('%Y-%m') for value in list(history.added) + list(history.deleted) + [obj.__dict__.get(attr)]
+            if isinstance(value, datetime)}
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_changed(session, flush_context):
+    """O'zgargan yozuvlar (va qatorlarning ota buyurtmalari) davrlari versiyasini oshirish"""
+    periods = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        attr = DATE_ATTRS.get(type(obj))
+        if attr:
+            periods |= _periods(obj, attr)
+            continue
+        parent = ITEM_PARENTS.get(type(obj))
+        if parent:
+            fk, parent_model = parent
+            history = get_history(obj, fk)
+            for parent_id in set(history.added) | set(history.deleted) | {obj.__dict__.get(fk)}:
+                order = session.get(parent_model, parent_id) if parent_id else None
+                if order is not None:
+                    periods |= _periods(order, DATE_ATTRS[parent_model])
+    if periods:
+        touch(session.connection(), periods)
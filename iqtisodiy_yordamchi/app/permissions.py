@@ -0,0 +1,169 @@
+"""
+Foydalanuvchi roli va ruxsatnomalari keshi
+
+Har bir so'rovda User + Role ni bazadan yuklash o'rniga natija jarayon
+ichida TTL bilan saqlanadi. Kalit: (user_id, versiya). Rol ruxsatnomalari
+yoki foydalanuvchi roli o'zgarganda `invalidate()` versiyani oshiradi -
+eski yozuvlar keyingi so'rovda qayta yuklanadi.
+
+Redis backend (REDIS_URL redis:// bo'lsa standart, yoki
+PERMISSION_CACHE_BACKEND=redis) versiya va yozuvlarni Redis da ham saqlaydi:
+bir workerdagi o'zgarish boshqalarida VERSION_CHECK_SECONDS ichida ko'rinadi,
+yangi ishga tushgan worker esa bazaga bormaydi. Issiq yo'lda (hot path)
+bazaga so'rov yo'q. Xotiradagi (memory) backend faqat bitta jarayonli
+ishga tushirish uchun: `invalidate()` boshqa gunicorn workerlariga yetmaydi.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from app.extensions import db
+from app.models import Role, User
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', '60'))
+# Redis dagi versiyani shuncha sekundda bir marta tekshirish
+VERSION_CHECK_SECONDS = 1.0
+
+REDIS_SCHEMES = ('redis://', 'rediss://', 'unix://')
+# Redis ishlamasa import/so'rov osilib qolmasin
+REDIS_TIMEOUT_SECONDS = 1.0
+
+REDIS_VERSION_KEY = 'erp:permissions:version'
+REDIS_ENTRY_KEY = 'erp:permissions:{version}:{user_id}'
+
+
+def load_access(user_id):
+    """Bazadan bitta so'rov: {'user_id', 'username', 'role_id', 'role', 'permissions'} yoki None"""
+    row = db.session.query(User.id, User.username, Role.id, Role.name, Role.permissions)\
+        .outerjoin(Role, Role.id == User.role_id).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return {'user_id': row[0], 'username': row[1], 'role_id': row[2], 'role': row[3], 'permissions': row[4] or {}}
+
+
+class PermissionCache:
+    """Jarayon ichidagi TTL kesh (versiya bilan bekor qilinadi)"""
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}    # user_id -> (versiya, muddati, access)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        return self._version
+
+    def get(self, user_id):
+        if user_id is None:
+            return None
+        version = self.version()
+        entry = self._entries.get(user_id)
+        if entry and entry[0] == version and entry[1] > time.monotonic():
+            return entry[2]
+
+        access = self._load(user_id, version)
+        with self._lock:
+            self._entries[user_id] = (version, time.monotonic() + self.ttl, access)
+        return access
+
+    def _load(self, user_id, version):
+        return load_access(user_id)
+
+    def invalidate(self):
+        """Rol yoki foydalanuvchi roli o'zgardi - barcha yozuvlar eskiradi"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+class RedisPermissionCache(PermissionCache):
+    """Redis bilan workerlar aro umumiy versiya va yozuvlar"""
+
+    def __init__(self, redis_url, **kwargs):
+        import redis  # ixtiyoriy bog'liqlik - faqat shu backend uchun kerak
+
+        super().__init__(**kwargs)
+        self._redis = redis.Redis.from_url(redis_url, socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+                                           socket_timeout=REDIS_TIMEOUT_SECONDS)
+        self._version = int(self._redis.get(REDIS_VERSION_KEY) or 0)
+        self._checked_at = time.monotonic()
+
+    def version(self):
+        now = time.monotonic()
+        if now - self._checked_at >= VERSION_CHECK_SECONDS:
+            try:
+                self._version = int(self._redis.get(REDIS_VERSION_KEY) or 0)
+            except Exception as e:
+                logger.warning(f"Ruxsatnoma versiyasini Redis dan o'qib bo'lmadi: {e}")
+            self._checked_at = now
+        return self._version
+
+    def _load(self, user_id, version):
+        key = REDIS_ENTRY_KEY.format(version=version, user_id=user_id)
+        try:
+            cached = self._redis.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        except Exception as e:
+            logger.warning(f"Ruxsatnoma keshi (Redis) xatosi: {e}")
+        access = load_access(user_id)
+        try:
+            self._redis.set(key, json.dumps(access), ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Ruxsatnoma keshi (Redis) xatosi: {e}")
+        return access
+
+    def invalidate(self):
+        try:
+            version = int(self._redis.incr(REDIS_VERSION_KEY))
+        except Exception as e:
+            logger.warning(f"Ruxsatnoma versiyasini Redis da oshirib bo'lmadi: {e}")
+            version = self._version + 1
+        with self._lock:
+            self._version = version
+            self._checked_at = time.monotonic()
+            self._entries.clear()
+
+
+def create_cache():
+    """
+    PERMISSION_CACHE_BACKEND (redis | memory). Berilmasa: REDIS_URL Redis ga
+    ishora qilsa Redis kesh (ko'p workerli gunicorn), aks holda jarayon ichidagi kesh.
+    """
+    redis_url = os.getenv('REDIS_URL', '')
+    default = 'redis' if redis_url.startswith(REDIS_SCHEMES) else 'memory'
+    if os.getenv('PERMISSION_CACHE_BACKEND', default).lower() == 'redis':
+        try:
+            return RedisPermissionCache(redis_url or 'redis://localhost:6379/0')
+        except Exception as e:
+            logger.warning(f"Redis ruxsatnoma keshi ishlamadi, xotiradagi kesh ishlatiladi: {e}")
+    return PermissionCache()
+
+
+cache = create_cache()
+
+
+def get_access(user_id):
+    """Foydalanuvchi roli va ruxsatnomalari (keshdan)"""
+    return cache.get(user_id)
+
+
+def has_role(user_id, *roles):
+    access = get_access(user_id)
+    return bool(access) and access['role'] in roles
+
+
+def check_permission(user_id, module, action='read'):
+    access = get_access(user_id)
+    if not access:
+        return False
+    return action in access['permissions'].get(module, [])
+
+
+def invalidate():
+    cache.invalidate()
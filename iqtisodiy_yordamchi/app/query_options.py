@@ -0,0 +1,100 @@
+"""
+Endpointlar uchun umumiy eager-loading sozlamalari (N+1 so'rovlarning oldini olish)
+va SQL so'rovlar sonini sanovchi yordamchi
+
+Har bir funksiya `query.options(*...)` ga beriladigan loader opsiyalari
+kortejini qaytaradi. Backref munosabatlar (masalan `SalesOrder.customer`)
+faqat mapperlar sozlangandan keyin paydo bo'ladi, shuning uchun opsiyalar
+modul importida emas, so'rov vaqtida quriladi.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload, configure_mappers
+from app.models import (Customer, Supplier, Product, SalesOrder, SalesOrderItem,
+                        PurchaseOrder, PurchaseOrderItem, Invoice)
+
+
+# ==================== RO'YXATLAR (many-to-one -> bitta JOIN) ====================
+
+def sales_order_customer():
+    """SalesOrder ro'yxati: mijoz nomi bir JOIN bilan"""
+    configure_mappers()
+    return (joinedload(SalesOrder.customer).load_only(Customer.name),)
+
+
+def invoice_customer():
+    """Invoice ro'yxati: mijoz nomi bir JOIN bilan"""
+    configure_mappers()
+    return (joinedload(Invoice.customer).load_only(Customer.name),)
+
+
+def purchase_order_supplier():
+    """PurchaseOrder ro'yxati: etkazuvchi nomi bir JOIN bilan"""
+    configure_mappers()
+    return (joinedload(PurchaseOrder.supplier).load_only(Supplier.name),)
+
+
+# ==================== DETALLAR (one-to-many -> bitta IN so'rov) ====================
+
+def sales_order_detail():
+    """Bitta buyurtma: mijoz JOIN, qatorlar va mahsulot nomlari bitta SELECT ... IN bilan"""
+    configure_mappers()
+    return (
+        joinedload(SalesOrder.customer).load_only(Customer.name),
+        selectinload(SalesOrder.items).joinedload(SalesOrderItem.product).load_only(Product.name),
+    )
+
+
+def purchase_order_detail():
+    """Bitta xarid buyurtmasi: etkazuvchi JOIN, qatorlar va mahsulot nomlari bitta SELECT ... IN bilan"""
+    configure_mappers()
+    return (
+        joinedload(PurchaseOrder.supplier).load_only(Supplier.name),
+        selectinload(PurchaseOrder.items).joinedload(PurchaseOrderItem.product).load_only(Product.name),
+    )
+
+
+# ==================== SO'ROVLAR BUDJETI ====================
+
+# Bitta GET so'rovga ruxsat etilgan maksimal SQL statementlar soni.
+# Qator soniga bog'liq bo'lmasligi kerak - N+1 qaytsa budjet buziladi.
+STATEMENT_BUDGETS = {
+    '/api/customers': 1,
+    '/api/products': 1,
+    '/api/sales-orders': 1,
+    '/api/sales-orders/<id>': 2,
+    '/api/purchase-orders': 1,
+    '/api/purchase-orders/<id>': 2,
+    '/api/invoices': 1,
+    '/api/reports/sales': 1,
+    '/api/reports/purchases': 1,
+    '/api/reports/sales-excel': 1,
+    '/api/reports/csv-export?type=sales': 1,
+}
+
+
+class StatementCounter:
+    """
+    Engine orqali bajarilgan SQL statementlarni sanash
+
+        with StatementCounter(db.engine) as counter:
+            client.get('/api/sales-orders')
+        assert counter.count <= STATEMENT_BUDGETS['/api/sales-orders']
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+        return False
@@ -0,0 +1,196 @@
+"""
+Realtime hodisalar brokeri (SSE uchun fan-out)
+
+Hodisalar o'sib boruvchi id bilan halqa buferga (ring buffer) yoziladi. Har
+bir obunachi faqat o'z kursorini (oxirgi ko'rgan id) saqlaydi, shuning uchun
+har bir hodisa barcha ulangan dashboardlarga yetadi va xotira obunachilar
+soniga emas, bufer hajmiga bog'liq. `Last-Event-ID` bilan qayta ulangan
+mijoz bufer ichidagi o'tkazib yuborilgan hodisalarni oladi.
+
+REALTIME_BACKEND=redis bo'lsa hodisalar Redis pub/sub orqali barcha gunicorn
+workerlariga tarqatiladi; id lar Redis da atomar (Lua skript) beriladi, shuning
+uchun ular hamma workerda bir xil va tartibli.
+"""
+
+from collections import deque
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BUFFER_SIZE = int(os.getenv('REALTIME_BUFFER_SIZE', '1000'))
+MAX_SUBSCRIBERS = int(os.getenv('REALTIME_MAX_SUBSCRIBERS', '1000'))
+# Hodisa bo'lmasa shuncha sekundda bir izoh qatori (proxy ulanishni uzmasligi uchun)
+KEEPALIVE_SECONDS = 15
+
+REDIS_CHANNEL = 'erp:realtime:events'
+REDIS_COUNTER = 'erp:realtime:last_id'
+
+# id berish va publish bitta atomar qadam - id tartibi xabarlar tartibiga mos
+_PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', KEYS[2], id .. '|' .. ARGV[1])
+return id
+"""
+
+
+class TooManySubscribers(Exception):
+    """Obunachilar chegarasi to'lgan"""
+
+
+class Subscription:
+    """
+    Band qilingan obuna: iteratsiyada (id, type, payload) yoki keepalive uchun None.
+
+    O'rin broker.subscribe() da band qilinadi va close() da (bir marta)
+    bo'shatiladi - iteratsiya boshlanmagan bo'lsa ham.
+    """
+
+    def __init__(self, broker, cursor, keepalive):
+        self._broker = broker
+        self._closed = False
+        self._events = self._stream(cursor, keepalive)
+
+    def _stream(self, cursor, keepalive):
+        broker = self._broker
+        while True:
+            with broker._cond:
+                events = broker._since(cursor)
+                if not events:
+                    broker._cond.wait(timeout=keepalive)
+                    events = broker._since(cursor)
+            if not events:
+                yield None
+                continue
+            for event_id, event_type, payload, _ in events:
+                cursor = event_id
+                yield event_id, event_type, payload
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        with self._broker._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._broker.subscribers -= 1
+        self._events.close()
+
+    def __del__(self):
+        self.close()
+
+
+class EventBroker:
+    """Halqa buferli, ko'p obunachili hodisalar brokeri (bitta jarayon ichida)"""
+
+    def __init__(self, buffer_size=BUFFER_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self._events = deque(maxlen=buffer_size)   # (id, type, payload, time)
+        self._last_id = 0
+        self._cond = threading.Condition()
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, payload):
+        """Hodisani buferga yozib, kutayotgan obunachilarni uyg'otish. Hodisa id sini qaytaradi."""
+        with self._cond:
+            event_id = self._last_id + 1
+            self._append(event_id, event_type, payload, time.time())
+            return event_id
+
+    def _append(self, event_id, event_type, payload, created):
+        # chaqiruvchi self._cond ni ushlab turadi
+        self._events.append((event_id, event_type, payload, created))
+        self._last_id = max(self._last_id, event_id)
+        self._cond.notify_all()
+
+    def _since(self, cursor):
+        """cursor dan keyingi hodisalar - faqat yangilari o'ngdan aylanib chiqiladi"""
+        new = []
+        for event in reversed(self._events):
+            if event[0] <= cursor:
+                break
+            new.append(event)
+        new.reverse()
+        return new
+
+    def subscribe(self, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+        """
+        Obuna (Subscription): (id, type, payload) yoki keepalive uchun None.
+
+        last_event_id berilmasa faqat ulanishdan keyingi hodisalar yuboriladi.
+        Chegara tekshiruvi va o'rinni band qilish bitta qulf ostida - bir vaqtda
+        ulanganlar chegaradan oshmaydi. Obuna yopilganda (mijoz uzilganda)
+        o'rin bo'shatiladi.
+        """
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                raise TooManySubscribers(f'{self.max_subscribers} obunachi chegarasi')
+            self.subscribers += 1
+            cursor = self._last_id if last_event_id is None else last_event_id
+        return Subscription(self, cursor, keepalive)
+
+
+class RedisEventBroker(EventBroker):
+    """
+    Redis pub/sub orqali workerlar aro tarqatiladigan broker.
+
+    publish() hodisani faqat Redis ga yuboradi; har bir workerdagi fon
+    tinglovchi oqimi uni (o'zinikini ham) mahalliy halqa buferga yozadi.
+    """
+
+    def __init__(self, redis_url, **kwargs):
+        import redis  # ixtiyoriy bog'liqlik - faqat shu backend uchun kerak
+
+        super().__init__(**kwargs)
+        self._redis = redis.Redis.from_url(redis_url)
+        self._publish_script = self._redis.register_script(_PUBLISH_SCRIPT)
+        last = self._redis.get(REDIS_COUNTER)
+        self._last_id = int(last) if last else 0
+        self._listener = threading.Thread(target=self._listen, name='realtime-redis', daemon=True)
+        self._listener.start()
+
+    def publish(self, event_type, payload):
+        message = json.dumps({'type': event_type, 'payload': payload, 'time': time.time()})
+        return int(self._publish_script(keys=[REDIS_COUNTER, REDIS_CHANNEL], args=[message]))
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CHANNEL)
+                backoff = 1
+                for message in pubsub.listen():
+                    event_id, _, body = message['data'].decode().partition('|')
+                    event = json.loads(body)
+                    with self._cond:
+                        self._append(int(event_id), event['type'], event['payload'], event['time'])
+            except Exception as e:
+                logger.error(f"Realtime Redis tinglovchi xatosi: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+def create_broker(**kwargs):
+    """
+    REALTIME_BACKEND=redis bo'lsa Redis broker, aks holda jarayon ichidagi broker.
+    kwargs (buffer_size, max_subscribers) brokerga uzatiladi - gunicorn.conf.py
+    gthread worker uchun obunachilar chegarasini thread lar sonidan past qo'yadi.
+    """
+    if os.getenv('REALTIME_BACKEND', 'memory').lower() == 'redis':
+        try:
+            return RedisEventBroker(os.getenv('REDIS_URL', 'redis://localhost:6379/0'), **kwargs)
+        except Exception as e:
+            logger.warning(f"Redis realtime backend ishlamadi, xotiradagi broker ishlatiladi: {e}")
+    return EventBroker(**kwargs)
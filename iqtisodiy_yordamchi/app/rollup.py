@@ -0,0 +1,323 @@
+"""
+Kunlik savdo yig'indilari (DailySalesRollup)
+
+SalesOrder / SalesOrderItem yaratilganda, o'zgarganda yoki o'chirilganda
+`after_flush` hodisasida "oldingi" va "keyingi" hissalar farqi (delta) shu
+tranzaksiyaning o'zida yig'indi jadvaliga qo'shiladi. `items` delete-orphan
+kaskadi bilan o'chgan qatorlar (`order.items.pop()`) ham hisobga olinadi.
+ORM dan tashqari (Core executemany) yozuvchilar, masalan app/ingest.py,
+`apply_deltas` ni o'zlari chaqiradi.
+
+SalesOrder/SalesOrderItem ustida bulk `query.update()/delete()` after_flush
+ni chetlab o'tadi, shuning uchun taqiqlangan (RollupBypassError). Yig'indini
+o'zi yuritadigan kod `execution_options(rollup_maintained=True)` beradi
+(keyin `apply_deltas` yoki `rebuild()`).
+
+Hisobot endpointlari shu jadvaldan o'qiydi - narx buyurtmalar soniga emas,
+kunlar soniga bog'liq. Barcha o'qishlar SUM(...) bilan, shuning uchun bir
+xil kalitli takroriy qatorlar (parallel tranzaksiyalar) natijani buzmaydi.
+
+To'liq qayta qurish: python -m app.rollup
+"""
+
+from datetime import date, datetime
+import logging
+
+from sqlalchemy import and_, bindparam, event, insert, literal, or_, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+
+from app.extensions import db
+from app.models import DailySalesRollup, SalesOrder, SalesOrderItem
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('orders', 'qty', 'amount', 'discount', 'tax_amount')
+ORDER_ATTRS = ('order_date', 'customer_id', 'total_amount', 'discount', 'tax_amount')
+ITEM_ATTRS = ('sales_order_id', 'product_id', 'quantity', 'unit_price', 'discount')
+# session.info kaliti: flush ichida o'chirilgan qatorlar (orphan kaskadi ham)
+DELETED_ITEMS = 'rollup_deleted_items'
+
+
+class RollupBypassError(RuntimeError):
+    """Yig'indini chetlab o'tadigan bulk UPDATE/DELETE"""
+
+
+def _to_day(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def line_amount(quantity, unit_price, discount):
+    """Buyurtma qatori summasi: miqdor * narx * (1 - chegirma%)"""
+    return (quantity or 0) * (unit_price or 0) * (1 - (discount or 0) / 100)
+
+
+def add(deltas, key, values, sign=1):
+    """deltas[key] ga (orders, qty, amount, discount, tax_amount) qo'shish"""
+    current = deltas.setdefault(key, [0, 0, 0, 0, 0])
+    for i, value in enumerate(values):
+        current[i] += sign * (value or 0)
+
+
+def order_contribution(day, customer_id, total_amount, discount, tax_amount):
+    return (_to_day(day), None, customer_id), (1, 0, total_amount, discount, tax_amount)
+
+
+def item_contribution(day, customer_id, product_id, quantity, unit_price, discount):
+    return (_to_day(day), product_id, customer_id), (0, quantity, line_amount(quantity, unit_price, discount), 0, 0)
+
+
+def _in_or_null(column, values):
+    """column IN (...) - None qiymat bo'lsa IS NULL ham"""
+    present = sorted(v for v in values if v is not None)
+    condition = column.in_(present) if present else None
+    if None in values:
+        return column.is_(None) if condition is None else or_(condition, column.is_(None))
+    return condition
+
+
+def apply_deltas(connection, deltas):
+    """
+    Deltalarni jadvalga yozish: mavjud kalitlar id bo'yicha executemany UPDATE,
+    yangilari executemany INSERT bilan.
+    """
+    deltas = {key: values for key, values in deltas.items() if key[0] is not None and any(values)}
+    if not deltas:
+        return
+
+    table = DailySalesRollup.__table__
+    existing = {}
+    # Faqat deltalardagi kun/mahsulot/mijozlar - kunning barcha qatorlari emas
+    rows = connection.execute(
+        select(table.c.id, table.c.day, table.c.product_id, table.c.customer_id).where(and_(
+            table.c.day.in_(sorted({key[0] for key in deltas})),
+            _in_or_null(table.c.product_id, {key[1] for key in deltas}),
+            _in_or_null(table.c.customer_id, {key[2] for key in deltas}),
+        ))
+    )
+    for row_id, day, product_id, customer_id in rows:
+        existing.setdefault((_to_day(day), product_id, customer_id), row_id)
+
+    updates, inserts = [], []
+    for key, values in deltas.items():
+        if key in existing:
+            updates.append(dict({f'd_{f}': v for f, v in zip(FIELDS, values)}, row_id=existing[key]))
+        else:
+            inserts.append(dict(zip(FIELDS, values), day=key[0], product_id=key[1], customer_id=key[2]))
+
+    if updates:
+        connection.execute(
+            table.update().where(table.c.id == bindparam('row_id'))
+            .values({f: table.c[f] + bindparam(f'd_{f}') for f in FIELDS}),
+            updates
+        )
+    if inserts:
+        connection.execute(table.insert(), inserts)
+
+
+# ==================== ORM HODISALARI ====================
+
+def _committed(obj, attr):
+    """Flush dan oldingi (bazadagi) qiymat; yangi obyekt uchun None"""
+    history = get_history(obj, attr)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None if history.added else getattr(obj, attr)
+
+
+def _collect_deltas(session, removed_items=()):
+    deltas = {}
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    orders = {o.id: o for o in changed if isinstance(o, SalesOrder)}
+    items = {i for i in changed if isinstance(i, SalesOrderItem)} | set(removed_items)
+    deleted = set(session.deleted) | set(removed_items)
+
+    def order_state(order_id, before):
+        """Buyurtmaning (kun, mijoz) kaliti - flush dan oldingi yoki keyingi"""
+        order = orders.get(order_id) or (session.get(SalesOrder, order_id) if order_id else None)
+        if order is None:
+            return None
+        if before:
+            if order in session.new:
+                return None
+            return _committed(order, 'order_date'), _committed(order, 'customer_id')
+        if order in deleted:
+            return None
+        return order.order_date, order.customer_id
+
+    for order in orders.values():
+        if order not in session.new:
+            key, values = order_contribution(*[_committed(order, a) for a in ORDER_ATTRS])
+            add(deltas, key, values, -1)
+        if order not in deleted:
+            key, values = order_contribution(*[getattr(order, a) for a in ORDER_ATTRS])
+            add(deltas, key, values)
+        # Kun yoki mijoz o'zgarsa buyurtmaning barcha qatorlari ko'chadi
+        if order not in session.new and order not in deleted and \
+                (get_history(order, 'order_date').deleted or get_history(order, 'customer_id').deleted):
+            items.update(order.items)
+
+    for item in items:
+        if item not in session.new:
+            state = order_state(_committed(item, 'sales_order_id'), before=True)
+            if state:
+                key, values = item_contribution(*state, *[_committed(item, a) for a in ITEM_ATTRS[1:]])
+                add(deltas, key, values, -1)
+        if item not in deleted:
+            state = order_state(item.sales_order_id or (item.sales_order.id if item.sales_order else None),
+                                before=False)
+            if state:
+                key, values = item_contribution(*state, *[getattr(item, a) for a in ITEM_ATTRS[1:]])
+                add(deltas, key, values)
+    return deltas
+
+
+@event.listens_for(SalesOrderItem, 'after_delete')
+def _remember_deleted_item(mapper, connection, item):
+    """delete-orphan kaskadi flush ichida o'chiradi - bunday qatorlar session.deleted da yo'q"""
+    session = object_session(item)
+    if session is not None:
+        session.info.setdefault(DELETED_ITEMS, set()).add(item)
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_rollup(session, flush_context):
+    """Savdo o'zgarishlarini shu tranzaksiyada yig'indiga qo'shish"""
+    removed_items = session.info.pop(DELETED_ITEMS, set())
+    if not removed_items and not any(isinstance(o, (SalesOrder, SalesOrderItem))
+                                     for o in list(session.new) + list(session.dirty) + list(session.deleted)):
+        return
+    apply_deltas(session.connection(), _collect_deltas(session, removed_items))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_deleted_items(session):
+    # Flush muvaffaqiyatsiz bo'lsa after_flush chaqirilmaydi - keyingi flushga qolmasin
+    session.info.pop(DELETED_ITEMS, None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _block_bulk_writes(orm_execute_state):
+    """Bulk query.update()/delete() after_flush ni chetlab o'tadi - yig'indi bazadan ajralib qoladi"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get('rollup_maintained'):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (SalesOrder, SalesOrderItem):
+        raise RollupBypassError(
+            f"{mapper.class_.__name__} ustida bulk UPDATE/DELETE DailySalesRollup ni yangilamaydi: "
+            "ORM obyektlari orqali o'zgartiring yoki execution_options(rollup_maintained=True) "
+            "bilan bajarib, so'ng rollup.apply_deltas()/rebuild() chaqiring")
+
+
+def _track_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Yuklanmagan atributga qiymat berilganda eski qiymat ham yuklansin (delta uchun kerak)
+for _attr in ORDER_ATTRS:
+    event.listen(getattr(SalesOrder, _attr), 'set', _track_old_value, retval=True, active_history=True)
+for _attr in ITEM_ATTRS:
+    event.listen(getattr(SalesOrderItem, _attr), 'set', _track_old_value, retval=True, active_history=True)
+
+
+# ==================== O'QISH ====================
+
+def _order_rows(query, start=None, end=None):
+    query = query.filter(DailySalesRollup.product_id.is_(None))
+    if start is not None:
+        query = query.filter(DailySalesRollup.day >= _to_day(start))
+    if end is not None:
+        query = query.filter(DailySalesRollup.day <= _to_day(end))
+    return query
+
+
+def daily_totals(start=None, end=None):
+    """{'YYYY-MM-DD': (summa, buyurtmalar soni)}"""
+    rows = _order_rows(db.session.query(
+        DailySalesRollup.day,
+        db.func.sum(DailySalesRollup.amount),
+        db.func.sum(DailySalesRollup.orders)
+    ), start, end).group_by(DailySalesRollup.day).order_by(DailySalesRollup.day).all()
+    return {_to_day(day).isoformat(): (float(total or 0), int(orders or 0)) for day, total, orders in rows}
+
+
+def period_totals(start=None, end=None):
+    """Davr yig'indilari: orders, amount, discount, tax_amount"""
+    row = _order_rows(db.session.query(*[db.func.coalesce(db.func.sum(getattr(DailySalesRollup, f)), 0)
+                                         for f in ('orders', 'amount', 'discount', 'tax_amount')]),
+                      start, end).one()
+    return {'orders': int(row[0]), 'amount': float(row[1]), 'discount': float(row[2]), 'tax_amount': float(row[3])}
+
+
+def product_quantity_query(start=None, end=None):
+    """(product_id, kun, miqdor) so'rovi - chaqiruvchi qo'shimcha filtr qo'shishi mumkin"""
+    query = db.session.query(DailySalesRollup.product_id, DailySalesRollup.day,
+                             db.func.sum(DailySalesRollup.qty))\
+        .filter(DailySalesRollup.product_id.isnot(None))
+    if start is not None:
+        query = query.filter(DailySalesRollup.day >= _to_day(start))
+    if end is not None:
+        query = query.filter(DailySalesRollup.day <= _to_day(end))
+    return query.group_by(DailySalesRollup.product_id, DailySalesRollup.day)
+
+
+def product_totals_subquery(start=None):
+    """product_id bo'yicha sotilgan miqdor (subquery: product_id, sold)"""
+    query = db.session.query(DailySalesRollup.product_id.label('product_id'),
+                             db.func.sum(DailySalesRollup.qty).label('sold'))\
+        .filter(DailySalesRollup.product_id.isnot(None))
+    if start is not None:
+        query = query.filter(DailySalesRollup.day >= _to_day(start))
+    return query.group_by(DailySalesRollup.product_id).subquery()
+
+
+# ==================== QAYTA QURISH ====================
+
+def rebuild():
+    """Jadvalni SalesOrder/SalesOrderItem dan noldan qurish (backfill). Yozilgan qatorlar sonini qaytaradi."""
+    table = DailySalesRollup.__table__
+    day = db.func.date(SalesOrder.order_date)
+    columns = ['day', 'product_id', 'customer_id'] + list(FIELDS)
+
+    orders = select(
+        day, literal(None, db.Integer), SalesOrder.customer_id,
+        db.func.count(SalesOrder.id), literal(0.0),
+        db.func.coalesce(db.func.sum(SalesOrder.total_amount), 0),
+        db.func.coalesce(db.func.sum(SalesOrder.discount), 0),
+        db.func.coalesce(db.func.sum(SalesOrder.tax_amount), 0)
+    ).group_by(day, SalesOrder.customer_id)
+
+    lines = select(
+        day, SalesOrderItem.product_id, SalesOrder.customer_id,
+        literal(0), db.func.sum(SalesOrderItem.quantity),
+        db.func.sum(SalesOrderItem.quantity * SalesOrderItem.unit_price *
+                    (1 - db.func.coalesce(SalesOrderItem.discount, 0) / 100.0)),
+        literal(0.0), literal(0.0)
+    ).join(SalesOrder, SalesOrder.id == SalesOrderItem.sales_order_id)\
+        .group_by(day, SalesOrderItem.product_id, SalesOrder.customer_id)
+
+    db.session.execute(table.delete())
+    db.session.execute(insert(table).from_select(columns, orders))
+    db.session.execute(insert(table).from_select(columns, lines))
+    db.session.commit()
+    count = db.session.query(db.func.count(DailySalesRollup.id)).scalar()
+    logger.info(f"DailySalesRollup qayta qurildi: {count} qator")
+    return count
+
+
+if __name__ == '__main__':
+    from app.factory import create_app
+
+    with create_app().app_context():
+        db.create_all()
+        print(f"✅ DailySalesRollup qayta qurildi: {rebuild()} qator")
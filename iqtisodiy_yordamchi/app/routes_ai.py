@@ -6,11 +6,8 @@ from datetime import datetime
 from sqlalchemy import func
 import os
 
-# OpenAI client'ni main.py dan import qilish
-try:
-    from main import openai_client
-except ImportError:
-    openai_client = None
+# OpenAI mijozi birinchi so'rovda yaratiladi (app/extensions.py)
+from app.extensions import get_openai_client
 
 def init_ai_routes(app, db, AIAssistant, AIFeedback, login_required):
     """AI routelari yaratish"""
@@ -43,9 +40,9 @@ def init_ai_routes(app, db, AIAssistant, AIFeedback, login_required):
         source = "Static KB" # Javob manbasini kuzatish uchun
 
         # 1-qadam: OpenAI (GPT) orqali javob olishga harakat qilish
-        if openai_client and os.getenv('OPENAI_API_KEY'):
+        if os.getenv('OPENAI_API_KEY'):
             try:
-                response = openai_client.chat.completions.create(
+                response = get_openai_client().chat.completions.create(
                     model='gpt-4', # yoki 'gpt-3.5-turbo'
                     messages=[
                         {
@@ -69,7 +66,7 @@ def init_ai_routes(app, db, AIAssistant, AIFeedback, login_required):
             question_lower = question.lower()
             
             if 'bugun' in question_lower and ('sotuv' in question_lower or 'savdo' in question_lower):
-                from main import SalesOrder
+                from app.models import SalesOrder
                 today = datetime.now().date()
                 total = db.session.query(func.sum(SalesOrder.total_amount)).filter(func.date(SalesOrder.order_date) == today).scalar() or 0
                 count = SalesOrder.query.filter(func.date(SalesOrder.order_date) == today).count()
@@ -78,7 +75,7 @@ def init_ai_routes(app, db, AIAssistant, AIFeedback, login_required):
                 source = "Database (Real-time)"
                 
             elif 'ombor' in question_lower and 'kam' in question_lower:
-                from main import Product
+                from app.models import Product
                 low_stock_count = Product.query.filter(Product.quantity < Product.minimum_quantity).count()
                 if low_stock_count > 0:
                     answer = f"Hozirda {low_stock_count} xil mahsulot zaxirasi minimal miqdordan kam."
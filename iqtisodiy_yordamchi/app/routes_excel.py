@@ -10,6 +10,8 @@ from datetime import datetime
 import logging
 import os
 
+from app import permissions
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -18,7 +20,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
     
     excel_bp = Blueprint('excel', __name__, url_prefix='/api/excel')
     
-    from app.excel_generator import ExcelTableGenerator
+    # openpyxl og'ir - ExcelTableGenerator faqat jadval yaratuvchi endpointlarda import qilinadi
     from app.auto_form_filler import AutomaticFormFiller
     
     @excel_bp.route('/generate-sales-table', methods=['POST'])
@@ -34,8 +36,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
         }
         """
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user:
+            if not permissions.get_access(session['user_id']):
                 return jsonify({'error': 'Foydalanuvchi topilmadi'}), 401
             
             data = request.get_json()
@@ -65,6 +66,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
                 }
             ]
             
+            from app.excel_generator import ExcelTableGenerator
             generator = ExcelTableGenerator()
             output_file = f"reports/sales_table_{period.replace('-', '_')}.xlsx"
             os.makedirs('reports', exist_ok=True)
@@ -106,6 +108,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
                 }
             ]
             
+            from app.excel_generator import ExcelTableGenerator
             generator = ExcelTableGenerator()
             output_file = f"reports/purchase_table_{period.replace('-', '_')}.xlsx"
             os.makedirs('reports', exist_ok=True)
@@ -139,6 +142,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
                 }
             ]
             
+            from app.excel_generator import ExcelTableGenerator
             generator = ExcelTableGenerator()
             output_file = f"reports/inventory_table_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             os.makedirs('reports', exist_ok=True)
@@ -156,8 +160,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
     def generate_financial_report():
         """Moliyaviy hisobotni yaratish"""
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name not in ['admin', 'manager']:
+            if not permissions.has_role(session['user_id'], 'admin', 'manager'):
                 return jsonify({'error': 'Huquq yo\'q'}), 403
             
             data = request.get_json()
@@ -170,6 +173,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
                 'salary': 500000
             }
             
+            from app.excel_generator import ExcelTableGenerator
             generator = ExcelTableGenerator()
             output_file = f"reports/financial_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             os.makedirs('reports', exist_ok=True)
@@ -194,8 +198,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
         }
         """
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name not in ['admin', 'manager']:
+            if not permissions.has_role(session['user_id'], 'admin', 'manager'):
                 return jsonify({'error': 'Huquq yo\'q'}), 403
             
             data = request.get_json()
@@ -245,6 +248,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
                 }
             }
             
+            from app.excel_generator import ExcelTableGenerator
             generator = ExcelTableGenerator()
             output_file = f"reports/complete_report_{period.replace('-', '_')}.xlsx"
             os.makedirs('reports', exist_ok=True)
@@ -279,8 +283,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
         }
         """
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name not in ['admin', 'manager']:
+            if not permissions.has_role(session['user_id'], 'admin', 'manager'):
                 return jsonify({'error': 'Huquq yo\'q'}), 403
             
             data = request.get_json()
@@ -308,8 +311,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
     def fill_tax_form():
         """Soliq deklaratsiya formasi to'ldirish"""
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name != 'admin':
+            if not permissions.has_role(session['user_id'], 'admin'):
                 return jsonify({'error': 'Admin huquqi kerak'}), 403
             
             data = request.get_json()
@@ -335,8 +337,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
     def fill_vat_form():
         """KDV formasi to'ldirish"""
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name != 'admin':
+            if not permissions.has_role(session['user_id'], 'admin'):
                 return jsonify({'error': 'Admin huquqi kerak'}), 403
             
             data = request.get_json()
@@ -360,8 +361,7 @@ def init_excel_routes(app, db, User, SalesOrder, Customer, Product, login_requir
     def fill_payroll_form():
         """Oylik formasi to'ldirish"""
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name != 'admin':
+            if not permissions.has_role(session['user_id'], 'admin'):
                 return jsonify({'error': 'Admin huquqi kerak'}), 403
             
             data = request.get_json()
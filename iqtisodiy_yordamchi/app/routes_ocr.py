@@ -14,6 +14,8 @@ import logging
 import json
 from pathlib import Path
 
+from app import ocr_batch
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -168,25 +170,30 @@ def init_ocr_routes(app, db, User, login_required):
     @login_required
     def batch_process():
         """
-        Bir nechta hujjatlarni bir paytda qayta ishlash
+        Bir nechta hujjatlarni fonda, parallel qayta ishlash
+        
+        Fayllar sahifalarga bo'linib Celery workerlarida (brokersiz - local pulda) OCR
+        qilinadi (app/ocr_batch.py).
+        Javob darhol qaytadi - holat va tayyor natijalar GET /api/ocr/batch/<job_id> da.
         
         Request:
         {
             "files": [file1, file2, ...]
         }
         
-        Response:
+        Response (202):
         {
             "success": true,
-            "total_processed": 5,
-            "successful": 5,
-            "failed": 0,
-            "results": [...]
+            "job_id": "...",
+            "status_url": "/api/ocr/batch/<job_id>",
+            "total": 200,
+            "completed": 0,
+            "backend": "celery"
         }
         """
         try:
-            if DocumentScanner is None:
-                return jsonify({'error': 'Document scanner available emas'}), 500
+            if OCRProcessor is None:
+                return jsonify({'error': 'OCR processor available emas'}), 500
             
             if 'files' not in request.files:
                 return jsonify({'error': 'Fayllar yo\'q'}), 400
@@ -196,43 +203,50 @@ def init_ocr_routes(app, db, User, login_required):
             if not files:
                 return jsonify({'error': 'Hech qanday fayl tanlanmagan'}), 400
             
-            # Temp papka yaratish
-            temp_folder = os.path.join(UPLOAD_FOLDER, f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-            os.makedirs(temp_folder, exist_ok=True)
+            # Paket papkasi
+            job_id = ocr_batch.new_job_id()
+            job_folder = ocr_batch.job_folder(job_id)
+            os.makedirs(job_folder, exist_ok=True)
             
-            # Fayllarni saqlash
+            # Fayllarni saqlash (bir xil nomlar ustma-ust yozilmasin)
             saved_files = []
-            for file in files:
+            for index, file in enumerate(files):
                 if allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    file_path = os.path.join(temp_folder, filename)
+                    filename = secure_filename(f"{index:04d}_{file.filename}")
+                    file_path = os.path.join(job_folder, filename)
                     file.save(file_path)
                     saved_files.append(file_path)
             
             if not saved_files:
                 return jsonify({'error': 'Hech qanday valyut fayl o\'rnatilmadi'}), 400
             
-            # Batch processing
-            scanner = DocumentScanner()
-            results = []
-            for file_path in saved_files:
-                result = scanner.ocr.extract_invoice_data(file_path)
-                results.append(result)
+            # Ijrochiga yuborish - natijani kutmaymiz
+            state = ocr_batch.submit(job_id, OCRProcessor, saved_files, user_id=session['user_id'])
+            state.pop('results', None)
             
-            logger.info(f"Batch processing tugallandi: {len(results)} ta fayl")
+            logger.info(f"Batch processing boshlandi: {job_id}, {len(saved_files)} ta fayl, {state['total']} sahifa")
             
-            return jsonify({
-                'success': True,
-                'total_processed': len(results),
-                'successful': sum(1 for r in results if r.get('success', False)),
-                'failed': sum(1 for r in results if not r.get('success', False)),
-                'results': results
-            }), 200
+            return jsonify(dict(state, success=True, status_url=f"/api/ocr/batch/{job_id}")), 202
         
         except Exception as e:
             logger.error(f"Batch process error: {str(e)}")
             return jsonify({'error': str(e)}), 500
     
+    @ocr_bp.route('/batch/<job_id>', methods=['GET'])
+    @login_required
+    def batch_status(job_id):
+        """
+        Paket holati: progress va tayyor bo'lgan natijalar (tayyor bo'lmaganlari null).
+        Faqat paket egasiga - boshqa foydalanuvchiga 404.
+        
+        Query: results=false - natijalarsiz, faqat progress
+        """
+        include_results = request.args.get('results', 'true').lower() != 'false'
+        state = ocr_batch.status(job_id, include_results=include_results, user_id=session['user_id'])
+        if state is None:
+            return jsonify({'error': 'Paket topilmadi'}), 404
+        return jsonify(state), 200
+    
     @ocr_bp.route('/get-uploaded-files', methods=['GET'])
     @login_required
     def get_uploaded_files():
@@ -303,7 +317,7 @@ def init_ocr_routes(app, db, User, login_required):
         """
         try:
             if format not in ['excel', 'json']:
-                return jsonify({'error': 'Noto'g'ri format'}), 400
+                return jsonify({'error': 'Noto\'g\'ri format'}), 400
             
             data = request.get_json()
             results = data.get('results', [])
@@ -1,83 +1,70 @@
 """
 Report & Export Routes - Excel, PDF, Charts
 """
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from app.extensions import db
-from app.models import Report, SalesOrder, Product, CashRegister, Expense
+from app.models import (Report, SalesOrder, Product, CashRegister, Expense, Customer,
+                        Supplier, PurchaseOrder, Invoice, CashTransaction)
 from app.main import login_required
-from io import BytesIO, StringIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+from app import rollup
+from io import StringIO
 from datetime import datetime, timedelta
 import csv
+import tempfile
+import zlib
 
 reports_bp = Blueprint('reports', __name__)
 
 
+# Eksportlar server-side kursordan shuncha qatordan o'qiydi - xotira eksport hajmiga bog'liq emas
+EXPORT_YIELD_PER = 1000
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _format_row(row):
+    """Sana ustunlarini YYYY-MM-DD ko'rinishiga keltirish"""
+    return [v.strftime('%Y-%m-%d') if isinstance(v, datetime) else v for v in row]
+
+
+def _send_xlsx(write, download_name):
+    """
+    Write-only workbook ni vaqtinchalik faylga yozib, bo'laklab yuborish.
+    Fayl javob yopilganda o'chadi.
+    """
+    tmp = tempfile.TemporaryFile()
+    write(tmp)
+    tmp.seek(0)
+    return send_file(tmp, mimetype=XLSX_MIMETYPE, as_attachment=True, download_name=download_name)
+
+
 @reports_bp.route('/api/reports/sales-excel', methods=['GET'])
 @login_required
 def export_sales_excel():
     """Sotuvlar hisobotini Excel qilib export qilish"""
+    from app.excel_generator import ExcelTableGenerator  # openpyxl faqat eksportda yuklanadi
+
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    # Ma'lumotlarni filtrlash
-    query = SalesOrder.query
+    # Ma'lumotlarni filtrlash (mijoz nomi JOIN bilan, ORM obyektlarsiz - kursordan oqim)
+    query = db.session.query(
+        SalesOrder.id, SalesOrder.number, Customer.name, SalesOrder.order_date,
+        SalesOrder.total_amount, SalesOrder.discount, SalesOrder.tax_amount, SalesOrder.status
+    ).outerjoin(Customer, SalesOrder.customer_id == Customer.id)
     if start_date:
         query = query.filter(SalesOrder.order_date >= datetime.fromisoformat(start_date))
     if end_date:
         query = query.filter(SalesOrder.order_date <= datetime.fromisoformat(end_date))
-    
-    orders = query.all()
-    
-    # Excel workbook yaratish
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Sotuvlar"
-    
-    # Headers
-    headers = ['ID', 'Raqam', 'Mijoz', 'Sana', 'Summa', 'Chegirma', 'Vergi', 'Holat']
-    ws.append(headers)
-    
-    # Header formatini qo'lsh
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Ma'lumotlarni qo'shish
-    for order in orders:
-        ws.append([
-            order.id,
-            order.number,
-            order.customer.name,
-            order.order_date.strftime('%Y-%m-%d'),
-            order.total_amount,
-            order.discount,
-            order.tax_amount,
-            order.status
-        ])
-    
-    # Ustunlar kengligini sozlash
-    ws.column_dimensions['A'].width = 10
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 20
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 12
-    
-    # File ga saqlash
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'sotuvlar_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    rows = (_format_row(row) for row in query.order_by(SalesOrder.id).yield_per(EXPORT_YIELD_PER))
+    
+    return _send_xlsx(
+        lambda output: ExcelTableGenerator().write_stream(
+            output, "Sotuvlar",
+            ['ID', 'Raqam', 'Mijoz', 'Sana', 'Summa', 'Chegirma', 'Vergi', 'Holat'],
+            rows,
+            widths=[10, 15, 20, 12, 12]
+        ),
+        f'sotuvlar_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     )
 
 
@@ -85,45 +72,22 @@ def export_sales_excel():
 @login_required
 def export_inventory_excel():
     """Inventar hisobotini Excel qilib export qilish"""
-    products = Product.query.all()
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Inventar"
-    
-    headers = ['ID', 'Kodi', 'Nomi', 'Kategoriya', 'Birligi', 'Sotib olish narxi', 
-               'Sotish narxi', 'Qoldiq', 'Minimal qoldiq']
-    ws.append(headers)
-    
-    header_fill = PatternFill(start_color="70AD47", end_color="70AD47", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-    
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-    
-    for product in products:
-        ws.append([
-            product.id,
-            product.code,
-            product.name,
-            product.category,
-            product.unit,
-            product.purchase_price,
-            product.sale_price,
-            product.quantity,
-            product.minimum_quantity
-        ])
-    
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'inventar_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    from app.excel_generator import ExcelTableGenerator
+
+    rows = db.session.query(
+        Product.id, Product.code, Product.name, Product.category, Product.unit,
+        Product.purchase_price, Product.sale_price, Product.quantity, Product.minimum_quantity
+    ).order_by(Product.id).yield_per(EXPORT_YIELD_PER)
+    
+    return _send_xlsx(
+        lambda output: ExcelTableGenerator().write_stream(
+            output, "Inventar",
+            ['ID', 'Kodi', 'Nomi', 'Kategoriya', 'Birligi', 'Sotib olish narxi',
+             'Sotish narxi', 'Qoldiq', 'Minimal qoldiq'],
+            rows,
+            header_style='erp_header_green'
+        ),
+        f'inventar_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
     )
 
 
@@ -169,15 +133,8 @@ def sales_chart():
     days = request.args.get('days', 30, type=int)
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    orders = SalesOrder.query.filter(SalesOrder.order_date >= start_date).all()
-    
-    # Har kuni sotuvlarni to'plash
-    daily_sales = {}
-    for order in orders:
-        date_str = order.order_date.strftime('%Y-%m-%d')
-        if date_str not in daily_sales:
-            daily_sales[date_str] = 0
-        daily_sales[date_str] += order.total_amount
+    # Kunlik yig'indilar DailySalesRollup dan - buyurtmalar aylanib chiqilmaydi
+    daily_sales = {day: total for day, (total, _) in rollup.daily_totals(start_date).items()}
     
     data = {
         'labels': list(daily_sales.keys()),
@@ -196,17 +153,12 @@ def summary_report():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
     
-    query = SalesOrder.query
-    if start_date:
-        query = query.filter(SalesOrder.order_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(SalesOrder.order_date <= datetime.fromisoformat(end_date))
-    
-    orders = query.all()
-    
-    total_sales = sum([o.total_amount for o in orders])
-    total_discount = sum([o.discount for o in orders])
-    total_tax = sum([o.tax_amount for o in orders])
+    totals = rollup.period_totals(datetime.fromisoformat(start_date) if start_date else None,
+                                  datetime.fromisoformat(end_date) if end_date else None)
+    total_sales = totals['amount']
+    total_discount = totals['discount']
+    total_tax = totals['tax_amount']
+    orders_count = totals['orders']
     
     expenses = Expense.query.all()
     total_expenses = sum([e.amount for e in expenses])
@@ -220,48 +172,111 @@ def summary_report():
         'total_tax': total_tax,
         'total_expenses': total_expenses,
         'net_profit': profit,
-        'orders_count': len(orders),
-        'average_order': total_sales / len(orders) if orders else 0
+        'orders_count': orders_count,
+        'average_order': total_sales / orders_count if orders_count else 0
     }), 200
 
 
+# CSV export: shuncha qator bitta bo'lak (chunk) qilib yuboriladi
+CSV_CHUNK_ROWS = 1000
+
+# hisobot turi -> (sarlavhalar, ORM obyektlarsiz ustunlar so'rovi)
+CSV_REPORTS = {
+    'sales': (
+        ['ID', 'Raqam', 'Mijoz', 'Sana', 'Summa', 'Holat'],
+        lambda: db.session.query(
+            SalesOrder.id, SalesOrder.number, Customer.name,
+            SalesOrder.order_date, SalesOrder.total_amount, SalesOrder.status
+        ).outerjoin(Customer, SalesOrder.customer_id == Customer.id).order_by(SalesOrder.id)
+    ),
+    'products': (
+        ['ID', 'Kodi', 'Nomi', 'Narxi', 'Qoldiq'],
+        lambda: db.session.query(
+            Product.id, Product.code, Product.name, Product.sale_price, Product.quantity
+        ).order_by(Product.id)
+    ),
+    'purchases': (
+        ['ID', 'Raqam', 'Yetkazuvchi', 'Sana', 'Summa', 'Holat'],
+        lambda: db.session.query(
+            PurchaseOrder.id, PurchaseOrder.number, Supplier.name,
+            PurchaseOrder.order_date, PurchaseOrder.total_amount, PurchaseOrder.status
+        ).outerjoin(Supplier, PurchaseOrder.supplier_id == Supplier.id).order_by(PurchaseOrder.id)
+    ),
+    'invoices': (
+        ['ID', 'Raqam', 'Mijoz', 'Sana', 'Summa', 'To\'langan', 'Holat'],
+        lambda: db.session.query(
+            Invoice.id, Invoice.number, Customer.name, Invoice.invoice_date,
+            Invoice.total_amount, Invoice.paid_amount, Invoice.status
+        ).outerjoin(Customer, Invoice.customer_id == Customer.id).order_by(Invoice.id)
+    ),
+    'expenses': (
+        ['ID', 'Raqam', 'Kategoriya', 'Sana', 'Summa', 'To\'lov usuli', 'Holat'],
+        lambda: db.session.query(
+            Expense.id, Expense.number, Expense.category, Expense.expense_date,
+            Expense.amount, Expense.payment_method, Expense.status
+        ).order_by(Expense.id)
+    ),
+    'cash': (
+        ['ID', 'Kassa', 'Sana', 'Turi', 'Summa', 'Izoh'],
+        lambda: db.session.query(
+            CashTransaction.id, CashRegister.name, CashTransaction.transaction_date,
+            CashTransaction.transaction_type, CashTransaction.amount, CashTransaction.description
+        ).outerjoin(CashRegister, CashTransaction.cash_register_id == CashRegister.id)
+        .order_by(CashTransaction.id)
+    ),
+}
+
+
+def _csv_chunks(headers, rows):
+    """Qatorlarni CSV_CHUNK_ROWS talik bo'laklarga yozib, UTF-8 baytlar qaytarish"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    pending = 0
+    for row in rows:
+        writer.writerow(_format_row(row))
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode()
+
+
+def _gzip_chunks(chunks):
+    """Bo'laklarni bitta gzip oqimi qilib siqish"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip sarlavhasi
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @reports_bp.route('/api/reports/csv-export', methods=['GET'])
 @login_required
 def csv_export():
-    """CSV formatda export"""
+    """CSV formatda export (oqim bilan - butun fayl xotirada yig'ilmaydi)"""
     report_type = request.args.get('type', 'sales')
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    if report_type == 'sales':
-        orders = SalesOrder.query.all()
-        writer.writerow(['ID', 'Raqam', 'Mijoz', 'Sana', 'Summa', 'Holat'])
-        for order in orders:
-            writer.writerow([
-                order.id,
-                order.number,
-                order.customer.name,
-                order.order_date.strftime('%Y-%m-%d'),
-                order.total_amount,
-                order.status
-            ])
-    elif report_type == 'products':
-        products = Product.query.all()
-        writer.writerow(['ID', 'Kodi', 'Nomi', 'Narxi', 'Qoldiq'])
-        for product in products:
-            writer.writerow([
-                product.id,
-                product.code,
-                product.name,
-                product.sale_price,
-                product.quantity
-            ])
-    
-    output.seek(0)
-    return send_file(
-        BytesIO(output.getvalue().encode()),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'{report_type}_{datetime.now().strftime("%Y%m%d")}.csv'
+    report = CSV_REPORTS.get(report_type)
+    if report is None:
+        return jsonify({'error': 'Noma\'lum hisobot turi', 'types': sorted(CSV_REPORTS)}), 400
+
+    headers, build_query = report
+    rows = build_query().yield_per(EXPORT_YIELD_PER)
+    # werkzeug q qiymatlarini hisobga oladi: "gzip;q=0" - rad etish
+    use_gzip = request.accept_encodings['gzip'] > 0
+
+    chunks = _csv_chunks(headers, rows)
+    if use_gzip:
+        chunks = _gzip_chunks(chunks)
+
+    response = Response(stream_with_context(chunks), mimetype='text/csv')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={report_type}_{datetime.now().strftime("%Y%m%d")}.csv'
     )
+    response.headers['Vary'] = 'Accept-Encoding'
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
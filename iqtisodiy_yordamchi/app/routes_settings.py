@@ -2,10 +2,14 @@
 Offline Mode & Settings Routes - Sync, Roles, Permissions
 """
 from flask import Blueprint, request, jsonify, session
-from main import db, User, Role, OfflineSync, SystemConfig, login_required
+from app.extensions import db
+from app.main import login_required
+from app.models import User, Role, OfflineSync, SystemConfig
 from datetime import datetime
 import json
 
+from app import offline_sync, permissions, sync_log, system_config
+
 settings_bp = Blueprint('settings', __name__)
 
 
@@ -41,6 +45,7 @@ def role_detail(role_id):
         role.permissions = data.get('permissions', role.permissions)
         role.description = data.get('description', role.description)
         db.session.commit()
+        permissions.invalidate()
         return jsonify({'message': 'Roll yangilandi'}), 200
 
 
@@ -56,6 +61,7 @@ def change_user_role(user_id):
     user.role_id = new_role_id
     
     db.session.commit()
+    permissions.invalidate()
     
     return jsonify({
         'message': 'Foydalanuvchi roli o\'zgartirildi',
@@ -101,48 +107,52 @@ def sync_offline_data():
 @settings_bp.route('/api/offline/get-data', methods=['GET'])
 @login_required
 def get_offline_data():
-    """Offline rejim uchun kerak bo'ladigan ma'lumotlarni olish"""
+    """
+    Offline rejim uchun ma'lumotlar - delta sinxronizatsiya.
+
+    ?since=<token> - shu tokendan keyin qo'shilgan/o'zgargan qatorlar va
+    o'chirilganlar (deleted). since berilmasa 0 - to'liq yuklash. Javobda
+    has_more=true bo'lsa keyingi sahifa qaytgan token bilan so'raladi.
+    ?limit - sahifadagi qatorlar soni (ko'pi bilan sync_log.MAX_PAGE_SIZE).
+    """
     user_id = session.get('user_id')
     device_id = request.args.get('device_id')
     
-    user = User.query.get(user_id)
+    access = permissions.get_access(user_id)
+    if access is None:
+        return jsonify({'error': 'Foydalanuvchi topilmadi'}), 401
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', sync_log.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'since va limit butun son bo\'lishi kerak'}), 400
+    
+    # Role asosida ma'lumotlarni filtrlash
+    tables = []
+    if 'read' in access['permissions'].get('sales', []):
+        tables += ['sales_orders', 'customers']
+    if 'read' in access['permissions'].get('inventory', []):
+        tables.append('products')
+    
+    try:
+        delta = sync_log.changes_since(since, tables, limit)
+    except sync_log.ResyncRequired as e:
+        return jsonify({'error': str(e), 'resync': True}), 410
     
     # Foydalanuvchi ruxsatnomalariga asoslanib ma'lumotlarni berish
     data = {
         'user': {
-            'id': user.id,
-            'username': user.username,
-            'role': user.role.name if user.role else 'user'
+            'id': access['user_id'],
+            'username': access['username'],
+            'role': access['role'] or 'user'
         },
-        'timestamp': datetime.utcnow().isoformat()
+        'timestamp': datetime.utcnow().isoformat(),
+        'since': str(since),
+        'token': delta['token'],
+        'has_more': delta['has_more'],
+        'deleted': delta['deleted']
     }
-    
-    # Role asosida ma'lumotlarni filtrlash
-    if user.role and 'read' in user.role.permissions.get('sales', []):
-        from main import SalesOrder, Customer
-        data['sales_orders'] = [{
-            'id': o.id,
-            'number': o.number,
-            'customer_id': o.customer_id,
-            'total_amount': o.total_amount,
-            'status': o.status
-        } for o in SalesOrder.query.all()]
-        
-        data['customers'] = [{
-            'id': c.id,
-            'name': c.name,
-            'phone': c.phone
-        } for c in Customer.query.all()]
-    
-    if user.role and 'read' in user.role.permissions.get('inventory', []):
-        from main import Product
-        data['products'] = [{
-            'id': p.id,
-            'code': p.code,
-            'name': p.name,
-            'quantity': p.quantity,
-            'sale_price': p.sale_price
-        } for p in Product.query.all()]
+    data.update(delta['changes'])
     
     return jsonify(data), 200
 
@@ -152,58 +162,28 @@ def get_offline_data():
 def push_offline_changes():
     """Offline rejimda qilingan o'zgarishlarni server ga jo'natish"""
     user_id = session.get('user_id')
-    data = request.json
+    try:
+        # JSON, gzip (Content-Encoding) yoki msgpack (Content-Type) tana
+        data = offline_sync.decode_body(request.get_data(), request.headers.get('Content-Encoding'),
+                                        request.mimetype)
+    except offline_sync.UnsupportedPayload as e:
+        return jsonify({'error': str(e)}), 415
+    except offline_sync.SyncPayloadError as e:
+        return jsonify({'error': str(e)}), 400
     changes = data.get('changes', {})
     device_id = data.get('device_id')
     
     # Bu yerda oddiy "oxirgisi yutadi" (last-write-wins) strategiyasi qo'llanilgan.
     # Haqiqiy tizimda murakkabroq konfliktlarni hal qilish logikasi kerak bo'lishi mumkin.
     
+    summary = {}
     try:
-        # Har bir o'zgarish uchun qayta yaratish
+        # Har bir modul paket bilan: oldindan IN yuklash, executemany INSERT, yig'ilgan UPDATE
         for module, operations in changes.items():
             if module == 'sales':
-                from main import SalesOrder, SalesOrderItem, Product
-                for op in operations:
-                    if op.get('type') == 'create':
-                        order_data = op.get('data', {})
-                        items_data = order_data.pop('items', [])
-                        
-                        # Yangi buyurtmani bazaga qo'shish
-                        new_order = SalesOrder(
-                            number=order_data.get('number'),
-                            customer_id=order_data.get('customer_id'),
-                            total_amount=order_data.get('total_amount'),
-                            status='Synced', # Holatni sinxron qilingan deb belgilash
-                        )
-                        db.session.add(new_order)
-                        db.session.flush() # new_order.id olish uchun
-
-                        # Buyurtma mahsulotlarini qo'shish
-                        for item_data in items_data:
-                            new_item = SalesOrderItem(
-                                sales_order_id=new_order.id,
-                                product_id=item_data.get('product_id'),
-                                quantity=item_data.get('quantity'),
-                                unit_price=item_data.get('unit_price')
-                            )
-                            db.session.add(new_item)
-                            
-                            # Ombor qoldig'ini kamaytirish
-                            product = Product.query.get(item_data.get('product_id'))
-                            if product:
-                                product.quantity -= item_data.get('quantity', 0)
-                                db.session.add(product)
-
+                summary['sales'] = offline_sync.push_sales_orders(operations)
             elif module == 'inventory':
-                from main import Product
-                for op in operations:
-                    if op.get('type') == 'update':
-                        inv_data = op.get('data', {})
-                        product = Product.query.get(inv_data.get('id'))
-                        if product:
-                            product.quantity = inv_data.get('quantity')
-                            db.session.add(product)
+                summary['inventory'] = {'updated': offline_sync.push_inventory(operations)}
         
         # Barcha o'zgarishlarni bazaga yozish
         db.session.commit()
@@ -213,20 +193,30 @@ def push_offline_changes():
         return jsonify({'error': f'Sinxronizatsiya xatosi: {str(e)}'}), 500
     
     # Sync recordni yangilash
-    offline_sync = OfflineSync.query.filter_by(
+    sync_record = OfflineSync.query.filter_by(
         user_id=user_id,
         device_id=device_id
     ).first()
     
-    if offline_sync:
-        offline_sync.is_synced = True
-        offline_sync.pending_changes = {} # Kutilayotgan o'zgarishlarni tozalash
-        offline_sync.last_sync = datetime.utcnow()
+    # Rad etilgan buyurtmalar bo'lsa paket qisman qabul qilingan: kutilayotgan
+    # o'zgarishlar tozalanmaydi, javob 207 - qurilma skipped_orders bo'yicha qayta yuboradi
+    rejected = summary.get('sales', {}).get('rejected', 0)
+    if sync_record and not rejected:
+        sync_record.is_synced = True
+        sync_record.pending_changes = {} # Kutilayotgan o'zgarishlarni tozalash
+        sync_record.last_sync = datetime.utcnow()
         db.session.commit()
     
+    if rejected:
+        return jsonify({
+            'message': f'O\'zgarishlar qisman qabul qilindi: {rejected} ta buyurtma rad etildi',
+            'synced_modules': list(changes.keys()),
+            'summary': summary
+        }), 207
     return jsonify({
         'message': 'O\'zgarishlar qabul qilindi',
-        'synced_modules': list(changes.keys())
+        'synced_modules': list(changes.keys()),
+        'summary': summary
     }), 200
 
 
@@ -251,15 +241,15 @@ def get_permissions():
 def get_current_user_permissions():
     """Joriy foydalanuvchining ruxsatnomalarini olish"""
     user_id = session.get('user_id')
-    user = User.query.get(user_id)
-    
-    permissions = user.role.permissions if user.role else {}
+    access = permissions.get_access(user_id)
+    if access is None:
+        return jsonify({'error': 'Foydalanuvchi topilmadi'}), 401
     
     return jsonify({
         'user_id': user_id,
-        'username': user.username,
-        'role': user.role.name if user.role else 'unknown',
-        'permissions': permissions
+        'username': access['username'],
+        'role': access['role'] or 'unknown',
+        'permissions': access['permissions']
     }), 200
 
 
@@ -299,6 +289,7 @@ def update_system_settings():
                 db.session.add(config)
                 
         db.session.commit()
+        system_config.invalidate()
         return jsonify({'message': 'Sozlamalar saqlandi'}), 200
     except Exception as e:
         db.session.rollback()
@@ -324,4 +315,5 @@ def init_default_settings():
             count += 1
     
     db.session.commit()
+    system_config.invalidate()
     return jsonify({'message': f'{count} ta sozlama yaratildi'}), 201
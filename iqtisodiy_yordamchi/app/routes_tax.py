@@ -12,6 +12,8 @@ import os
 from dotenv import load_dotenv
 import logging
 
+from app import permissions
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -51,23 +53,28 @@ def init_tax_routes(app, db, User, SalesOrder, Customer, Invoice, login_required
         }
         """
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name != 'admin':
+            if not permissions.has_role(session['user_id'], 'admin'):
                 return jsonify({'error': 'Admin huquqi kerak'}), 403
             
             data = request.get_json()
             period = data.get('period', datetime.now().strftime('%Y-%m'))
+            # Tuzatilgan hisobotni qayta yuborish: revision 1, 2, ... (0 - oddiy yuborish)
+            revision = data.get('revision', 0)
+            if isinstance(revision, bool) or not isinstance(revision, int) or revision < 0:
+                return jsonify({'error': 'revision manfiy bo\'lmagan butun son bo\'lishi kerak'}), 400
             
             # Celery task orqali asinxron yuborish
             try:
                 from app.celery_tasks import send_tax_reports_async
                 
                 task = send_tax_reports_async.delay(
+                    user_id=session['user_id'],
                     period=period,
                     include_sales=data.get('include_sales', True),
                     include_vat=data.get('include_vat', True),
                     include_payroll=data.get('include_payroll', True),
-                    include_declaration=data.get('include_declaration', False)
+                    include_declaration=data.get('include_declaration', False),
+                    revision=revision
                 )
                 
                 return jsonify({
@@ -103,8 +110,7 @@ def init_tax_routes(app, db, User, SalesOrder, Customer, Invoice, login_required
             from openpyxl.styles import Font, PatternFill, Alignment
             from io import BytesIO
             
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name != 'admin':
+            if not permissions.has_role(session['user_id'], 'admin'):
                 return jsonify({'error': 'Admin huquqi kerak'}), 403
             
             data = request.get_json()
@@ -163,8 +169,7 @@ def init_tax_routes(app, db, User, SalesOrder, Customer, Invoice, login_required
     def send_telegram_notification():
         """Telegram orqali soliq hisoboti haqida xabar yuborish"""
         try:
-            user = db.session.query(User).filter_by(id=session['user_id']).first()
-            if not user or user.role.name not in ['admin', 'manager']:
+            if not permissions.has_role(session['user_id'], 'admin', 'manager'):
                 return jsonify({'error': 'Huquq kerak'}), 403
             
             data = request.get_json()
@@ -0,0 +1,184 @@
+"""
+JSON Schema validatorlar reestri
+
+`app/schemas/*.json` dagi har bir schema bir marta kompilyatsiya qilinadi
+(Draft7Validator) va payload ning yuqori darajadagi kalitlari bo'yicha
+tanlanadi: {"sales_orders": [...]} -> sales_orders.json. Fayl o'zgarsa
+(mtime) validator qayta yuklanadi - server qayta ishga tushirilmaydi.
+
+    registry = SchemaRegistry(Path('app/schemas'))
+    name, errors = registry.validate(payload, max_errors=100)
+
+jsonschema va schema fayllari birinchi tekshiruvda yuklanadi, import
+vaqtida emas - ilova va Celery workerlar tez ishga tushadi.
+"""
+
+from itertools import islice
+from pathlib import Path
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Fayllar mtime ni shu oraliqdan tez-tez tekshirmaslik (sekund)
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class SchemaRegistry:
+    """Kompilyatsiya qilingan validatorlar keshi"""
+
+    def __init__(self, schema_dir, defaults=None, check_interval=RELOAD_CHECK_INTERVAL):
+        self.schema_dir = Path(schema_dir)
+        self.check_interval = check_interval
+        self._default_schemas = dict(defaults or {})
+        self._defaults = None
+        self._entries = {}    # nomi -> (mtime, validator)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _compile(name, schema):
+        from jsonschema import Draft7Validator  # og'ir kutubxona - birinchi tekshiruvda yuklanadi
+
+        Draft7Validator.check_schema(schema)
+        return Draft7Validator(schema)
+
+    def _refresh(self):
+        """O'zgargan/yangi fayllarni qayta kompilyatsiya qilish, o'chirilganlarini tashlash"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            seen = set()
+            files = sorted(self.schema_dir.glob('*.json')) if self.schema_dir.exists() else []
+            for schema_file in files:
+                name = schema_file.stem
+                seen.add(name)
+                try:
+                    mtime = schema_file.stat().st_mtime
+                    cached = self._entries.get(name)
+                    if cached and cached[0] == mtime:
+                        continue
+                    with open(schema_file, 'r') as f:
+                        validator = self._compile(name, json.load(f))
+                    self._entries[name] = (mtime, validator)
+                    logger.info(f"Schema yuklandi: {name}")
+                except Exception as e:
+                    # Buzilgan fayl: eski validator (bo'lsa) ishlashda davom etadi
+                    logger.error(f"Failed to load schema {schema_file}: {e}")
+            for name in set(self._entries) - seen:
+                del self._entries[name]
+            self._checked_at = now
+
+    def validators(self):
+        """{nomi: validator} - fayldagilar default larni almashtiradi"""
+        if self._defaults is None:
+            with self._lock:
+                if self._defaults is None:
+                    self._defaults = {name: self._compile(name, schema)
+                                      for name, schema in self._default_schemas.items()}
+        self._refresh()
+        # _refresh boshqa oqimda _entries dan o'chirishi mumkin - nusxa qulf ostida olinadi
+        with self._lock:
+            entries = list(self._entries.items())
+        merged = dict(self._defaults)
+        merged.update({name: validator for name, (_, validator) in entries})
+        return merged
+
+    def get(self, name):
+        return self.validators().get(name)
+
+    def resolve(self, payload):
+        """
+        Payload ga mos schema nomini topish.
+
+        `required` kalitlari payload da bor schemalardan eng aniqi (eng ko'p
+        required) tanlanadi; topilmasa kalit nomi schema nomiga teng bo'lgani.
+        """
+        if not isinstance(payload, dict):
+            return None
+        keys = set(payload)
+        validators = self.validators()
+        best, best_size = None, -1
+        for name, validator in validators.items():
+            required = set(validator.schema.get('required', []))
+            if required and required <= keys and len(required) > best_size:
+                best, best_size = name, len(required)
+        if best is None:
+            best = next((key for key in payload if key in validators), None)
+        return best
+
+    def validate(self, payload, name=None, max_errors=None):
+        """
+        Payload ni tekshirish. Qaytaradi: (schema nomi, xatolar ro'yxati).
+
+        max_errors berilsa birinchi N ta xatodan keyin to'xtaydi - katta
+        payloadlarda qolgan qatorlar umuman aylanib chiqilmaydi.
+        """
+        name = name or self.resolve(payload)
+        validator = self.get(name) if name else None
+        if validator is None:
+            keys = sorted(payload) if isinstance(payload, dict) else []
+            return None, [{'path': [], 'message': f"Mos schema topilmadi (kalitlar: {keys})"}]
+
+        errors = validator.iter_errors(payload)
+        if max_errors:
+            errors = islice(errors, max_errors)
+        return name, [{'path': list(err.path), 'message': err.message} for err in errors]
+
+
+# Fayl (app/schemas/sales_orders.json) bo'lmasa ishlatiladigan zaxira schema
+SALES_ORDER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sales_orders": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {"type": "integer"},
+                    "order_date": {"type": "string", "format": "date"},
+                    "items": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "product_id": {"type": "integer"},
+                                "quantity": {"type": "number"},
+                                "unit_price": {"type": "number"}
+                            },
+                            "required": ["product_id", "quantity"]
+                        }
+                    }
+                },
+                "required": ["customer_id", "items"]
+            }
+        }
+    },
+    "required": ["sales_orders"]
+}
+SCHEMA_DIR = Path(__file__).parent / 'schemas'
+SCHEMA_MAX_ERRORS = int(os.getenv('SCHEMA_MAX_ERRORS', '100'))
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def default_registry():
+    """app/schemas uchun umumiy reestr (birinchi chaqiruvda yaratiladi)"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = SchemaRegistry(SCHEMA_DIR, defaults={'sales_orders': SALES_ORDER_SCHEMA})
+    return _default_registry
+
+
+def validate_with_schema(payload, name=None, max_errors=SCHEMA_MAX_ERRORS):
+    """Validate a payload with the matching JSON Schema. Returns (schema name, list of errors)."""
+    return default_registry().validate(payload, name=name, max_errors=max_errors)
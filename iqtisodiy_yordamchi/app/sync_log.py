@@ -0,0 +1,198 @@
+"""
+Offline sinxronizatsiya uchun o'zgarishlar jurnali (delta sync)
+
+Kuzatiladigan jadvallardagi (sales_orders, customers, products) har bir
+INSERT/UPDATE/DELETE `sync_change` ga (jadval, qator id) yozuvi qo'shadi -
+ORM orqali `after_flush` hodisasida, Core executemany yo'llarida esa
+`record()` bilan.
+
+Token - yozuvning `seq` raqami. U insert paytida emas, commit oldidan
+(`before_commit`) beriladi: SyncSequence qatori FOR UPDATE bilan qulflanadi
+va commit gacha ushlab turiladi, shuning uchun seq tartibi commit tartibiga
+teng. Berilgan token dan kichik seq li yozuv keyinroq paydo bo'lmaydi -
+uzoq tranzaksiyalar (ingest bo'lagi, offline push) ham o'tkazib yuborilmaydi.
+
+`/api/offline/get-data?since=<token>` tokendan keyingi o'zgargan qatorlarni
+(bir qator bir marta, eng oxirgi holati bilan) sahifalab qaytaradi; bazada
+yo'q qatorlar o'chirilgan (tombstone) sifatida beriladi. Javob hajmi baza
+hajmiga emas, o'zgarishlar soniga bog'liq. since=0 - to'liq boshlang'ich
+yuklash (migratsiya mavjud qatorlarni jurnalga yozadi).
+"""
+
+from datetime import datetime
+import logging
+
+from sqlalchemy import bindparam, event, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Customer, Product, SalesOrder, SyncChange, SyncSequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 2000
+# IN (...) ro'yxati uzunligi
+LOOKUP_BATCH = 900
+# connection.info kaliti: shu tranzaksiyada seq berilmagan yozuvlar bor
+PENDING = 'sync_log_pending'
+
+# API nomi -> (model, qatorni dict ga aylantirish)
+TABLES = {
+    'sales_orders': (SalesOrder, lambda o: {
+        'id': o.id,
+        'number': o.number,
+        'customer_id': o.customer_id,
+        'total_amount': o.total_amount,
+        'status': o.status
+    }),
+    'customers': (Customer, lambda c: {
+        'id': c.id,
+        'name': c.name,
+        'phone': c.phone
+    }),
+    'products': (Product, lambda p: {
+        'id': p.id,
+        'code': p.code,
+        'name': p.name,
+        'quantity': p.quantity,
+        'sale_price': p.sale_price
+    }),
+}
+_TABLE_BY_MODEL = {model: name for name, (model, _) in TABLES.items()}
+
+
+class ResyncRequired(Exception):
+    """Token bu bazaga tegishli emas - mijoz since=0 dan qayta yuklashi kerak"""
+
+
+def record(connection, table_name, row_ids):
+    """Core (executemany) yo'llari uchun: o'zgargan qatorlarni jurnalga yozish (seq commit da)"""
+    now = datetime.utcnow()
+    rows = [{'table_name': table_name, 'row_id': row_id, 'created_at': now} for row_id in row_ids]
+    if rows:
+        connection.execute(SyncChange.__table__.insert(), rows)
+        connection.info[PENDING] = True
+
+
+def assign_sequence(connection):
+    """
+    Tranzaksiyaning seq siz yozuvlariga ketma-ket seq berish.
+
+    SyncSequence qatori commit gacha qulflangan qoladi: keyingi yozuvchi
+    tranzaksiya shu commit tugashini kutadi. Boshqa tranzaksiyalarning
+    commit qilinmagan yozuvlari bu yerda ko'rinmaydi.
+    """
+    counter = SyncSequence.__table__
+    locked = select(counter.c.value).where(counter.c.id == 1).with_for_update()
+    value = connection.execute(locked).scalar()
+    if value is None:
+        start = connection.execute(select(db.func.coalesce(db.func.max(SyncChange.seq), 0))).scalar()
+        connection.execute(counter.insert(), {'id': 1, 'value': start})
+        value = connection.execute(locked).scalar()
+
+    table = SyncChange.__table__
+    pending = connection.execute(
+        select(table.c.id).where(table.c.seq.is_(None)).order_by(table.c.id)
+    ).scalars().all()
+    if not pending:
+        return value
+    connection.execute(
+        table.update().where(table.c.id == bindparam('change_id')).values(seq=bindparam('new_seq')),
+        [{'change_id': change_id, 'new_seq': value + i} for i, change_id in enumerate(pending, 1)]
+    )
+    value += len(pending)
+    connection.execute(counter.update().where(counter.c.id == 1).values(value=value))
+    return value
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + list(session.deleted):
+        name = _TABLE_BY_MODEL.get(type(obj))
+        if name:
+            changed.setdefault(name, set()).add(obj.id)
+    for obj in session.dirty:
+        name = _TABLE_BY_MODEL.get(type(obj))
+        if name and session.is_modified(obj, include_collections=False):
+            changed.setdefault(name, set()).add(obj.id)
+    for name, ids in changed.items():
+        record(session.connection(), name, sorted(ids))
+
+
+@event.listens_for(Session, 'before_commit')
+def _sequence_changes(session):
+    """Commit oldidan: oxirgi flush ham jurnalga tushsin, so'ng seq berilsin"""
+    if not session.in_transaction():
+        return
+    # before_commit yakuniy flush dan oldin chaqiriladi
+    session.flush()
+    connection = session.connection()
+    if connection.info.pop(PENDING, False):
+        assign_sequence(connection)
+
+
+@event.listens_for(Engine, 'rollback')
+def _forget_pending(connection):
+    connection.info.pop(PENDING, None)
+
+
+def head():
+    """Joriy token - commit qilingan eng katta seq"""
+    return db.session.query(SyncSequence.value).filter(SyncSequence.id == 1).scalar() or 0
+
+
+def changes_since(since, tables, limit=DEFAULT_PAGE_SIZE):
+    """
+    `since` tokendan keyingi o'zgarishlar sahifasi.
+
+    Qaytaradi: {'token', 'has_more', 'changes': {jadval: [qator]}, 'deleted': {jadval: [id]}}
+    Keyingi sahifa uchun mijoz qaytgan `token` ni `since` qilib yuboradi.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    current = head()
+    if since < 0 or since > current:
+        raise ResyncRequired(f"Token {since} noma'lum (joriy: {current})")
+
+    # Har bir qator bir marta - eng oxirgi o'zgarishi bo'yicha tartiblanadi
+    latest = select(SyncChange.table_name, SyncChange.row_id, db.func.max(SyncChange.seq).label('last'))\
+        .where(SyncChange.seq > since, SyncChange.seq <= current, SyncChange.table_name.in_(list(tables)))\
+        .group_by(SyncChange.table_name, SyncChange.row_id).subquery()
+    page = db.session.execute(select(latest).order_by(latest.c.last).limit(limit + 1)).all()
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    ids = {}
+    for table_name, row_id, _ in page:
+        ids.setdefault(table_name, []).append(row_id)
+
+    changes, deleted = {}, {}
+    for table_name in tables:
+        model, serialize = TABLES[table_name]
+        wanted = ids.get(table_name, [])
+        found = []
+        for start in range(0, len(wanted), LOOKUP_BATCH):
+            found.extend(model.query.filter(model.id.in_(wanted[start:start + LOOKUP_BATCH])).all())
+        changes[table_name] = [serialize(row) for row in found]
+        present = {row.id for row in found}
+        deleted[table_name] = [row_id for row_id in wanted if row_id not in present]
+
+    return {
+        'token': str(page[-1].last if has_more else max(since, current)),
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def compact():
+    """Eskirgan yozuvlarni o'chirish - har bir qatorning faqat oxirgi yozuvi qoladi (tokenlar yaroqli qoladi)"""
+    result = db.session.execute(text(
+        'DELETE FROM sync_change WHERE seq IS NOT NULL AND seq NOT IN '
+        '(SELECT MAX(seq) FROM sync_change GROUP BY table_name, row_id)'
+    ))
+    db.session.commit()
+    logger.info(f"sync_change siqildi: {result.rowcount} yozuv o'chirildi")
+    return result.rowcount
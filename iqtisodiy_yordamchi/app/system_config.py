@@ -0,0 +1,51 @@
+"""
+SystemConfig (kalit-qiymat sozlamalar) keshi
+
+Jadval kichik, shuning uchun birinchi murojaatda hamma qatorlar bitta
+so'rov bilan yuklanadi va CACHE_TTL sekund jarayon ichida saqlanadi.
+Sozlamalar o'zgartirilganda `invalidate()` chaqiriladi; boshqa
+workerlarda yangi qiymat TTL o'tgach ko'rinadi.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from flask import has_app_context
+
+from app.models import SystemConfig
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL = int(os.getenv('SYSTEM_CONFIG_CACHE_TTL', '60'))
+
+_values = None
+_expires_at = 0.0
+_lock = threading.Lock()
+
+
+def _load():
+    return {key: value for key, value in SystemConfig.query.with_entities(SystemConfig.key, SystemConfig.value)}
+
+
+def get(key, default=None):
+    """Sozlama qiymati (bo'sh bo'lsa yoki app context yo'q bo'lsa - default)"""
+    global _values, _expires_at
+    if _values is None or _expires_at <= time.monotonic():
+        if not has_app_context():
+            return default
+        try:
+            values = _load()
+        except Exception as e:
+            logger.warning(f"SystemConfig o'qib bo'lmadi: {e}")
+            return default
+        with _lock:
+            _values, _expires_at = values, time.monotonic() + CACHE_TTL
+    return _values.get(key) or default
+
+
+def invalidate():
+    global _values
+    with _lock:
+        _values = None
@@ -3,13 +3,28 @@
 """
 Soliq Kabenitiga Hisobotlarni Yuborish Moduli
 Uzbekiston Davlat Soliq Komitetasining API-si bilan integratsiya
+
+Barcha so'rovlar jarayon bo'yicha umumiy `requests.Session` orqali ketadi:
+ulanishlar pulda qayta ishlatiladi (keep-alive), 5xx javoblar, ulanish
+xatolari va timeoutlar eksponensial kutish bilan qayta yuboriladi. POST
+so'rovlar `Idempotency-Key` sarlavhasi bilan yuboriladi - qayta urinishlarda
+kalit o'zgarmaydi, server takroriy hisobotni aniqlay oladi. Celery
+vazifalari kalitni `idempotency_key(davr, hisobot turi, tahrir)` bilan oladi -
+shu davr uchun takroriy ishga tushirish (ikki marta bosish, beat + qo'lda)
+bir xil kalit oladi; ataylab tuzatilgan hisobot `revision` ni oshirib yuboriladi.
+
+Stub server bilan tekshirish: python check_tax_client.py
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from datetime import datetime
 from typing import Dict, List, Optional
 import os
+import threading
+import uuid
 from dotenv import load_dotenv
 import logging
 
@@ -18,29 +33,97 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# (ulanish, javob o'qish) timeout - sekund
+CONNECT_TIMEOUT = float(os.getenv('TAX_API_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.getenv('TAX_API_READ_TIMEOUT', '30'))
+MAX_RETRIES = int(os.getenv('TAX_API_MAX_RETRIES', '3'))
+# Urinishlar orasidagi kutish: BACKOFF_FACTOR * 2^(urinish - 1) sekund
+BACKOFF_FACTOR = float(os.getenv('TAX_API_BACKOFF_FACTOR', '0.5'))
+RETRY_STATUSES = (500, 502, 503, 504)
+POOL_SIZE = int(os.getenv('TAX_API_POOL_SIZE', '10'))
+
+# Barqaror Idempotency-Key lar uchun nom fazosi (uuid5)
+IDEMPOTENCY_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'cabinet.soliq.uz/idempotency')
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE):
+    """Keep-alive pul va qayta urinishli sessiya"""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False,
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Jarayon uchun umumiy sessiya (birinchi so'rovda yaratiladi - gunicorn fork dan keyin)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def idempotency_key(period, report_type, revision=0):
+    """
+    (davr, hisobot turi) uchun doimiy kalit - takroriy yuborishda o'zgarmaydi.
+    revision > 0 - ataylab tuzatilgan qayta yuborish, har tahrir o'z kalitini oladi.
+    """
+    name = f'{period}:{report_type}' if not revision else f'{period}:{report_type}:r{revision}'
+    return uuid.uuid5(IDEMPOTENCY_NAMESPACE, name).hex
+
+
+def is_retryable(result):
+    """send_* natijasi qayta urinishga arziydimi (ulanish xatosi, timeout yoki 5xx)"""
+    if result.get('success'):
+        return False
+    status = result.get('status_code')
+    return status is None or status in RETRY_STATUSES or status == 429
+
+
 class TaxCabinetAPI:
     """Soliq kabenitining API-si bilan ishlovchi klass"""
     
-    def __init__(self):
+    def __init__(self, session=None, timeout=None):
         self.base_url = os.getenv('TAX_CABINET_URL', 'https://cabinet.soliq.uz/api')
         self.api_key = os.getenv('TAX_API_KEY', '')
         self.headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.api_key}'
         }
+        self.session = session
+        self.timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    
+    def _request(self, method, path, idempotency_key=None, **kwargs):
+        """Umumiy sessiya orqali so'rov (qayta urinishlar sessiya adapterida)"""
+        headers = dict(self.headers)
+        if method == 'POST':
+            headers['Idempotency-Key'] = idempotency_key or uuid.uuid4().hex
+        session = self.session or get_session()
+        return session.request(method, f'{self.base_url}{path}', headers=headers, timeout=self.timeout, **kwargs)
     
     def _get_db_config(self, key):
-        """Database'dan sozlamani olish (SystemConfig)"""
+        """Sozlamani olish (SystemConfig, keshdan)"""
         try:
-            from flask import has_app_context
-            if has_app_context():
-                from app.main import SystemConfig
-                config = SystemConfig.query.filter_by(key=key).first()
-                if config and config.value:
-                    return config.value
+            from app import system_config
+            return system_config.get(key)
         except Exception:
-            pass
-        return None
+            return None
 
     @property
     def company_tin(self):
@@ -50,7 +133,7 @@ class TaxCabinetAPI:
     def company_name(self):
         return self._get_db_config('company_name') or os.getenv('COMPANY_NAME', '')
     
-    def send_sales_report(self, sales_data: List[Dict]) -> Dict:
+    def send_sales_report(self, sales_data: List[Dict], idempotency_key: Optional[str] = None) -> Dict:
         """
         Savdo hisobotini soliq kabenitiga yuborish
         
@@ -75,12 +158,7 @@ class TaxCabinetAPI:
                 'total_vat': sum(s.get('vat_amount', 0) for s in sales_data)
             }
             
-            response = requests.post(
-                f'{self.base_url}/sales-report',
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request('POST', '/sales-report', idempotency_key=idempotency_key, json=payload)
             
             logger.info(f"Savdo hisoboti yuborildi: {response.status_code}")
             return {
@@ -92,7 +170,7 @@ class TaxCabinetAPI:
             logger.error(f"Savdo hisoboti yuborishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def send_tax_declaration(self, declaration_data: Dict) -> Dict:
+    def send_tax_declaration(self, declaration_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
         """
         Soliq deklaratsiyasini yuborish
         
@@ -114,12 +192,7 @@ class TaxCabinetAPI:
                 **declaration_data
             }
             
-            response = requests.post(
-                f'{self.base_url}/tax-declaration',
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request('POST', '/tax-declaration', idempotency_key=idempotency_key, json=payload)
             
             logger.info(f"Soliq deklaratsiyasi yuborildi: {response.status_code}")
             return {
@@ -131,7 +204,7 @@ class TaxCabinetAPI:
             logger.error(f"Soliq deklaratsiyasi yuborishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def send_vat_report(self, vat_data: Dict) -> Dict:
+    def send_vat_report(self, vat_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
         """
         KDV (QQS) hisobotini yuborish
         
@@ -153,12 +226,7 @@ class TaxCabinetAPI:
                 **vat_data
             }
             
-            response = requests.post(
-                f'{self.base_url}/vat-report',
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request('POST', '/vat-report', idempotency_key=idempotency_key, json=payload)
             
             logger.info(f"KDV hisoboti yuborildi: {response.status_code}")
             return {
@@ -170,7 +238,7 @@ class TaxCabinetAPI:
             logger.error(f"KDV hisoboti yuborishda xato: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def send_employee_payroll(self, payroll_data: Dict) -> Dict:
+    def send_employee_payroll(self, payroll_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
         """
         Xodim oylik hisobotini yuborish (PIT va hadya soliqlar)
         """
@@ -183,12 +251,7 @@ class TaxCabinetAPI:
                 **payroll_data
             }
             
-            response = requests.post(
-                f'{self.base_url}/payroll-report',
-                json=payload,
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request('POST', '/payroll-report', idempotency_key=idempotency_key, json=payload)
             
             logger.info(f"Oylik hisoboti yuborildi: {response.status_code}")
             return {
@@ -203,11 +266,7 @@ class TaxCabinetAPI:
     def get_tax_status(self) -> Dict:
         """Soliq holati haqida ma'lumot olish"""
         try:
-            response = requests.get(
-                f'{self.base_url}/status/{self.company_tin}',
-                headers=self.headers,
-                timeout=30
-            )
+            response = self._request('GET', f'/status/{self.company_tin}')
             
             return {
                 'success': response.status_code == 200,
@@ -222,7 +281,7 @@ class TaxCabinetAPI:
 class TaxCabinetAPIDev(TaxCabinetAPI):
     """Test uchun demo version - haqiqiy API o'rniga local simulation"""
     
-    def send_sales_report(self, sales_data: List[Dict]) -> Dict:
+    def send_sales_report(self, sales_data: List[Dict], idempotency_key: Optional[str] = None) -> Dict:
         logger.info(f"[DEV] Savdo hisoboti: {len(sales_data)} ta element")
         return {
             'success': True,
@@ -234,7 +293,7 @@ class TaxCabinetAPIDev(TaxCabinetAPI):
             }
         }
     
-    def send_tax_declaration(self, declaration_data: Dict) -> Dict:
+    def send_tax_declaration(self, declaration_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
         logger.info(f"[DEV] Soliq deklaratsiyasi: {declaration_data.get('period')}")
         return {
             'success': True,
@@ -246,7 +305,7 @@ class TaxCabinetAPIDev(TaxCabinetAPI):
             }
         }
     
-    def send_vat_report(self, vat_data: Dict) -> Dict:
+    def send_vat_report(self, vat_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
         logger.info(f"[DEV] KDV hisoboti: {vat_data.get('period')}")
         return {
             'success': True,
@@ -258,6 +317,18 @@ class TaxCabinetAPIDev(TaxCabinetAPI):
             }
         }
     
+    def send_employee_payroll(self, payroll_data: Dict, idempotency_key: Optional[str] = None) -> Dict:
+        logger.info(f"[DEV] Oylik hisoboti: {payroll_data.get('period')}")
+        return {
+            'success': True,
+            'status_code': 200,
+            'data': {
+                'payroll_report_id': f'PRL_{datetime.now().timestamp()}',
+                'status': 'accepted',
+                'message': 'Oylik hisoboti qabul qilindi'
+            }
+        }
+    
     def get_tax_status(self) -> Dict:
         logger.info(f"[DEV] Soliq holati: {self.company_tin}")
         return {
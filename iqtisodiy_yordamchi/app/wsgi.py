@@ -0,0 +1,9 @@
+"""
+Production WSGI kirish nuqtasi
+
+    gunicorn -c gunicorn.conf.py app.wsgi:app
+"""
+
+from app.factory import create_app
+
+app = create_app()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel Eksport Benchmarki - oddiy (in-memory) va write-only rejimlarni solishtirish
+
+Har bir rejim alohida jarayonda ishga tushiriladi, shuning uchun eng yuqori
+RSS (ru_maxrss) bir-biriga aralashmaydi.
+
+Ishga tushirish: python benchmark_excel.py [qatorlar_soni]
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+DEFAULT_ROWS = 100000
+MODES = ['inmemory', 'write_only']
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def sales_rows(count):
+    """DB kursoriga o'xshash qatorlar generatori"""
+    for i in range(count):
+        yield {
+            'date': f'2026-01-{i % 28 + 1:02d}',
+            'order_id': f'ORD-{i:07d}',
+            'customer': f'Mijoz {i % 500}',
+            'product': f'Mahsulot {i % 2000}',
+            'quantity': i % 50 + 1,
+            'unit_price': 100000,
+            'discount': i % 10
+        }
+
+
+def run_mode(mode, count):
+    """Bitta rejimni joriy jarayonda bajarib, natijani JSON qilib chiqarish"""
+    from excel_generator import ExcelTableGenerator
+
+    output = os.path.join(tempfile.gettempdir(), f'benchmark_{mode}.xlsx')
+    started = time.perf_counter()
+    if mode == 'write_only':
+        result = ExcelTableGenerator().create_sales_table(sales_rows(count), output, write_only=True)
+    else:
+        # joriy yo'l: butun natija ro'yxatga yuklanadi (query.all())
+        result = ExcelTableGenerator().create_sales_table(list(sales_rows(count)), output)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'mode': mode,
+        'success': result['success'],
+        'rows': result.get('rows'),
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'file_mb': round(os.path.getsize(output) / 1024 / 1024, 1)
+    }))
+    os.remove(output)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+
+    print_header(f"📊 EXCEL EKSPORT BENCHMARKI ({count:,} qator)")
+
+    results = []
+    for mode in MODES:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--mode', mode, str(count)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"  ❌ {mode}: {proc.stderr.strip().splitlines()[-1]}")
+            return 1
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"  {'✅' if result['success'] else '❌'} {mode:<11} "
+              f"vaqt: {result['seconds']:>7.2f}s  peak RSS: {result['peak_rss_mb']:>8.1f} MB  "
+              f"fayl: {result['file_mb']} MB")
+
+    base, streamed = results
+    if streamed['peak_rss_mb']:
+        print(f"\n  📉 RSS: {base['peak_rss_mb'] / streamed['peak_rss_mb']:.1f}x kam, "
+              f"vaqt: {base['seconds'] / max(streamed['seconds'], 0.01):.1f}x tez")
+    return 0 if all(r['success'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--mode':
+        run_mode(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_ROWS)
+    else:
+        sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Avtomatik Formalar Benchmarki - generate_all_forms bir oy uchun
+
+Bir oyga 1M buyurtma qatori yoziladi (Core executemany), DailySalesRollup
+jurnaldan qayta quriladi, so'ng generate_all_forms keshsiz (birinchi
+chaqiruv) va keshdan o'lchanadi. Formalar buyurtma qatorlarini emas,
+oldindan yig'ilgan jadvallarni o'qiydi - keshsiz vaqt FORMS_BUDGET_MS dan
+oshmasligi kerak. Og'ir main.py import qilinmaydi.
+
+Ishga tushirish:
+    python benchmark_forms.py [qatorlar_soni]
+    DATABASE_URL=postgresql://... python benchmark_forms.py 1000000
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from flask import Flask
+
+FORMS_BUDGET_MS = float(os.getenv('FORMS_BUDGET_MS', '1000'))
+DEFAULT_LINES = 1000000
+ITEMS_PER_ORDER = 4
+CUSTOMERS = 500
+PRODUCTS = 2000
+PERIOD = '2026-01'
+WRITE_BATCH = 20000
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def seed(db, models, lines):
+    from sqlalchemy import insert
+
+    db.session.execute(insert(models.Customer), [{'name': f'Mijoz {i}'} for i in range(CUSTOMERS)])
+    db.session.execute(insert(models.Product), [
+        {'code': f'F{i:05d}', 'name': f'Mahsulot {i}', 'category': f'Toifa {i % 12}',
+         'purchase_price': 800, 'sale_price': 1000, 'quantity': i % 40, 'minimum_quantity': 10}
+        for i in range(PRODUCTS)
+    ])
+    customers = [cid for (cid,) in db.session.query(models.Customer.id)]
+    products = [pid for (pid,) in db.session.query(models.Product.id)]
+
+    orders = lines // ITEMS_PER_ORDER
+    for start in range(0, orders, WRITE_BATCH):
+        batch = range(start, min(start + WRITE_BATCH, orders))
+        db.session.execute(insert(models.SalesOrder), [{
+            'number': f'FORM-{i:08d}',
+            'customer_id': customers[(i * 7) % len(customers)],
+            'order_date': datetime(2026, 1, i % 31 + 1, 10),
+            'total_amount': 1000 * ITEMS_PER_ORDER * 2.5,
+            'discount': 0,
+            'tax_amount': 1200,
+        } for i in batch])
+        first = db.session.query(models.SalesOrder.id).filter_by(number=f'FORM-{start:08d}').scalar()
+        db.session.execute(insert(models.SalesOrderItem), [{
+            'sales_order_id': first + (i - start),
+            'product_id': products[(i * 13 + j * 101) % len(products)],
+            'quantity': j + 1,
+            'unit_price': 1000,
+            'discount': 0,
+        } for i in batch for j in range(ITEMS_PER_ORDER)])
+    db.session.execute(insert(models.Invoice), [
+        {'number': f'INV-{i:06d}', 'customer_id': customers[i % len(customers)],
+         'invoice_date': datetime(2026, 1, i % 31 + 1), 'total_amount': 50000}
+        for i in range(5000)
+    ])
+    db.session.execute(insert(models.Expense), [
+        {'number': f'EXP-{i:05d}', 'category': ('Salary', 'Utilities', 'Rent')[i % 3], 'amount': 10000,
+         'expense_date': datetime(2026, 1, i % 31 + 1)}
+        for i in range(3000)
+    ])
+    db.session.execute(insert(models.CashRegister), [{'name': 'Asosiy kassa', 'code': 'FORM-1', 'balance': 0}])
+    register_id = db.session.query(models.CashRegister.id).scalar()
+    db.session.execute(insert(models.CashTransaction), [
+        {'cash_register_id': register_id, 'transaction_type': 'Kirim' if i % 3 else 'Chiqim', 'amount': 1000,
+         'transaction_date': datetime(2026, 1, i % 31 + 1)}
+        for i in range(20000)
+    ])
+    db.session.commit()
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES
+    db_file = os.path.join(tempfile.mkdtemp(), 'forms_benchmark.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f'sqlite:///{db_file}')
+
+    from app.extensions import db
+    from app import models, period_summary, rollup
+    from app.auto_form_filler import AutomaticFormFiller
+
+    db.init_app(app)
+
+    print_header(f"📝 FORMALAR BENCHMARKI ({lines:,} qator, {PERIOD})")
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(db, models, lines)
+        rollup_rows = rollup.rebuild()
+        print(f"  📦 Tayyorlash: {time.perf_counter() - started:.1f}s, rollup {rollup_rows:,} qator")
+
+        filler = AutomaticFormFiller(db)
+        period_summary.invalidate()
+        started = time.perf_counter()
+        result = filler.generate_all_forms(PERIOD, db.session)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        filler.generate_all_forms(PERIOD, db.session)
+        warm_ms = (time.perf_counter() - started) * 1000
+
+        expected_lines = lines // ITEMS_PER_ORDER * ITEMS_PER_ORDER
+        sold = db.session.query(db.func.sum(models.SalesOrderItem.quantity)).scalar() or 0
+
+    forms = result.get('forms', {})
+    sales = forms.get('sales_report', {}).get('form_data', {})
+    cash = forms.get('cash_flow_report', {}).get('form_data', {})
+    print(f"  🧾 Formalar: {result.get('total_forms')} ta, buyurtmalar {sales.get('total_orders', 0):,}, "
+          f"kunlar {len(sales.get('daily_sales', []))}, top mahsulotlar {len(sales.get('top_products', []))}")
+    print(f"  💵 Kassa: kirim {cash.get('total_inflows', 0):,.0f}, chiqim {cash.get('total_outflows', 0):,.0f}")
+    print(f"  ⏱️  Keshsiz: {cold_ms:.0f}ms (budjet {FORMS_BUDGET_MS:.0f}ms), keshdan: {warm_ms:.0f}ms")
+
+    checks = [
+        ("Barcha formalar muvaffaqiyatli", result.get('success') and result.get('total_forms') == 8),
+        ("Savdo miqdori qatorlar bilan mos", sales.get('total_quantity') == float(sold) and expected_lines > 0),
+        ("Kunlik savdo 31 kun", len(sales.get('daily_sales', [])) == 31),
+        ("Keshsiz vaqt budjet ichida", cold_ms <= FORMS_BUDGET_MS),
+    ]
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+
+    ok = all(ok for _, ok in checks)
+    print(f"\n  {'✅' if ok else '❌'} Natija")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ingest Benchmarki - sales_orders payload ni jadvallarga yozish tezligi
+
+Maqsad: bitta worker da daqiqasiga 100k buyurtma qatori. Og'ir main.py
+import qilinmaydi - faqat modellar va materializer.
+
+Ishga tushirish:
+    python benchmark_ingest.py [qatorlar_soni]
+    DATABASE_URL=postgresql://... python benchmark_ingest.py 100000
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+from flask import Flask
+
+TARGET_LINES_PER_MINUTE = 100000
+DEFAULT_LINES = 100000
+ITEMS_PER_ORDER = 4
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def build_payload(lines, customers, products):
+    orders = []
+    for i in range(lines // ITEMS_PER_ORDER):
+        orders.append({
+            'number': f'BENCH-{i:08d}',
+            'customer_id': customers[i % len(customers)],
+            'order_date': f'2026-01-{i % 28 + 1:02d}',
+            'items': [{'product_id': products[(i + j) % len(products)], 'quantity': j + 1, 'unit_price': 1000}
+                      for j in range(ITEMS_PER_ORDER)]
+        })
+    return {'sales_orders': orders}
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES
+    db_file = os.path.join(tempfile.mkdtemp(), 'ingest_benchmark.db')
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f'sqlite:///{db_file}')
+
+    from app.extensions import db
+    from app import models
+    from app.ingest import materialize_sales_orders
+
+    db.init_app(app)
+
+    print_header(f"📥 INGEST BENCHMARKI ({lines:,} qator)")
+
+    with app.app_context():
+        db.create_all()
+        customers = [models.Customer(name=f'Mijoz {i}') for i in range(200)]
+        products = [models.Product(code=f'B{i:05d}', name=f'Mahsulot {i}', purchase_price=800, sale_price=1000)
+                    for i in range(1000)]
+        db.session.add_all(customers + products)
+        db.session.commit()
+        payload = build_payload(lines, [c.id for c in customers], [p.id for p in products])
+
+        chunks = []
+        started = time.perf_counter()
+        result = materialize_sales_orders(payload, progress=chunks.append)
+        elapsed = time.perf_counter() - started
+
+        # Qayta ingest: hammasi takrorlangan raqam sifatida o'tkazib yuborilishi kerak
+        again = materialize_sales_orders(payload)
+
+    rate = result['lines'] / elapsed * 60 if elapsed else 0
+    print(f"  📦 {result['orders']:,} buyurtma, {result['lines']:,} qator, {result['chunks']} bo'lak")
+    print(f"  ⏱️  {elapsed:.2f}s -> {rate:,.0f} qator/daqiqa (maqsad {TARGET_LINES_PER_MINUTE:,})")
+    print(f"  🔁 Qayta ingest: {again['orders']} yangi, {again['skipped']:,} o'tkazib yuborildi")
+
+    ok = rate >= TARGET_LINES_PER_MINUTE and again['orders'] == 0 and len(chunks) == result['chunks']
+    print(f"\n  {'✅' if ok else '❌'} Natija")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
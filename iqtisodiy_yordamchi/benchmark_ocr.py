@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR Benchmarki - sahifa boshiga kechikish (oldin / keyin)
+
+Korpus: A4 hisob-faktura sahifalari 150, 300 va 600 DPI da (Pillow bilan
+chiziladi, matni ma'lum), yoki --corpus papkasidagi haqiqiy skanlar.
+Har bir sahifa ikki usulda OCR qilinadi:
+  oldin - image_to_string + image_to_data, asl o'lchamdagi rasm (eski yo'l),
+  keyin - OCRProcessor.extract_text_from_image: bitta image_to_data,
+          katta skanlar kichraytirilib oq-qora qilingan.
+Sifat: kutilgan so'zlarning qanchasi OCR matnida topildi (generatsiya
+qilingan korpusda).
+
+Ishga tushirish:
+    python benchmark_ocr.py [sahifalar_soni]
+    python benchmark_ocr.py --corpus /skanlar/papkasi
+    OCR_LANG=eng python benchmark_ocr.py
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+DEFAULT_PAGES = 3
+DPIS = (150, 300, 600)
+A4_INCHES = (8.27, 11.69)
+OCR_LANG = os.getenv('OCR_LANG', 'eng')
+# Keyingi yo'l so'zlarni shundan ko'p yo'qotmasligi kerak
+MAX_RECALL_LOSS = 0.05
+FONT_PATHS = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+)
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def invoice_lines(rnd, number):
+    """Hisob-faktura matni (qatorlar)"""
+    lines = [
+        f"HISOB-FAKTURA No: HF-{number:06d}",
+        f"Sana: {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2026",
+        f"Mijoz: Savdo Markazi {rnd.randint(1, 999)} MChJ",
+        "",
+        "Mahsulot                 Miqdor     Narx        Summa",
+    ]
+    total = 0
+    for i in range(rnd.randint(12, 20)):
+        quantity = rnd.randint(1, 50)
+        price = rnd.randint(10, 900) * 100
+        total += quantity * price
+        lines.append(f"Mahsulot {rnd.randint(100, 999)}-{i + 1}     {quantity:>6}   {price:>8}   {quantity * price:>10}")
+    lines += ["", f"Jami summa: {total} so'm", f"QQS 12%: {total * 12 // 100} so'm", "Imzo: ____________"]
+    return lines
+
+
+def load_font(size):
+    from PIL import ImageFont
+
+    for path in FONT_PATHS:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default()
+
+
+def build_corpus(folder, pages):
+    """[(guruh, fayl, kutilgan so'zlar)] - har DPI uchun `pages` ta sahifa"""
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(25)
+    corpus = []
+    for dpi in DPIS:
+        width, height = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+        # 11pt shrift, 1.5 interval
+        font_size = round(11 / 72 * dpi)
+        font = load_font(font_size)
+        for n in range(pages):
+            lines = invoice_lines(rnd, dpi * 100 + n)
+            image = Image.new('RGB', (width, height), 'white')
+            draw = ImageDraw.Draw(image)
+            y = dpi
+            for line in lines:
+                draw.text((dpi, y), line, fill='black', font=font)
+                y += int(font_size * 1.5)
+            path = os.path.join(folder, f'invoice_{dpi}dpi_{n}.png')
+            image.save(path)
+            corpus.append((f'{dpi} DPI ({width}x{height})', path, ' '.join(lines).split()))
+    return corpus
+
+
+def scan_corpus(folder):
+    """Haqiqiy skanlar papkasi - kutilgan matn noma'lum"""
+    extensions = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp')
+    return [('skanlar', os.path.join(folder, name), None)
+            for name in sorted(os.listdir(folder)) if name.lower().endswith(extensions)]
+
+
+def ocr_before(path):
+    """Eski yo'l: ikki marta Tesseract, asl o'lchamdagi rasm"""
+    import pytesseract
+    from PIL import Image
+
+    image = Image.open(path)
+    text = pytesseract.image_to_string(image, lang=OCR_LANG)
+    pytesseract.image_to_data(image, lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+    return text
+
+
+def recall(expected, text):
+    """Kutilgan so'zlarning OCR matnidagi ulushi"""
+    found = text.split()
+    pool = {}
+    for word in found:
+        pool[word] = pool.get(word, 0) + 1
+    hits = 0
+    for word in expected:
+        if pool.get(word):
+            pool[word] -= 1
+            hits += 1
+    return hits / len(expected) if expected else 1.0
+
+
+def main():
+    args = sys.argv[1:]
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        from app.ocr_processor import OCRProcessor
+    except Exception as e:
+        print(f"❌ Tesseract/pytesseract/Pillow mavjud emas: {e}")
+        return 1
+
+    folder = tempfile.mkdtemp()
+    if args[:1] == ['--corpus'] and len(args) > 1:
+        corpus = scan_corpus(args[1])
+    else:
+        corpus = build_corpus(folder, int(args[0]) if args else DEFAULT_PAGES)
+    if not corpus:
+        print("❌ Korpus bo'sh")
+        return 1
+
+    processor = OCRProcessor()
+    print_header(f"🔎 OCR BENCHMARKI: {len(corpus)} sahifa, til {OCR_LANG}")
+
+    groups = {}
+    for group, path, expected in corpus:
+        started = time.perf_counter()
+        text_before = ocr_before(path)
+        before_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        result = processor.extract_text_from_image(path, lang=OCR_LANG)
+        after_ms = (time.perf_counter() - started) * 1000
+        if not result.get('success'):
+            print(f"  ❌ {os.path.basename(path)}: {result.get('error')}")
+            return 1
+
+        stats = groups.setdefault(group, {'before': [], 'after': [], 'recall_before': [], 'recall_after': []})
+        stats['before'].append(before_ms)
+        stats['after'].append(after_ms)
+        if expected:
+            stats['recall_before'].append(recall(expected, text_before))
+            stats['recall_after'].append(recall(expected, result['text']))
+
+    print(f"  {'Guruh':<26}{'Oldin ms':>10}{'Keyin ms':>10}{'Tezlanish':>11}{'Sifat oldin/keyin':>20}")
+    total_before = total_after = 0.0
+    quality_ok = True
+    for group, stats in groups.items():
+        before = statistics.mean(stats['before'])
+        after = statistics.mean(stats['after'])
+        total_before += sum(stats['before'])
+        total_after += sum(stats['after'])
+        quality = ''
+        if stats['recall_before']:
+            recall_before = statistics.mean(stats['recall_before'])
+            recall_after = statistics.mean(stats['recall_after'])
+            quality = f"{recall_before:.0%} / {recall_after:.0%}"
+            quality_ok = quality_ok and recall_after >= recall_before - MAX_RECALL_LOSS
+        print(f"  {group:<26}{before:>10.0f}{after:>10.0f}{before / after:>10.1f}x{quality:>20}")
+
+    speedup = total_before / total_after if total_after else 0
+    print(f"\n  Jami: oldin {total_before / 1000:.1f}s, keyin {total_after / 1000:.1f}s (x{speedup:.1f})")
+
+    checks = [
+        ("Keyingi yo'l tezroq (jami)", speedup > 1),
+        (f"Sifat yo'qotilishi <= {MAX_RECALL_LOSS:.0%}", quality_ok),
+    ]
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+
+    ok = all(ok for _, ok in checks)
+    print(f"\n  {'✅' if ok else '❌'} Natija")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
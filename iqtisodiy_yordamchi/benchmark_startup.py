@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ishga Tushish Benchmarki - `python -X importtime` bilan sovuq start vaqti
+
+Har bir kirish nuqtasi alohida (yangi) jarayonda bir necha marta import
+qilinadi, eng yaxshi natija byudjet bilan solishtiriladi. Og'ir
+kutubxonalar (openai, openpyxl, reportlab, jsonschema, statsmodels, numpy)
+ishga tushishda umuman import qilinmasligi ham tekshiriladi - ular
+faqat ishlatadigan endpoint/task ichida yuklanadi.
+
+Ishga tushirish:
+    python benchmark_startup.py
+    STARTUP_BUDGET_MS=800 python benchmark_startup.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+STARTUP_BUDGET_MS = int(os.getenv('STARTUP_BUDGET_MS', '1000'))
+RUNS = 3
+LAZY_MODULES = ('openai', 'openpyxl', 'reportlab', 'jsonschema', 'statsmodels', 'numpy')
+
+# (nomi, kod) - veb ilova (gunicorn app.wsgi:app) va Celery worker (route modullarsiz)
+TARGETS = [
+    ('Veb ilova (app.wsgi)', 'import app.wsgi'),
+    ('Celery worker (app.celery_app + tasks)',
+     'import app.celery_app, app.celery_tasks; app.celery_app.flask_app()'),
+]
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def measure(code):
+    """
+    Bitta sovuq import. Qaytaradi: (jami import vaqti ms, devor vaqti ms,
+    {paket: ms} - paket modullarining o'z vaqtlari yig'indisi, yuklangan modullar)
+    """
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=os.path.dirname(os.path.abspath(__file__)),
+                          capture_output=True, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if line.strip() and not line.startswith('import time:')]
+        raise RuntimeError(errors[-1] if errors else 'import xatosi')
+
+    total_us, packages, modules = 0, {}, set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        total_us += int(self_us)
+        modules.add(name)
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return total_us / 1000, wall, packages, modules
+
+
+def main():
+    print_header(f"🚀 ISHGA TUSHISH BENCHMARKI (byudjet {STARTUP_BUDGET_MS} ms, {RUNS} ta sovuq start)")
+    failures = 0
+
+    for label, code in TARGETS:
+        try:
+            runs = [measure(code) for _ in range(RUNS)]
+        except RuntimeError as e:
+            print(f"\n  ❌ {label}: {e}")
+            failures += 1
+            continue
+
+        import_ms, wall_ms, packages, modules = min(runs, key=lambda r: r[0])
+        heavy = sorted(m for m in LAZY_MODULES if m in modules)
+        ok = import_ms <= STARTUP_BUDGET_MS and not heavy
+
+        print(f"\n  {'✅' if ok else '❌'} {label}")
+        print(f"     Import: {import_ms:,.0f} ms   Jarayon (interpretator bilan): {wall_ms:,.0f} ms")
+        for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:8]:
+            print(f"       {ms:8.1f} ms  {name}")
+        if heavy:
+            print(f"     ⚠️  Ishga tushishda yuklangan og'ir modullar: {', '.join(heavy)}")
+        if not ok:
+            failures += 1
+
+    print(f"\n  {'✅ Byudjet ichida' if not failures else f'❌ {failures} ta kirish nuqtasi byudjetdan tashqarida'}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Kassa Balansi Parallel Yuklama Tekshiruvi
+
+50 ta parallel yozuvchi (kassir) bitta kassaga bir vaqtda kirim/chiqim
+o'tkazadi - yarmi bittalab, yarmi paket bilan. Oxirida kassa balansi
+boshlang'ich qoldiq + barcha operatsiyalar yig'indisiga aniq teng bo'lishi
+kerak (yo'qolgan yangilanish yo'q). Og'ir main.py import qilinmaydi.
+
+Ishga tushirish:
+    python check_cash_concurrency.py
+    DATABASE_URL=postgresql://... python check_cash_concurrency.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask
+
+WRITERS = 50
+OPERATIONS_PER_WRITER = 20
+BATCH_SIZE = 5
+OPENING_BALANCE = 1000000
+# SQLite bitta yozuvchiga ruxsat beradi - band bo'lsa qayta urinish
+RETRIES = 20
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def operations(seed, register_id):
+    rnd = random.Random(seed)
+    return [{'cash_register_id': register_id,
+             'transaction_type': rnd.choice(['Kirim', 'Chiqim']),
+             'amount': rnd.randint(1, 500),
+             'reference': f'W{seed}-{i}'}
+            for i in range(OPERATIONS_PER_WRITER)]
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), 'cash_concurrency.db')
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f'sqlite:///{db_file}')
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': WRITERS, 'max_overflow': 0}
+
+    from app.extensions import db
+    from app import cash, models
+
+    db.init_app(app)
+
+    print_header(f"💵 KASSA BALANSI: {WRITERS} PARALLEL YOZUVCHI")
+
+    with app.app_context():
+        db.create_all()
+        register = models.CashRegister(name='Asosiy kassa', code=f'LOAD-{int(time.time())}', balance=OPENING_BALANCE)
+        db.session.add(register)
+        db.session.commit()
+        register_id = register.id
+
+    plans = [operations(seed, register_id) for seed in range(WRITERS)]
+    expected = OPENING_BALANCE + sum(cash.signed_amount(op['transaction_type'], op['amount'])
+                                     for plan in plans for op in plan)
+    errors = []
+    barrier = threading.Barrier(WRITERS)
+
+    def post(chunk):
+        for attempt in range(RETRIES):
+            try:
+                cash.post_transactions(chunk)
+                db.session.commit()
+                return
+            except Exception as e:
+                db.session.rollback()
+                if 'locked' not in str(e) or attempt == RETRIES - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+
+    def writer(index):
+        with app.app_context():
+            try:
+                barrier.wait()
+                plan = plans[index]
+                # Juft yozuvchilar bittalab (POST /api/cash-transactions), toqlari paket bilan (/batch)
+                size = 1 if index % 2 == 0 else BATCH_SIZE
+                for start in range(0, len(plan), size):
+                    post(plan[start:start + size])
+            except Exception as e:
+                errors.append(f"yozuvchi {index}: {e}")
+            finally:
+                db.session.remove()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        balance = db.session.query(models.CashRegister.balance).filter_by(id=register_id).scalar()
+        count = models.CashTransaction.query.filter_by(cash_register_id=register_id).count()
+
+    total_ops = WRITERS * OPERATIONS_PER_WRITER
+    print(f"  Operatsiyalar:   {count:,} / {total_ops:,}")
+    print(f"  Kutilgan balans: {expected:,.2f}")
+    print(f"  Haqiqiy balans:  {balance:,.2f}")
+    print(f"  Vaqt:            {elapsed:.2f}s")
+    for error in errors[:10]:
+        print(f"  ⚠️  {error}")
+
+    if errors or count != total_ops or abs(balance - expected) > 1e-6:
+        print("\n❌ Balans aniq emas yoki operatsiyalar yo'qolgan")
+        return 1
+    print("\n✅ Balans aniq - yo'qolgan yangilanish yo'q")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
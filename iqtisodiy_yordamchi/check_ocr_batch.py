@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR Paket (Batch) Tekshiruvi
+
+200 sahifalik paket app/ocr_batch local puliga yuboriladi (Celery ijrochisi
+ham xuddi shu sahifa vazifasini bajaradi). Tesseract o'rniga CPU ni band
+qiladigan stub processor ishlatiladi (Tesseract/Pillow shart emas). Tekshiriladi:
+  - submit() darhol job id qaytaradi,
+  - progress va qisman natijalar ish davomida ko'rinadi,
+  - natijalar sahifalar tartibida, paket papkasidan (istalgan worker) o'qiladi,
+  - N yadroda paket ketma-ket ishlashdan ~N marta tez tugaydi,
+  - egasi jarayon to'xtagan (heartbeat eskirgan) paket failed deb belgilanadi,
+  - Celery paketi: sahifalar bajarilmasa (worker yo'q) ham failed bo'ladi,
+  - paket holati faqat egasiga (user_id) qaytariladi.
+
+Ishga tushirish:
+    python check_ocr_batch.py
+    OCR_WORKERS=4 python check_ocr_batch.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+PAGES = 200
+PAGE_CPU_SECONDS = 0.02
+# Kutilgan tezlanishning kamida shu ulushi (jarayonlarni ishga tushirish xarajati uchun)
+MIN_EFFICIENCY = 0.6
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+class BusyOCR:
+    """Stub: sahifa boshiga PAGE_CPU_SECONDS CPU ishi"""
+
+    def extract_invoice_data(self, image_path, page=0):
+        deadline = time.process_time() + PAGE_CPU_SECONDS
+        n = 0
+        while time.process_time() < deadline:
+            n += 1
+        return {'success': True, 'data': {'source_image': image_path, 'invoice_number': os.path.basename(image_path)}}
+
+
+def main():
+    os.environ.setdefault('OCR_JOBS_FOLDER', tempfile.mkdtemp())
+    os.environ.setdefault('OCR_BATCH_BACKEND', 'local')
+    from app import ocr_batch
+
+    workers = ocr_batch.pool_size()
+    print_header(f"🖨️  OCR PAKET: {PAGES} sahifa, {workers} jarayon")
+
+    job_id = ocr_batch.new_job_id()
+    folder = ocr_batch.job_folder(job_id)
+    os.makedirs(folder)
+    paths = []
+    for i in range(PAGES):
+        path = os.path.join(folder, f'{i:04d}_page.png')
+        open(path, 'wb').close()
+        paths.append(path)
+
+    # Ketma-ket (bugungi yo'l) - shu jarayonda
+    started = time.perf_counter()
+    for path in paths:
+        BusyOCR().extract_invoice_data(path)
+    sequential = time.perf_counter() - started
+
+    # Pulni oldindan ishga tushirish - o'lchovga jarayon yaratish kirmasin
+    ocr_batch.run(BusyOCR, paths[:workers])
+
+    started = time.perf_counter()
+    state = ocr_batch.submit(job_id, BusyOCR, paths)
+    submit_ms = (time.perf_counter() - started) * 1000
+
+    partial_seen = False
+    while True:
+        current = ocr_batch.status(job_id)
+        if 0 < current['completed'] < PAGES and any(r is not None for r in current['results']):
+            partial_seen = True
+        if current['status'] == 'completed':
+            break
+        time.sleep(0.02)
+    parallel = time.perf_counter() - started
+
+    from_file = ocr_batch.status(job_id)
+    results = from_file['results'] if from_file else []
+    ordered = [r['file'] for r in results] == [os.path.basename(p) for p in paths]
+
+    # Egasi jarayon qayta ishga tushgan paket: heartbeat eskirgan, sahifalar kelmaydi
+    lost_id = ocr_batch.new_job_id()
+    lost_folder = ocr_batch.job_folder(lost_id)
+    os.makedirs(lost_folder)
+    ocr_batch._write_json(os.path.join(lost_folder, ocr_batch.JOB_FILE), {
+        'job_id': lost_id, 'backend': 'local', 'workers': workers, 'tasks': [[paths[0], 0], [paths[1], 0]],
+        'started_at': None,
+    })
+    heartbeat = os.path.join(lost_folder, ocr_batch.HEARTBEAT_FILE)
+    open(heartbeat, 'w').close()
+    running_before = ocr_batch.status(lost_id)['status'] == 'running'
+    stale = time.time() - ocr_batch.STALE_SECONDS - 1
+    os.utime(heartbeat, (stale, stale))
+    lost = ocr_batch.status(lost_id)
+
+    # Celery paketi: worker yo'q / navbat tozalangan - birorta sahifa tugamaydi
+    queued_id = ocr_batch.new_job_id()
+    queued_folder = ocr_batch.job_folder(queued_id)
+    os.makedirs(queued_folder)
+    ocr_batch._write_json(os.path.join(queued_folder, ocr_batch.JOB_FILE), {
+        'job_id': queued_id, 'user_id': 1, 'backend': 'celery', 'workers': None,
+        'tasks': [[paths[0], 0]], 'started_at': None,
+    })
+    queued_heartbeat = os.path.join(queued_folder, ocr_batch.HEARTBEAT_FILE)
+    open(queued_heartbeat, 'w').close()
+    queued_before = ocr_batch.status(queued_id)['status'] == 'running'
+    stale = time.time() - ocr_batch.CELERY_STALE_SECONDS - 1
+    os.utime(queued_heartbeat, (stale, stale))
+    queued = ocr_batch.status(queued_id)
+
+    speedup = sequential / parallel if parallel else 0
+    # OCR_WORKERS yadrolardan ko'p bo'lsa ham tezlanish yadrolar soni bilan cheklanadi
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    expected = min(workers, cores, PAGES)
+    print(f"  Ketma-ket:  {sequential:.2f}s")
+    print(f"  Parallel:   {parallel:.2f}s  (tezlanish x{speedup:.1f}, kutilgan ~x{expected})")
+    print(f"  submit():   {submit_ms:.0f}ms")
+
+    checks = [
+        ("submit() darhol qaytdi (job id, running)", state['status'] == 'running' and submit_ms < 1000),
+        ("Progress va qisman natijalar ko'rindi", partial_seen or workers >= PAGES),
+        ("Barcha sahifalar muvaffaqiyatli", from_file and from_file['successful'] == PAGES),
+        ("Natijalar sahifalar tartibida (paket papkasidan)", ordered),
+        (f"Tezlanish >= {MIN_EFFICIENCY:.0%} x {expected}", speedup >= MIN_EFFICIENCY * expected),
+        ("Noto'g'ri job id rad etildi", ocr_batch.status('../../etc') is None),
+        ("Egasi to'xtagan paket failed", running_before and lost['status'] == 'failed'
+         and ocr_batch.status(lost_id)['status'] == 'failed'),
+        ("Bajarilmagan Celery paketi failed", queued_before and queued['status'] == 'failed'),
+        ("Paket holati faqat egasiga", ocr_batch.status(queued_id, user_id=2) is None
+         and ocr_batch.status(queued_id, user_id=1) is not None),
+    ]
+    for name, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {name}")
+
+    ocr_batch.get_executor().shutdown()
+    ok = all(ok for _, ok in checks)
+    print(f"\n  {'✅' if ok else '❌'} Natija")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
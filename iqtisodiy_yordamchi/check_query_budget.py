@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQL So'rovlar Budjeti Tekshiruvi - N+1 so'rovlarni aniqlash
+
+Vaqtinchalik in-memory SQLite bazani to'ldirib, har bir endpoint uchun
+bajarilgan SQL statementlar sonini `app/query_options.STATEMENT_BUDGETS`
+bilan solishtiradi. Har bir endpoint 200 qaytarishi shart - xato javob
+(404, 500...) kam so'rov bilan "budjet ichida" hisoblanmaydi. Budjet oshsa
+yoki javob 200 bo'lmasa 1 kod bilan chiqadi.
+
+Ishga tushirish: python check_query_budget.py
+"""
+
+import os
+import sys
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+ORDERS = 50
+ITEMS_PER_ORDER = 3
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+def seed(db, models):
+    """Har bir buyurtmada bir nechta qator bo'lgan test ma'lumotlari"""
+    customers = [models.Customer(name=f'Mijoz {i}') for i in range(10)]
+    suppliers = [models.Supplier(name=f'Etkazuvchi {i}') for i in range(5)]
+    products = [models.Product(code=f'P{i:03d}', name=f'Mahsulot {i}', purchase_price=80, sale_price=100, quantity=500)
+                for i in range(20)]
+    db.session.add_all(customers + suppliers + products)
+    db.session.flush()
+
+    for i in range(ORDERS):
+        order = models.SalesOrder(number=f'SO-{i}', customer_id=customers[i % 10].id, total_amount=300)
+        order.items = [models.SalesOrderItem(product_id=products[(i + j) % 20].id, quantity=1, unit_price=100)
+                       for j in range(ITEMS_PER_ORDER)]
+        po = models.PurchaseOrder(number=f'PO-{i}', supplier_id=suppliers[i % 5].id, total_amount=240)
+        po.items = [models.PurchaseOrderItem(product_id=products[(i + j) % 20].id, quantity=1, unit_price=80)
+                    for j in range(ITEMS_PER_ORDER)]
+        db.session.add_all([order, po])
+        db.session.add(models.Invoice(number=f'INV-{i}', customer_id=customers[i % 10].id, total_amount=300))
+    db.session.commit()
+
+
+def main():
+    from app.extensions import db
+    from app.factory import create_app
+    from app import models
+    from app.query_options import STATEMENT_BUDGETS, StatementCounter
+
+    app = create_app()
+    print_header("🔎 SQL SO'ROVLAR BUDJETI TEKSHIRUVI")
+
+    with app.app_context():
+        db.create_all()
+        seed(db, models)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+
+    failures = []
+    for path, budget in STATEMENT_BUDGETS.items():
+        url = path.replace('<id>', '1')
+        with StatementCounter(engine) as counter:
+            response = client.get(url)
+            response.get_data()  # oqimli javoblar so'rovlari tana o'qilganda bajariladi
+
+        if response.status_code != 200:
+            failures.append(url)
+            print(f"  ❌ {url}: HTTP {response.status_code} (200 kutilgan)")
+        elif counter.count > budget:
+            failures.append(url)
+            print(f"  ❌ {url}: {counter.count} ta so'rov (budjet {budget})")
+            for statement in counter.statements:
+                print(f"       {statement.splitlines()[0][:100]}")
+        else:
+            print(f"  ✅ {url}: {counter.count}/{budget}")
+
+    print(f"\n  📊 Natija: {len(STATEMENT_BUDGETS) - len(failures)}/{len(STATEMENT_BUDGETS)} budjet ichida")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
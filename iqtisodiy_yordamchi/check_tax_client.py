@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Soliq Kabineti HTTP Mijozi Tekshiruvi - lokal stub server bilan
+
+Stub server (127.0.0.1, tasodifiy port) so'rov yo'li bo'yicha rejalashtirilgan
+javoblarni qaytaradi: 5xx xatolar, sekin javob (timeout) va oddiy 200.
+Tekshiriladi:
+  - 5xx va timeoutdan keyin qayta urinish muvaffaqiyat bilan tugaydi,
+  - qayta urinishlarda Idempotency-Key o'zgarmaydi,
+  - urinishlar tugasa xato natija qaytadi (istisno emas),
+  - ulanishlar qayta ishlatiladi (keep-alive), parallel so'rovlarda ham,
+  - company_tin / company_name SystemConfig ni har safar so'ramaydi.
+
+Ishga tushirish: python check_tax_client.py
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+READ_TIMEOUT = 0.3
+SLOW_SECONDS = 1.0
+LATENCY = 0.02
+
+
+def print_header(title):
+    print("\n" + "="*75)
+    print(f"  {title}")
+    print("="*75)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.plans = {}         # yo'l -> ['503', 'slow', '200', ...] (oxirgisi takrorlanadi)
+        self.requests = []      # (yo'l, Idempotency-Key)
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def next_action(self, path):
+        with self.lock:
+            plan = self.plans.get(path, ['200'])
+            return plan.pop(0) if len(plan) > 1 else plan[0]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        path = self.path.split('?')[0]
+        with self.server.lock:
+            self.server.requests.append((path, self.headers.get('Idempotency-Key')))
+
+        action = self.server.next_action(path)
+        time.sleep(SLOW_SECONDS if action == 'slow' else LATENCY)
+        status = 200 if action == 'slow' else int(action)
+        body = json.dumps({'status': 'accepted'} if status == 200 else {'error': 'stub'}).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass    # mijoz timeout bilan ulanishni yopgan
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+def attempts(server, path):
+    return [key for p, key in server.requests if p == path]
+
+
+def main():
+    from app.extensions import db
+    from app.factory import create_app
+    from app.models import SystemConfig
+    from app import tax_integration
+
+    logging.getLogger().setLevel(logging.ERROR)
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['TAX_CABINET_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+
+    print_header("🧾 SOLIQ KABINETI MIJOZI: STUB SERVER BILAN TEKSHIRUV")
+    session = tax_integration.create_session(max_retries=3, backoff_factor=0.01)
+    api = tax_integration.TaxCabinetAPI(session=session, timeout=(1, READ_TIMEOUT))
+    checks = []
+
+    # 1. 5xx -> qayta urinish
+    server.plans['/sales-report'] = ['503', '502', '200']
+    result = api.send_sales_report([{'date': '2026-02-01', 'total_amount': 1000}])
+    keys = attempts(server, '/sales-report')
+    checks.append(("5xx dan keyin muvaffaqiyat (3 urinish)", result['success'] and len(keys) == 3))
+    checks.append(("Idempotency-Key qayta urinishlarda bir xil", len(set(keys)) == 1 and keys[0]))
+
+    # 2. Timeout -> qayta urinish
+    server.plans['/vat-report'] = ['slow', '200']
+    started = time.perf_counter()
+    result = api.send_vat_report({'period': '2026-01'})
+    elapsed = time.perf_counter() - started
+    checks.append((f"Timeoutdan keyin muvaffaqiyat ({elapsed:.2f}s)",
+                   result['success'] and len(attempts(server, '/vat-report')) == 2 and elapsed < SLOW_SECONDS))
+
+    # 3. Urinishlar tugadi -> xato natija
+    server.plans['/payroll-report'] = ['500']
+    result = api.send_employee_payroll({'period': '2026-01'})
+    checks.append(("Doimiy 500: xato natija, 1 + 3 urinish",
+                   not result['success'] and result.get('status_code') == 500
+                   and len(attempts(server, '/payroll-report')) == 4))
+
+    # 4. Keep-alive: ketma-ket va parallel so'rovlar
+    before = server.connections
+    for _ in range(20):
+        api.send_tax_declaration({'period': '2026-01'})
+    sequential = server.connections - before
+    checks.append((f"20 ketma-ket so'rov: {sequential} ta yangi ulanish", sequential <= 1))
+
+    before = server.connections
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: api.send_tax_declaration({'period': '2026-02'}), range(80)))
+    parallel = server.connections - before
+    checks.append((f"80 parallel so'rov (8 oqim): {parallel} ta yangi ulanish",
+                   all(r['success'] for r in results) and parallel <= 8))
+
+    # 5. SystemConfig keshi
+    app = create_app(with_routes=False)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([SystemConfig(key='tax_tin', value='123456789'),
+                            SystemConfig(key='company_name', value='Test MChJ')])
+        db.session.commit()
+        statements = []
+        from sqlalchemy import event
+        listener = lambda *args: statements.append(1)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        values = {(api.company_tin, api.company_name) for _ in range(100)}
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    checks.append((f"200 ta sozlama o'qish: {len(statements)} ta SQL", values == {('123456789', 'Test MChJ')}
+                   and len(statements) <= 1))
+
+    server.shutdown()
+    for label, ok in checks:
+        print(f"  {'✅' if ok else '❌'} {label}")
+    failed = sum(1 for _, ok in checks if not ok)
+    print(f"\n  📊 Natija: {len(checks) - failed}/{len(checks)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
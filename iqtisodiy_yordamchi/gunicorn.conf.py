@@ -0,0 +1,67 @@
+"""
+Gunicorn sozlamalari (production)
+
+    gunicorn -c gunicorn.conf.py app.wsgi:app
+
+Worker lar soni yadrolar soniga qarab, har bir worker da bir nechta thread
+(gthread): so'rovlarning ko'p qismi baza/Redis/HTTP kutish, thread lar shu
+vaqtda boshqa so'rovga xizmat qiladi. DB_POOL_SIZE + DB_MAX_OVERFLOW thread
+lar sonidan kam bo'lmasin.
+
+SSE (/api/realtime/stream) ulanishi gthread worker da bitta thread ni butun
+umri davomida band qiladi. Shu sababli worker boshiga ochiq oqimlar soni
+cheklanadi, chegaradan oshgan ulanish 503 oladi:
+
+    realtime_streams = min(REALTIME_STREAMS_PER_WORKER, threads // 2)
+    (standart threads // 4) - qolgan thread lar doim oddiy API uchun bo'sh.
+    Jami SSE sig'imi = workers * realtime_streams.
+
+Ko'p dashboard kerak bo'lsa thread larni oshirish o'rniga oqimni alohida
+instansiya bilan async worker da xizmat qiling (proxy /api/realtime/stream
+ni unga yo'naltiradi):
+
+    GUNICORN_WORKER_CLASS=gevent gunicorn -c gunicorn.conf.py app.wsgi:app
+
+Async worker (gevent/eventlet) da ulanish thread band qilmaydi - chegara
+REALTIME_MAX_SUBSCRIBERS (app/realtime.py) bo'yicha.
+
+preload_app: ilova master jarayonda bir marta import qilinadi, worker lar
+fork bilan tayyor holda ishga tushadi (copy-on-write, tez qayta ishga tushish).
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+# gthread: worker boshiga ochiq SSE oqimlari - thread larning yarmidan oshmaydi
+realtime_streams = min(int(os.getenv('REALTIME_STREAMS_PER_WORKER', threads // 4 or 1)), threads // 2)
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+# Xotira sizib chiqishidan himoya: worker lar vaqti-vaqti bilan almashtiriladi
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Master da ochilgan DB ulanishlari va fon oqimlari (Redis tinglovchi) fork dan keyin ishlamaydi"""
+    from app import main
+    from app.extensions import db
+    from app.realtime import create_broker
+    from app.wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if worker_class == 'gthread':
+        main.event_broker = create_broker(max_subscribers=realtime_streams)
+    else:
+        main.event_broker = create_broker()